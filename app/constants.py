@@ -2,6 +2,13 @@
 
 WEB_TYPES = ['rest', 'web', 'app', 'suite', 'workbench', 'db', 'soap', 'sparql']
 
+# Agents that are only in galaxy_metadata are not shown in the UI
+ONLY_GALAXY_METADATA = ['galaxy_metadata']
+
+# Version of the stats maintained live from the changes of the agents. Only served when
+# requested explicitly: `latest` is the latest computed version.
+LIVE_STATS_VERSION = 'live'
+
 STRUCT_META = ['bioagents', 'bioconda', 'github', 'bitbucket', 'galaxy', 'agentshed', 'opeb_metrics', 'observatory']
 
 
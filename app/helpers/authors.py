@@ -0,0 +1,188 @@
+import re
+from functools import lru_cache
+
+########
+# Author normalization
+# Author strings are cleaned (brackets, titles, "code from..." prefixes) and classified
+# as person or organization. The same names appear in thousands of agents, so the
+# result for each raw string is memoized in a bounded LRU.
+#######
+
+AFTER_BRAKET_PATTERN = re.compile(r'\{.*|\[.*|\(.*|\<.*')
+BETWEEN_BRAKETS_PATTERN = re.compile(r'\{.*?\}|\[.*?\]|\(.*?\)|\<.*?\>')
+BEFORE_BRAKET_PATTERN = re.compile(r'.*?\}.*?|.*?\].*?|.*?\>.*?')
+DOCTOR_PATTERN = re.compile(r'^Dr\.|Dr |Dr\. |Dr')
+CODE_PATTERN = re.compile(r'.*?code')
+CAPITAL_CODE_PATTERN = re.compile(r'.*?Code')
+FROM_PATTERN = re.compile(r'.*?from')
+
+INSTITUTION_KEYWORDS = frozenset([
+    'university',
+    'université',
+    'universidad',
+    'universidade',
+    'università',
+    'universität',
+    'institut',
+    'institute',
+    'college',
+    'school',
+    'department',
+    'laboratory',
+    'laboratoire',
+    'lab',
+    'center',
+    'centre',
+    'research',
+    'researcher',
+    'researchers',
+    'group',
+    'support',
+    'foundation',
+    'company',
+    'corporation',
+    'team',
+    'helpdesk',
+    'service',
+    'platform',
+    'program',
+    'programme',
+    'community'
+])
+
+AUTHORS_CACHE_SIZE = 100000
+
+
+def clean_brakets(string):
+    '''
+    Remove anything between {}, [], or <>, or after {, [, <
+    '''
+    string = BETWEEN_BRAKETS_PATTERN.sub('', string)
+    string = AFTER_BRAKET_PATTERN.sub('', string)
+    string = BEFORE_BRAKET_PATTERN.sub('', string)
+
+    return string
+
+def clean_doctor(string):
+    '''
+    remove title at the begining of the string
+    '''
+    return DOCTOR_PATTERN.sub('', string)
+
+def keep_after_code(string):
+    '''
+    Remove anything before code and others
+    '''
+    if 'initial R code' in string:
+        return ''
+    if 'contact form' in string:
+        return ''
+    else:
+        string = CODE_PATTERN.sub('', string)
+        string = CAPITAL_CODE_PATTERN.sub('', string)
+        string = FROM_PATTERN.sub('', string)
+        return FROM_PATTERN.sub('', string)
+
+def clean_first_end_parenthesis(string):
+    if string and string[0] == '(' and string[-1] == ')':
+        string = string[1:]
+        string = string[:-1]
+
+    return string
+
+def clean_spaces(string):
+    '''
+    Clean spaces around the string
+    '''
+    return string.strip()
+
+
+def classify_person_organization(string):
+    '''
+    tokenize the string
+    if any of the words in the string is in the list of keywords
+    then it is an institution
+    otherwise it is a person
+    '''
+    for word in string.split():
+        if word.lower() in INSTITUTION_KEYWORDS:
+            return 'organization'
+    return 'person'
+
+def clean_long(string):
+    if len(string.split()) >= 5:
+        return ''
+    else:
+        return string
+
+
+def build_organization(string):
+    return {
+        'type': 'organization',
+        'name': string,
+        'email': '',
+        'maintainer': False
+        }
+
+def build_person(string):
+    '''
+    Extract first and last name from a string
+    '''
+    if string:
+        return {
+            'type': 'person' ,
+            'name': string,
+            'email': '',
+            'maintainer': False
+            }
+    else:
+        return ''
+
+
+def clean_author_name(author):
+    name = clean_first_end_parenthesis(author)
+    name = clean_brakets(name)
+    name = clean_doctor(name)
+    name = keep_after_code(name)
+    name = clean_spaces(name)
+    return name
+
+
+@lru_cache(maxsize=AUTHORS_CACHE_SIZE)
+def resolve_author(author):
+    '''
+    Clean name of a raw author string and the author entry built from it.
+    The entry is None when the author must be dropped.
+    Entries are shared by the cache: use `normalize_author` to get a copy.
+    '''
+    name = clean_author_name(author)
+    classification = classify_person_organization(name)
+    if classification == 'person':
+        if name:
+            return name, build_person(clean_long(name))
+        return name, None
+    else:
+        return name, build_organization(name)
+
+
+def normalize_author(author):
+    name, entry = resolve_author(author)
+    return name, (dict(entry) if entry else entry)
+
+
+def build_authors(authors):
+    '''
+    Build a list of authors
+    '''
+    new_authors = []
+    seen_authors = set()
+    for author in authors:
+        name, entry = normalize_author(author)
+        if name in seen_authors:
+            continue
+        else:
+            seen_authors.add(name)
+            if entry is not None:
+                new_authors.append(entry)
+
+    return new_authors
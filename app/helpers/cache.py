@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps, lru_cache
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+from app.helpers.database import connect_collection
+
+########
+# Response cache for GET routes
+# Responses are cached by route and normalized query parameters. The versions of the
+# catalogue and of the stats are part of the key, so every change of the agents or write
+# of stats invalidates the cached responses. The versions are counters kept in the
+# database (cache_versions), so that a change seen by one worker (or written by the stats
+# CLI) invalidates the responses cached by all of them.
+# The components that derive data from the agents (read model, catalogue, indexes) bump
+# the catalogue version once they have refreshed it, not when the change is published:
+# a response computed before that is cached under the old version. Bumps requested
+# within INVALIDATE_DELAY seconds are written once.
+# Backend: in-process LRU (default) or a Redis-compatible server, selected with the env
+# variables RESPONSE_CACHE=memory|redis and RESPONSE_CACHE_REDIS_URL.
+#######
+
+DEFAULT_TTL = 300
+
+VERSION_NAMES = ('catalogue', 'stats')
+
+# seconds between reads of the shared versions
+VERSION_POLL = float(os.getenv('RESPONSE_CACHE_VERSION_POLL', 1.0))
+
+# seconds during which the bumps of a version are gathered into a single write
+INVALIDATE_DELAY = float(os.getenv('RESPONSE_CACHE_INVALIDATE_DELAY', 0.2))
+
+
+class CacheVersions:
+    '''
+    Versions of the data behind the cached responses, shared by all the processes through
+    `collection` ({_id: name, version: n}). Without a collection, they are local to the
+    process. Shared versions are read again at most every `poll` seconds.
+    '''
+    def __init__(self, collection=None, poll=VERSION_POLL, delay=INVALIDATE_DELAY):
+        self.collection = collection
+        self.poll = poll
+        self.delay = delay
+        self.values = {name: 0 for name in VERSION_NAMES}
+        self.read_at = float('-inf')
+        self.lock = threading.Lock()
+        # name -> timer of its pending bump
+        self.pending = {}
+
+    def snapshot(self):
+        return [self.values[name] for name in VERSION_NAMES]
+
+    def refresh(self):
+        try:
+            stored = {doc['_id']: doc['version'] for doc in self.collection.find({'_id': {'$in': list(VERSION_NAMES)}})}
+        except PyMongoError as err:
+            print(f'Could not read the cache versions: {err}')
+            stored = {}
+        with self.lock:
+            for name, version in stored.items():
+                self.values[name] = max(self.values[name], version)
+            self.read_at = time.monotonic()
+        return self.snapshot()
+
+    async def current(self):
+        if self.collection is None or time.monotonic() - self.read_at < self.poll:
+            return self.snapshot()
+        return await run_in_threadpool(self.refresh)
+
+    def bump(self, name):
+        '''
+        Invalidate the responses that depend on `name` (blocking: not for the event loop)
+        '''
+        version = None
+        if self.collection is not None:
+            try:
+                version = self.collection.find_one_and_update(
+                    {'_id': name},
+                    {'$inc': {'version': 1}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )['version']
+            except PyMongoError as err:
+                print(f'Could not update the cache version of {name}: {err}')
+        with self.lock:
+            self.values[name] = max(self.values[name] + 1, version or 0)
+
+    def bump_later(self, name):
+        '''
+        Bump `name` in `delay` seconds, once for all the bumps requested meanwhile
+        '''
+        with self.lock:
+            if name in self.pending:
+                return
+            # not a daemon: a process exiting meanwhile still writes the bump
+            self.pending[name] = threading.Timer(self.delay, self._bump_pending, (name,))
+            self.pending[name].start()
+
+    def _bump_pending(self, name):
+        # bumps requested from now on need a new write
+        with self.lock:
+            self.pending.pop(name, None)
+        self.bump(name)
+
+
+@lru_cache(maxsize=None)
+def get_versions():
+    try:
+        collection = connect_collection('CACHE_VERSIONS', 'cache_versions')
+    except (EnvironmentError, KeyError) as err:
+        print(f'Database not configured ({err}). Cache versions are local to the process.')
+        collection = None
+    return CacheVersions(collection)
+
+
+def invalidate(name):
+    get_versions().bump(name)
+
+
+def invalidate_later(name):
+    get_versions().bump_later(name)
+
+
+def invalidate_catalogue(ids=None):
+    '''
+    Called by the components that derive data from the agents once they have refreshed it
+    '''
+    invalidate_later('catalogue')
+
+
+class CachedResponse:
+    def __init__(self, body, status_code, media_type, etag):
+        self.body = body
+        self.status_code = status_code
+        self.media_type = media_type
+        self.etag = etag
+
+    def dumps(self):
+        header = json.dumps({'status_code': self.status_code, 'media_type': self.media_type, 'etag': self.etag})
+        return header.encode() + b'\n' + self.body
+
+    @classmethod
+    def loads(cls, payload):
+        header, body = payload.split(b'\n', 1)
+        header = json.loads(header)
+        return cls(body, header['status_code'], header['media_type'], header['etag'])
+
+
+class LRUBackend:
+    '''
+    Thread-safe in-process LRU with per-entry expiration
+    '''
+    blocking = False
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisBackend:
+    '''
+    Cache shared by all the workers, in a Redis-compatible server (needs the `redis` package).
+    Its calls are made from the thread pool, not from the event loop.
+    '''
+    blocking = True
+
+    def __init__(self, url, prefix='observatory-api:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        payload = self.client.get(self.prefix + key)
+        return CachedResponse.loads(payload) if payload else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value.dumps(), ex=ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def normalize_params(params, list_params=()):
+    '''
+    Query parameters in canonical form: sorted, without empty values, and with the
+    items of the comma-separated `list_params` sorted and deduplicated.
+    '''
+    normalized = []
+    for key, value in params.multi_items():
+        value = value.strip()
+        if not value:
+            continue
+        if key in list_params:
+            value = ','.join(sorted({item.strip() for item in value.split(',') if item.strip()}))
+        normalized.append((key, value))
+    return sorted(normalized)
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        # computations in progress, so that concurrent identical misses wait for the same one
+        self.inflight = {}
+
+    def make_key(self, request, list_params=(), versions=()):
+        params = normalize_params(request.query_params, list_params)
+        raw = json.dumps([request.url.path, params, list(versions)])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    async def call(self, method, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    async def get_or_compute(self, key, compute, ttl):
+        cached = await self.call(self.backend.get, key)
+        if cached is not None:
+            return cached, True
+
+        while key in self.inflight:
+            leader = self.inflight[key]
+            try:
+                return await asyncio.shield(leader), True
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise
+                # the request computing it was cancelled: compute it here instead
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            response = await compute()
+            if not isinstance(response, Response):
+                response = JSONResponse(content=response)
+            cached = CachedResponse(response.body, response.status_code, response.media_type, make_etag(response.body))
+            if response.status_code == 200:
+                await self.call(self.backend.set, key, cached, ttl)
+            future.set_result(cached)
+            return cached, False
+        except asyncio.CancelledError:
+            # the waiters must not wait forever for a computation that will never end
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            # mark the exception as retrieved in case nobody was waiting
+            future.exception()
+            raise
+        finally:
+            del self.inflight[key]
+
+
+@lru_cache(maxsize=None)
+def get_cache():
+    backend_name = os.getenv('RESPONSE_CACHE', 'memory')
+    if backend_name == 'redis':
+        url = os.getenv('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        try:
+            return ResponseCache(RedisBackend(url))
+        except ImportError:
+            print('RESPONSE_CACHE=redis needs the redis package. Using the in-process cache.')
+    max_entries = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+    return ResponseCache(LRUBackend(max_entries))
+
+
+def find_request(args, kwargs):
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, Request):
+            return value
+    raise TypeError('Cached routes need a `request: Request` parameter')
+
+
+def parse_if_none_match(request):
+    header = request.headers.get('if-none-match', '')
+    return [etag.strip().removeprefix('W/') for etag in header.split(',') if etag.strip()]
+
+
+def cached(ttl=DEFAULT_TTL, list_params=()):
+    '''
+    Cache the responses of a GET route. The route must take a `request: Request` parameter.
+    `list_params` are comma-separated parameters whose order does not matter.
+    Responses carry an ETag and requests with a matching If-None-Match get a 304.
+    '''
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = find_request(args, kwargs)
+            cache = get_cache()
+            key = cache.make_key(request, list_params, await get_versions().current())
+            entry, hit = await cache.get_or_compute(key, lambda: func(*args, **kwargs), ttl)
+
+            headers = {'ETag': entry.etag, 'X-Cache': 'HIT' if hit else 'MISS'}
+            if entry.status_code == 200 and entry.etag in parse_if_none_match(request):
+                return Response(status_code=304, headers=headers)
+            return Response(content=entry.body, status_code=entry.status_code, media_type=entry.media_type, headers=headers)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,150 @@
+import threading
+from functools import lru_cache
+
+from app.helpers.database import connect_DB
+from app.constants import ONLY_GALAXY_METADATA
+from app.helpers import changes
+from app.helpers.cache import invalidate_catalogue
+
+########
+# In-memory catalogue index
+# Lightweight fields of every agent, kept in memory so that endpoints like
+# /agents/names_type_labels and /agent/description do not query the database.
+#######
+
+CATALOGUE_FIELDS = {
+    '_id': 0,
+    '@id': 1,
+    'name': 1,
+    'type': 1,
+    'label': 1,
+    'sources_labels': 1,
+    'description': 1,
+    'source': 1,
+}
+
+
+def build_entry(agent):
+    '''
+    Catalogue entry of an agent: label and description are reduced to the first item
+    '''
+    entry = {
+        '@id': agent['@id'],
+        'name': agent.get('name'),
+        'type': agent.get('type'),
+        'label': agent['label'][0] if agent.get('label') else None,
+        'description': agent['description'][0] if agent.get('description') else None,
+        'source': agent.get('source', []),
+    }
+    if 'sources_labels' in agent:
+        entry['sources_labels'] = agent['sources_labels']
+    return entry
+
+
+def name_type_label(entry):
+    item = {key: entry[key] for key in ('@id', 'label', 'type', 'name')}
+    if 'sources_labels' in entry:
+        item['sources_labels'] = entry['sources_labels']
+    return item
+
+
+class CatalogueIndex:
+    '''
+    Agents by `@id` and by name. A full load builds new structures and swaps them in;
+    changes only update the entries of the changed agents (and their names), so
+    following a stream of changes does not rebuild the whole catalogue each time.
+    '''
+    def __init__(self, agents_collection):
+        self.agents_collection = agents_collection
+        self.entries = {}
+        self.by_name = {}
+        # name -> `@id`s of the agents with that name, in load order (by_name holds the first)
+        self.ids_by_name = {}
+        # built on demand, dropped on every change
+        self.names_type_labels = None
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def _add(self, entry, entries, by_name, ids_by_name):
+        entries[entry['@id']] = entry
+        ids = ids_by_name.setdefault(entry['name'], [])
+        if entry['@id'] not in ids:
+            ids.append(entry['@id'])
+        by_name[entry['name']] = entries[ids[0]]
+
+    def _remove(self, id_):
+        entry = self.entries.pop(id_, None)
+        if entry is None:
+            return
+        ids = self.ids_by_name.get(entry['name'], [])
+        if id_ in ids:
+            ids.remove(id_)
+        if ids:
+            self.by_name[entry['name']] = self.entries[ids[0]]
+        else:
+            self.ids_by_name.pop(entry['name'], None)
+            self.by_name.pop(entry['name'], None)
+
+    def load(self):
+        with self.lock:
+            entries, by_name, ids_by_name = {}, {}, {}
+            for agent in self.agents_collection.find({}, CATALOGUE_FIELDS):
+                self._add(build_entry(agent), entries, by_name, ids_by_name)
+            self.entries, self.by_name, self.ids_by_name = entries, by_name, ids_by_name
+            self.names_type_labels = None
+            self.loaded = True
+        print(f'Catalogue index: {len(self.entries)} agents loaded')
+        invalidate_catalogue()
+
+    def refresh(self, ids=None):
+        '''
+        Reload the agents in `ids` (everything if `ids` is None)
+        '''
+        if ids is None:
+            return self.load()
+
+        ids = list(ids)
+        agents = list(self.agents_collection.find({'@id': {'$in': ids}}, CATALOGUE_FIELDS))
+        with self.lock:
+            for id_ in ids:
+                self._remove(id_)
+            for agent in agents:
+                self._add(build_entry(agent), self.entries, self.by_name, self.ids_by_name)
+            self.names_type_labels = None
+        invalidate_catalogue()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def all_entries(self):
+        self.ensure_loaded()
+        with self.lock:
+            return list(self.entries.values())
+
+    def get_names_type_labels(self):
+        self.ensure_loaded()
+        with self.lock:
+            if self.names_type_labels is None:
+                self.names_type_labels = [name_type_label(entry) for entry in self.entries.values() if entry['source'] != ONLY_GALAXY_METADATA]
+            return self.names_type_labels
+
+    def get_by_name(self, name):
+        self.ensure_loaded()
+        return self.by_name.get(name)
+
+
+@lru_cache(maxsize=None)
+def get_catalogue():
+    agents_collection, stats = connect_DB()
+    return CatalogueIndex(agents_collection)
+
+
+def start_catalogue():
+    '''
+    Load the catalogue index and keep it updated on changes
+    '''
+    catalogue = get_catalogue()
+    catalogue.load()
+    changes.subscribe(catalogue.refresh)
+    return catalogue
@@ -0,0 +1,91 @@
+import threading
+from pymongo.errors import PyMongoError
+
+########
+# Catalogue change feed
+# In-process components that keep derived data of the agents collection (read model,
+# indexes, caches) subscribe here and are notified whenever agents change.
+#######
+
+_listeners = []
+_lock = threading.Lock()
+_version = 0
+_watcher = None
+
+
+def subscribe(listener):
+    '''
+    Register `listener(ids)` to be called on every catalogue change.
+    `ids` is the list of changed `@id`s, or None if the whole catalogue may have changed.
+    '''
+    _listeners.append(listener)
+
+
+def catalogue_version():
+    '''
+    Counter increased on every published change
+    '''
+    return _version
+
+
+def publish(ids=None):
+    '''
+    Notify all listeners that the agents in `ids` changed (None means all of them)
+    '''
+    global _version
+    with _lock:
+        _version += 1
+
+    for listener in list(_listeners):
+        try:
+            listener(ids)
+        except Exception as err:
+            print(f'Error notifying catalogue change to {listener.__name__}: {err}')
+
+
+def changed_id(change, resolve_id=None):
+    '''
+    `@id` of the agent of a change event. Deletes only carry the `_id` of the document,
+    which `resolve_id(_id)` maps to the `@id` it had (None if unknown).
+    '''
+    document = change.get('fullDocument')
+    if document and document.get('@id'):
+        return document['@id']
+    key = change.get('documentKey', {}).get('_id')
+    if key is not None and resolve_id is not None:
+        return resolve_id(key)
+    return None
+
+
+def watch_agents(agents_collection, resolve_id=None):
+    '''
+    Publish the changes of the agents collection as they happen.
+    Change streams need a replica set; on a standalone server this just logs and returns.
+    '''
+    try:
+        with agents_collection.watch(full_document='updateLookup') as stream:
+            for change in stream:
+                id_ = changed_id(change, resolve_id)
+                if id_ is not None:
+                    publish([id_])
+                else:
+                    print(f'Agents change stream: agent of {change.get("operationType")} {change.get("documentKey")} not known, ignored')
+    except PyMongoError as err:
+        print(f'Agents change stream not available: {err}')
+
+
+def start_watcher(agents_collection, resolve_id=None):
+    '''
+    Start watching the agents collection in a background thread (only once per process)
+    '''
+    global _watcher
+    with _lock:
+        if _watcher is None:
+            _watcher = threading.Thread(
+                target=watch_agents,
+                args=(agents_collection, resolve_id),
+                name='agents-change-stream',
+                daemon=True
+            )
+            _watcher.start()
+    return _watcher
@@ -1,10 +1,11 @@
 import configparser
+from functools import lru_cache
 from pymongo import MongoClient
 import os
 
 
-def connect_DB():
-    # connecting to db
+@lru_cache(maxsize=None)
+def read_config():
     config = configparser.ConfigParser()
     # read the env variable CONFIG_FILE
     config_path = os.getenv('CONFIG_PATH')
@@ -14,15 +15,21 @@ def connect_DB():
         config.read(config_path)
     else:
         raise EnvironmentError("CONFIG_PATH environment variable is not set.")
-        
+
+    return config
+
+
+@lru_cache(maxsize=None)
+def connect_client():
+    '''
+    Single client shared by all the routers (pymongo clients are thread-safe and pool connections)
+    '''
+    config = read_config()
     mongo_host = config['MONGO_DETAILS']['DBHOST']
     mongo_port = config['MONGO_DETAILS']['DBPORT']
     mongo_user = config['MONGO_DETAILS']['DBUSER']
     mongo_pass = config['MONGO_DETAILS']['DBPASS']
     mongo_auth_src = config['MONGO_DETAILS']['DBAUTHSRC']
-    mongo_db = config['MONGO_DETAILS']['DATABASE']
-    stats_collection_name = config['MONGO_DETAILS']['STATS']
-    agents_collection_name = config['MONGO_DETAILS']['TOOLS']
 
     client = MongoClient(
                 host=[f'{mongo_host}:{mongo_port}'],
@@ -31,8 +38,24 @@ def connect_DB():
                 authSource=mongo_auth_src,
                 authMechanism='SCRAM-SHA-256'
             )
-    
-    agents_collection = client[mongo_db][agents_collection_name]
-    stats = client[mongo_db][stats_collection_name]
+
+    return client
+
+
+def connect_collection(key, default=None):
+    '''
+    Return the collection named in MONGO_DETAILS[key] (or `default` if the key is not set)
+    '''
+    config = read_config()
+    mongo_db = config['MONGO_DETAILS']['DATABASE']
+    collection_name = config['MONGO_DETAILS'].get(key, default)
+
+    return connect_client()[mongo_db][collection_name]
+
+
+def connect_DB():
+    # connecting to db
+    agents_collection = connect_collection('TOOLS')
+    stats = connect_collection('STATS')
 
     return agents_collection, stats
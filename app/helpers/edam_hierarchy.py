@@ -0,0 +1,170 @@
+import csv
+import os
+from bisect import bisect_right
+from functools import lru_cache
+
+########
+# EDAM class hierarchy
+# Read from the EDAM CSV export (the one EDAM_forFE.py is generated from): EDAM.csv next
+# to this file (EDAM 1.25, CC BY-SA 4.0), or the file in the env variable EDAM_CSV_PATH.
+# Descendant closures are stored as interval labels: classes are numbered in post-order
+# along a spanning tree and each class keeps the merged intervals of numbers of its
+# descendants (several when it has descendants through other parents). Expanding a set
+# of classes is merging their intervals and slicing the classes sorted by number, so the
+# result comes out deduplicated.
+# Without the CSV file, classes expand to themselves and the hierarchy is not
+# `available`: /search rejects include_descendants=true instead of ignoring it.
+#######
+
+DEFAULT_EDAM_CSV_PATH = os.path.join(os.path.dirname(__file__), 'EDAM.csv')
+
+EDAM_PREFIX = 'http://edamontology.org/'
+
+
+def read_edam_csv(path):
+    '''
+    {class: [parents]} of the EDAM classes in a CSV export (columns "Class ID", "Parents"
+    and "Obsolete"). Parents are separated by |.
+    '''
+    parents = {}
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            class_id = row.get('Class ID', '').strip()
+            if not class_id.startswith(EDAM_PREFIX):
+                continue
+            if row.get('Obsolete', '').strip().upper() == 'TRUE':
+                continue
+            parents[class_id] = [parent.strip() for parent in row.get('Parents', '').split('|') if parent.strip()]
+    return parents
+
+
+def merge_intervals(intervals):
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return [tuple(interval) for interval in merged]
+
+
+class EDAMHierarchy:
+    def __init__(self, parents=None):
+        parents = parents or {}
+        # parents outside of the file (owl:Thing, ...) are ignored
+        self.parents = {uri: [parent for parent in uri_parents if parent in parents] for uri, uri_parents in parents.items()}
+        self.children = {uri: [] for uri in self.parents}
+        for uri, uri_parents in self.parents.items():
+            for parent in uri_parents:
+                self.children[parent].append(uri)
+
+        self.number = {}
+        self.by_number = []
+        self.intervals = {}
+        self._label()
+        self.ancestors = self._ancestors()
+
+    def _label(self):
+        '''
+        Post-order numbers along a spanning tree, then intervals in reverse topological order
+        '''
+        roots = [uri for uri, uri_parents in self.parents.items() if not uri_parents]
+        tree_intervals = {}
+        visited = set()
+        for root in roots + list(self.parents):
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(self.children[root]), len(self.by_number))]
+            while stack:
+                uri, children, first = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    self.number[uri] = len(self.by_number)
+                    self.by_number.append(uri)
+                    tree_intervals[uri] = (first, self.number[uri])
+                elif child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(self.children[child]), len(self.by_number)))
+
+        for uri in reversed(self._topological_order()):
+            intervals = [tree_intervals[uri]]
+            for child in self.children[uri]:
+                intervals.extend(self.intervals.get(child, [tree_intervals[child]]))
+            self.intervals[uri] = merge_intervals(intervals)
+        # classes in a cycle (not expected in EDAM) keep their spanning tree interval
+        for uri in self.parents:
+            self.intervals.setdefault(uri, [tree_intervals[uri]])
+
+    def _topological_order(self):
+        pending = {uri: len(uri_parents) for uri, uri_parents in self.parents.items()}
+        order = [uri for uri, count in pending.items() if count == 0]
+        for uri in order:
+            for child in self.children[uri]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    order.append(child)
+        return order
+
+    def _ancestors(self):
+        ancestors = {}
+        for uri in self._topological_order():
+            uri_ancestors = set()
+            for parent in self.parents[uri]:
+                uri_ancestors.add(parent)
+                uri_ancestors |= ancestors.get(parent, set())
+            ancestors[uri] = frozenset(uri_ancestors)
+        return ancestors
+
+    def __len__(self):
+        return len(self.by_number)
+
+    @property
+    def available(self):
+        return len(self) > 0
+
+    def is_descendant(self, uri, ancestor):
+        if uri not in self.number or ancestor not in self.intervals:
+            return uri == ancestor
+        number = self.number[uri]
+        intervals = self.intervals[ancestor]
+        i = bisect_right(intervals, (number, float('inf'))) - 1
+        return i >= 0 and intervals[i][0] <= number <= intervals[i][1]
+
+    def descendants(self, uri):
+        '''
+        The class and all its descendants
+        '''
+        return self.expand([uri])
+
+    def expand(self, uris):
+        '''
+        The given classes and all their descendants, without duplicates. Classes not in
+        the hierarchy are kept as they are.
+        '''
+        intervals = []
+        unknown = []
+        for uri in uris:
+            if uri in self.intervals:
+                intervals.extend(self.intervals[uri])
+            elif uri not in unknown:
+                unknown.append(uri)
+
+        expanded = []
+        for lo, hi in merge_intervals(intervals):
+            expanded.extend(self.by_number[lo:hi + 1])
+        return expanded + unknown
+
+
+@lru_cache(maxsize=None)
+def get_edam_hierarchy():
+    path = os.getenv('EDAM_CSV_PATH', DEFAULT_EDAM_CSV_PATH)
+    try:
+        parents = read_edam_csv(path)
+    except OSError as err:
+        print(f'EDAM hierarchy not available ({err}). Searches with include_descendants=true will be rejected.')
+        parents = {}
+    hierarchy = EDAMHierarchy(parents)
+    print(f'EDAM hierarchy: {len(hierarchy)} classes')
+    return hierarchy
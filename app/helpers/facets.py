@@ -0,0 +1,305 @@
+import threading
+from functools import lru_cache
+
+from app.helpers.database import connect_collection
+
+########
+# Facet index
+# For every value of every /search facet, a bitmap of the agents (by ordinal) that
+# have it. Bitmaps are Python ints (1 bit per agent, ~4 KB for 30k agents): filters
+# are AND/OR of ints and facet counts are popcounts. Built from the UI read model.
+#######
+
+FACET_FIELDS = {
+    '_id': 0,
+    '@id': 1,
+    'type': 1,
+    'source': 1,
+    'topics': 1,
+    'operations': 1,
+    'edam_topics': 1,
+    'edam_operations': 1,
+    'license': 1,
+    'tags': 1,
+    'input': 1,
+    'output': 1,
+}
+
+
+def terms(items, key):
+    return [item[key] for item in items if item.get(key)]
+
+
+def format_terms(items):
+    # Data format (FASTA, CSV, ...) by uri, or by term if it has no uri
+    return [item['uri'] if item.get('uri') else item['term'] for item in items]
+
+
+def stats_sources(sources):
+    '''
+    Sources as counted in the search stats
+    '''
+    new_sources = []
+    for source in sources:
+        if source == 'opeb_metrics':
+            continue
+        # bioconda_recipes and bioconda are the same for this purpose
+        if source == 'bioconda_recipes':
+            source = 'bioconda'
+        # galaxy_metadata and agentshed are the same for this purpose
+        if source == 'galaxy_metadata':
+            source = 'agentshed'
+        new_sources.append(source)
+    return new_sources
+
+
+# /search filter parameter -> values of an agent
+FILTER_FACETS = {
+    'source': lambda agent: agent.get('source', []),
+    'type': lambda agent: [agent['type']] if agent.get('type') else [],
+    'topics': lambda agent: terms(agent.get('topics', []), 'uri'),
+    'operations': lambda agent: terms(agent.get('operations', []), 'uri'),
+    'license': lambda agent: terms(agent.get('license', []), 'name'),
+    'tags': lambda agent: agent.get('tags', []),
+    'input_format': lambda agent: terms(agent.get('input', []), 'term'),
+    'output_format': lambda agent: terms(agent.get('output', []), 'term'),
+}
+
+# search stats key -> values of an agent
+STATS_FACETS = {
+    'type': lambda agent: [agent['type']] if agent.get('type') else [],
+    'source': lambda agent: stats_sources(agent.get('source', [])),
+    'topics': lambda agent: agent.get('edam_topics', []),
+    'operations': lambda agent: agent.get('edam_operations', []),
+    'license': lambda agent: terms(agent.get('license', []), 'name'),
+    'input': lambda agent: format_terms(agent.get('input', [])),
+    'output': lambda agent: format_terms(agent.get('output', [])),
+    'collection': lambda agent: agent.get('tags', []),
+}
+
+# rough number of stats values per agent
+AVERAGE_VALUES = 32
+
+FAMILIES = {
+    'filter': FILTER_FACETS,
+    'stats': STATS_FACETS,
+}
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(bitmap):
+        return bin(bitmap).count('1')
+
+
+def bitmap_from_ordinals(ordinals):
+    ordinals = list(ordinals)
+    if not ordinals:
+        return 0
+    buffer = bytearray(max(ordinals) // 8 + 1)
+    for ordinal in ordinals:
+        buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def ordinals_from_bitmap(bitmap):
+    ordinals = []
+    buffer = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(buffer):
+        if byte:
+            for bit in range(8):
+                if byte >> bit & 1:
+                    ordinals.append(index * 8 + bit)
+    return ordinals
+
+
+def agent_values(agent):
+    '''
+    (family, facet, value) triples of an agent
+    '''
+    values = set()
+    for family, facets in FAMILIES.items():
+        for facet, extract in facets.items():
+            for value in extract(agent):
+                values.add((family, facet, value))
+    return values
+
+
+class FacetIndex:
+    def __init__(self, agents_ui=None):
+        self.agents_ui = agents_ui
+        self.lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.ordinals = {}
+        self.ids = []
+        self.values = []
+        self.free = []
+        self.alive = 0
+        self.bitmaps = {family: {facet: {} for facet in facets} for family, facets in FAMILIES.items()}
+
+    def build(self, agents):
+        '''
+        Index the given agents from scratch
+        '''
+        with self.lock:
+            self._reset()
+            ordinals_of = {}
+            for agent in agents:
+                ordinal = len(self.ids)
+                values = agent_values(agent)
+                self.ordinals[agent['@id']] = ordinal
+                self.ids.append(agent['@id'])
+                self.values.append(values)
+                for value in values:
+                    ordinals_of.setdefault(value, []).append(ordinal)
+
+            for (family, facet, value), ordinals in ordinals_of.items():
+                self.bitmaps[family][facet][value] = bitmap_from_ordinals(ordinals)
+            self.alive = bitmap_from_ordinals(range(len(self.ids)))
+            self.loaded = True
+
+    def _remove(self, id_):
+        ordinal = self.ordinals.pop(id_, None)
+        if ordinal is None:
+            return
+        mask = ~(1 << ordinal)
+        for family, facet, value in self.values[ordinal]:
+            bitmaps = self.bitmaps[family][facet]
+            bitmaps[value] &= mask
+            if not bitmaps[value]:
+                del bitmaps[value]
+        self.alive &= mask
+        self.ids[ordinal] = None
+        self.values[ordinal] = set()
+        self.free.append(ordinal)
+
+    def _add(self, agent):
+        if self.free:
+            ordinal = self.free.pop()
+            self.ids[ordinal] = agent['@id']
+            self.values[ordinal] = agent_values(agent)
+        else:
+            ordinal = len(self.ids)
+            self.ids.append(agent['@id'])
+            self.values.append(agent_values(agent))
+        self.ordinals[agent['@id']] = ordinal
+        bit = 1 << ordinal
+        for family, facet, value in self.values[ordinal]:
+            bitmaps = self.bitmaps[family][facet]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+        self.alive |= bit
+
+    def update(self, agents, removed_ids=()):
+        '''
+        Re-index the given agents and drop the removed ones
+        '''
+        with self.lock:
+            for id_ in removed_ids:
+                self._remove(id_)
+            for agent in agents:
+                self._remove(agent['@id'])
+                self._add(agent)
+
+    def load(self):
+        self.build(self.agents_ui.find({}, FACET_FIELDS))
+        print(f'Facet index: {len(self.ordinals)} agents indexed')
+
+    def refresh(self, ids=None):
+        '''
+        Follow changes of the read model (`ids` None means everything)
+        '''
+        if ids is None:
+            return self.load()
+        ids = list(ids)
+        agents = list(self.agents_ui.find({'@id': {'$in': ids}}, FACET_FIELDS))
+        found = {agent['@id'] for agent in agents}
+        self.update(agents, [id_ for id_ in ids if id_ not in found])
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def filter(self, filters):
+        '''
+        Bitmap of the agents matching every facet in `filters` ({facet: [values]}),
+        i.e. OR of the values within a facet and AND across facets
+        '''
+        with self.lock:
+            result = self.alive
+            for facet, values in filters.items():
+                bitmaps = self.bitmaps['filter'][facet]
+                matching = 0
+                for value in values:
+                    matching |= bitmaps.get(value, 0)
+                result &= matching
+            return result
+
+    def bitmap(self, ids):
+        with self.lock:
+            return bitmap_from_ordinals(self.ordinals[id_] for id_ in ids if id_ in self.ordinals)
+
+    def select(self, ids, allowed):
+        '''
+        Keep the ids whose agent is in the `allowed` bitmap, preserving their order
+        '''
+        with self.lock:
+            selected = set(ordinals_from_bitmap(self.bitmap(ids) & allowed))
+            return [id_ for id_ in ids if self.ordinals.get(id_) in selected]
+
+    def value_counts(self, facets=('topics', 'operations', 'input', 'output')):
+        '''
+        Number of agents with each value of the given stats facets, across the whole catalogue
+        '''
+        with self.lock:
+            counts = {}
+            for facet in facets:
+                for value, bitmap in self.bitmaps['stats'][facet].items():
+                    counts[value] = counts.get(value, 0) + popcount(bitmap)
+            return counts
+
+    def stats(self, ids):
+        '''
+        Number of agents among `ids` for every value of every stats facet (the stats of /search)
+        '''
+        with self.lock:
+            ordinals = [self.ordinals[id_] for id_ in set(ids) if id_ in self.ordinals]
+            n_values = sum(len(bitmaps) for bitmaps in self.bitmaps['stats'].values())
+            stats = {facet: {} for facet in STATS_FACETS}
+
+            if len(ordinals) * AVERAGE_VALUES < n_values:
+                # few agents: counting their values is cheaper than a popcount per value
+                for ordinal in ordinals:
+                    for family, facet, value in self.values[ordinal]:
+                        if family == 'stats':
+                            stats[facet][value] = stats[facet].get(value, 0) + 1
+                return stats
+
+            subset = bitmap_from_ordinals(ordinals)
+            for facet, bitmaps in self.bitmaps['stats'].items():
+                for value, bitmap in bitmaps.items():
+                    count = popcount(bitmap & subset)
+                    if count:
+                        stats[facet][value] = count
+            return stats
+
+
+@lru_cache(maxsize=None)
+def get_facet_index():
+    agents_ui = connect_collection('AGENTS_UI', 'agents_ui')
+    return FacetIndex(agents_ui)
+
+
+def start_facet_index(projector):
+    '''
+    Load the facet index and keep it in sync with the read model of `projector`.
+    Call it before the projector starts, so that no projection is missed.
+    '''
+    facet_index = get_facet_index()
+    # changes that arrive during the load wait for it and are applied on top
+    projector.listeners.append(facet_index.refresh)
+    facet_index.load()
+    return facet_index
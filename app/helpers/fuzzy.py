@@ -0,0 +1,187 @@
+import threading
+from array import array
+from functools import lru_cache
+
+from app.helpers.catalogue import get_catalogue
+from app.constants import ONLY_GALAXY_METADATA
+from app.helpers import changes
+from app.helpers.cache import invalidate_catalogue
+
+########
+# Fuzzy name search
+# Agent names and labels are compacted (lowercase, letters and digits only, so that
+# bwa-mem, bwa_mem and BWA MEM are the same) and indexed by trigrams. A query gets as
+# candidates the names sharing enough trigrams with it to be within the allowed edit
+# distance (q-gram lemma), and only those are compared with a bounded edit distance.
+# Short queries may be within the distance of names without sharing any trigram with
+# them: those are compared with every name of a close enough length.
+#######
+
+# seconds to wait after a change before rebuilding, so bursts of changes rebuild once
+REBUILD_DELAY = 1.0
+
+MAX_RESULTS = 200
+
+
+def compact(text):
+    return ''.join(char for char in str(text).casefold() if char.isalnum())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(text):
+    '''
+    Edits allowed for a query of this length
+    '''
+    if len(text) <= 6:
+        return 1
+    if len(text) <= 10:
+        return 2
+    return 3
+
+
+def bounded_distance(a, b, bound):
+    '''
+    Levenshtein distance of a and b, or None if it is greater than `bound`
+    '''
+    if abs(len(a) - len(b)) > bound:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    # cells further than `bound` from the diagonal are out of bounds
+    out = bound + 1
+    previous = [j if j <= bound else out for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [out] * (len(b) + 1)
+        if i <= bound:
+            current[0] = i
+        lo = max(1, i - bound)
+        hi = min(len(b), i + bound)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost, out)
+        if min(current[lo - 1:hi + 1]) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
+
+
+class FuzzyNameIndex:
+    def __init__(self):
+        self.keys = []
+        self.ids = []
+        self.postings = {}
+        # length -> ordinals of the keys of that length
+        self.by_length = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.pending_rebuild = None
+
+    def build(self, catalogue_entries):
+        '''
+        Index the names and labels of the given catalogue entries
+        '''
+        keys = []
+        ids = []
+        postings = {}
+        by_length = {}
+        for entry in catalogue_entries:
+            if not entry.get('name') or entry.get('source') == ONLY_GALAXY_METADATA:
+                continue
+            entry_keys = {compact(entry['name'])}
+            if entry.get('label'):
+                entry_keys.add(compact(entry['label']))
+            for key in entry_keys:
+                if not key:
+                    continue
+                ordinal = len(keys)
+                keys.append(key)
+                ids.append(entry['@id'])
+                by_length.setdefault(len(key), array('l')).append(ordinal)
+                for trigram in trigrams(key):
+                    postings.setdefault(trigram, array('l')).append(ordinal)
+
+        self.keys, self.ids, self.postings, self.by_length = keys, ids, postings, by_length
+        self.loaded = True
+
+    def search(self, q, limit=MAX_RESULTS):
+        '''
+        Ids of the agents whose name or label is within the allowed edit distance of
+        `q`, closest first, with their distance
+        '''
+        query = compact(q)
+        if not query:
+            return []
+        bound = max_distance(query)
+        query_trigrams = trigrams(query)
+        # each edit changes at most 3 trigrams
+        threshold = len(query_trigrams) - 3 * bound
+
+        shared = {}
+        for trigram in query_trigrams:
+            for ordinal in self.postings.get(trigram, ()):
+                shared[ordinal] = shared.get(ordinal, 0) + 1
+
+        if threshold > 0:
+            candidates = shared
+        else:
+            # names within the distance may share no trigram with the query
+            candidates = [
+                ordinal
+                for length in range(max(len(query) - bound, 1), len(query) + bound + 1)
+                for ordinal in self.by_length.get(length, ())
+            ]
+
+        best = {}
+        keys = self.keys
+        for ordinal in candidates:
+            count = shared.get(ordinal, 0)
+            if count < threshold or abs(len(keys[ordinal]) - len(query)) > bound:
+                continue
+            distance = bounded_distance(query, self.keys[ordinal], bound)
+            if distance is None:
+                continue
+            id_ = self.ids[ordinal]
+            rank = (distance, -count, len(self.keys[ordinal]))
+            if id_ not in best or rank < best[id_]:
+                best[id_] = rank
+
+        ranked = sorted(best, key=best.get)[:limit]
+        return [(id_, best[id_][0]) for id_ in ranked]
+
+    def load(self):
+        with self.lock:
+            self.pending_rebuild = None
+            self.build(get_catalogue().all_entries())
+        invalidate_catalogue()
+
+    def refresh(self, ids=None):
+        '''
+        Rebuild in the background shortly after a change (the current index keeps serving meanwhile)
+        '''
+        if self.pending_rebuild is None:
+            self.pending_rebuild = threading.Timer(REBUILD_DELAY, self.load)
+            self.pending_rebuild.daemon = True
+            self.pending_rebuild.start()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+
+@lru_cache(maxsize=None)
+def get_fuzzy_index():
+    return FuzzyNameIndex()
+
+
+def start_fuzzy_index():
+    '''
+    Build the fuzzy name index and rebuild it when the catalogue changes
+    '''
+    fuzzy_index = get_fuzzy_index()
+    fuzzy_index.load()
+    changes.subscribe(fuzzy_index.refresh)
+    return fuzzy_index
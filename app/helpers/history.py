@@ -0,0 +1,89 @@
+########
+# Delta encoding of stats histories
+# Consecutive versions of a stats variable are mostly the same. The first record of a
+# history is sent whole and each of the next ones as a JSON Merge Patch (RFC 7386) of
+# the previous one: only the keys that changed, null for removed keys, and lists
+# replaced as a whole. Records whose changes would need a null value (at any depth) are
+# sent whole.
+#######
+
+
+class NotRepresentable(Exception):
+    pass
+
+
+def has_null(value):
+    '''
+    Whether a null appears in `value` or in its nested objects (nulls in lists are kept
+    by a merge patch, lists are replaced as a whole)
+    '''
+    if value is None:
+        return True
+    if isinstance(value, dict):
+        return any(has_null(item) for item in value.values())
+    return False
+
+
+def merge_patch(old, new):
+    '''
+    Merge patch turning `old` into `new` (both dicts)
+    '''
+    patch = {}
+    for key, value in new.items():
+        if key in old and old[key] == value:
+            continue
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            patch[key] = merge_patch(old[key], value)
+        elif has_null(value):
+            # null means "remove" in a merge patch
+            raise NotRepresentable(key)
+        else:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch
+
+
+def apply_merge_patch(target, patch):
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def delta_encode(records):
+    '''
+    Versions of a history: {'version', 'record'} for whole records and
+    {'version', 'patch'} for patches of the previous record
+    '''
+    encoded = []
+    previous = None
+    for record in records:
+        entry = {'version': record.get('version')}
+        try:
+            if previous is None:
+                raise NotRepresentable()
+            entry['patch'] = merge_patch(previous, record)
+        except NotRepresentable:
+            entry['record'] = record
+        encoded.append(entry)
+        previous = record
+    return encoded
+
+
+def delta_decode(encoded):
+    records = []
+    previous = None
+    for entry in encoded:
+        if 'record' in entry:
+            previous = entry['record']
+        else:
+            previous = apply_merge_patch(previous, entry['patch'])
+        records.append(previous)
+    return records
@@ -0,0 +1,152 @@
+import threading
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+
+from app.helpers.database import connect_collection
+
+########
+# Indexes for the query shapes issued by the API
+# Collections are referred to by their key in the MONGO_DETAILS section of the config
+# file (with a default name for the collections that have one).
+#######
+
+COLLECTIONS = {
+    'TOOLS': None,
+    'STATS': None,
+    'AGENTS_UI': 'agents_ui',
+    'STATS_COUNTERS': 'stats_counters',
+    'STATS_CONTRIBUTIONS': 'stats_contributions',
+}
+
+INDEXES = {
+    'TOOLS': [
+        # agent_metadata fallback, /agent/description
+        [('name', ASCENDING), ('type', ASCENDING)],
+        # evaluateId, read model projection
+        [('@id', ASCENDING)],
+        # /search in topics and operations (the filters are resolved by the facet index)
+        [('edam_topics', ASCENDING)],
+        [('edam_operations', ASCENDING)],
+    ],
+    'STATS': [
+        # make_query, make_batch_query, make_history_query
+        [('variable', ASCENDING), ('collection', ASCENDING), ('version', DESCENDING)],
+    ],
+    'AGENTS_UI': [
+        [('@id', ASCENDING)],
+        [('name', ASCENDING), ('type', ASCENDING)],
+        # deletes of the change stream
+        [('_agent_id', ASCENDING)],
+    ],
+    'STATS_COUNTERS': [
+        [('variable', ASCENDING), ('key', ASCENDING)],
+    ],
+    'STATS_CONTRIBUTIONS': [
+        [('@id', ASCENDING)],
+    ],
+}
+
+UNIQUE_INDEXES = {
+    'AGENTS_UI': [[('@id', ASCENDING)]],
+    'STATS_COUNTERS': [[('variable', ASCENDING), ('key', ASCENDING)]],
+    'STATS_CONTRIBUTIONS': [[('@id', ASCENDING)]],
+}
+
+# Query shapes with representative values, used to check the plans the server chooses
+QUERY_SHAPES = {}
+
+
+def register_query_shape(name, collection, filter, sort=None):
+    '''
+    Register a query shape to be checked by `explain_query_shapes`
+    '''
+    QUERY_SHAPES[name] = {
+        'collection': collection,
+        'filter': filter,
+        'sort': sort,
+    }
+
+
+register_query_shape('agent_metadata', 'AGENTS_UI', {'name': 'trimal', 'type': 'cmd'})
+register_query_shape('agent_metadata_raw', 'TOOLS', {'name': 'trimal', 'type': 'cmd'})
+register_query_shape('agent_description', 'TOOLS', {'name': 'trimal'})
+register_query_shape('evaluateId', 'TOOLS', {'@id': 'https://openebench.bsc.es/monitor/agent/bioagents:trimal/cmd'})
+register_query_shape('read_model_ids', 'AGENTS_UI', {'@id': {'$in': ['https://openebench.bsc.es/monitor/agent/bioagents:trimal/cmd']}})
+register_query_shape('make_query_latest', 'STATS', {'variable': 'agents_count', 'collection': 'agents', 'version': {'$ne': 'live'}}, [('version', DESCENDING)])
+register_query_shape('make_query_version', 'STATS', {'variable': 'agents_count', 'collection': 'agents', 'version': '1.0.0'})
+register_query_shape('stats_batch_versions', 'STATS', {'variable': {'$in': ['agents_count', 'types_count']}, 'collection': 'agents', 'version': {'$ne': 'live'}})
+register_query_shape('stats_batch', 'STATS', {'variable': {'$in': ['agents_count', 'types_count']}, 'collection': 'agents', 'version': '1.0.0'})
+register_query_shape('stats_history', 'STATS', {'variable': 'agents_count', 'collection': 'agents', 'version': {'$ne': 'live', '$gte': '1.0.0'}}, [('version', DESCENDING)])
+register_query_shape('search_topics', 'TOOLS', {'$and': [
+    {'edam_topics': {'$in': ['http://edamontology.org/topic_0080']}},
+]})
+
+
+def get_collection(key):
+    return connect_collection(key, COLLECTIONS[key])
+
+
+def ensure_indexes():
+    '''
+    Create the indexes of every collection. Already existing indexes are left as they are.
+    '''
+    for key, indexes in INDEXES.items():
+        collection = get_collection(key)
+        for keys in indexes:
+            unique = keys in UNIQUE_INDEXES.get(key, [])
+            try:
+                collection.create_index(keys, unique=unique)
+            except PyMongoError as err:
+                print(f'Error creating index {keys} in {collection.name}: {err}')
+
+
+def start_ensure_indexes():
+    thread = threading.Thread(target=ensure_indexes, name='ensure-indexes', daemon=True)
+    thread.start()
+    return thread
+
+
+def plan_stages(plan):
+    '''
+    Stages of a query plan, from the root to the leaves
+    '''
+    stages = [plan.get('stage')]
+    if 'inputStage' in plan:
+        stages.extend(plan_stages(plan['inputStage']))
+    for stage in plan.get('inputStages', []):
+        stages.extend(plan_stages(stage))
+    # plans of slot based execution (MongoDB >= 5) nest the classic plan in queryPlan
+    if 'queryPlan' in plan:
+        stages.extend(plan_stages(plan['queryPlan']))
+    return [stage for stage in stages if stage]
+
+
+def explain_query_shape(name, shape):
+    collection = get_collection(shape['collection'])
+    cursor = collection.find(shape['filter'])
+    if shape['sort']:
+        cursor = cursor.sort(shape['sort'])
+
+    explanation = cursor.explain()
+    winning_plan = explanation['queryPlanner']['winningPlan']
+    stages = plan_stages(winning_plan)
+    return {
+        'name': name,
+        'collection': collection.name,
+        'filter': str(shape['filter']),
+        'stages': stages,
+        'collscan': 'COLLSCAN' in stages,
+    }
+
+
+def explain_query_shapes():
+    '''
+    Explain every registered query shape and flag the ones resolved with a collection scan
+    '''
+    report = []
+    for name, shape in QUERY_SHAPES.items():
+        try:
+            report.append(explain_query_shape(name, shape))
+        except PyMongoError as err:
+            report.append({'name': name, 'error': str(err)})
+    return report
@@ -0,0 +1,86 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+########
+# Link classification
+# Finds the repositories and registries (GitHub, Bioconductor, Bitbucket, Galaxy,
+# Galaxy Agentshed) that an agent link points to. Each URL is parsed once and its
+# classification is cached, so links repeated across agents and requests are free.
+#######
+
+LINK_PATTERNS = {
+    'github': r'(http(s)?:\/\/)?(www\.)?github\.com\/[A-Za-z0-9_-]+\/[A-Za-z0-9_-]+',
+    'bioconductor': r'(http(s)?:\/\/)?(www\.)?bioconductor\.org\/packages\/[A-Za-z0-9_-]+\/bioc\/html\/[A-Za-z0-9_-]+',
+    'bitbucket': r'(http(s)?:\/\/)?(www\.)?bitbucket\.org\/[A-Za-z0-9_-]+\/[A-Za-z0-9_-]+',
+    'galaxy': r'(http(s)?:\/\/)?(www\.)?usegalaxy\.eu',
+    'agentshed': r'(http(s)?:\/\/)?(www\.)?agentshed\.galaxyproject\.org',
+}
+
+# Host of each kind of link. Links that do not contain any of them are not matched.
+LINK_HOSTS = {
+    'github': 'github.com',
+    'bioconductor': 'bioconductor.org',
+    'bitbucket': 'bitbucket.org',
+    'galaxy': 'usegalaxy.eu',
+    'agentshed': 'agentshed.galaxyproject.org',
+}
+
+# Suffix added to the matched text of each kind of link
+LINK_SUFFIXES = {
+    'bioconductor': '.html',
+}
+
+LINK_REGEXES = {kind: re.compile(pattern) for kind, pattern in LINK_PATTERNS.items()}
+
+COMBINED_LINK_REGEX = re.compile('|'.join(f'(?P<{kind}>{pattern})' for kind, pattern in LINK_PATTERNS.items()))
+
+HOST_KINDS = {}
+for kind, host in LINK_HOSTS.items():
+    HOST_KINDS[host] = kind
+    HOST_KINDS[f'www.{host}'] = kind
+
+
+def link_host(link):
+    try:
+        return urlsplit(link).hostname
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def classify_link(link):
+    '''
+    Return the (kind, url) pairs found in a link, in the order of LINK_PATTERNS.
+    A link whose host is one of LINK_HOSTS and mentions no other is matched with
+    the pattern of that host only. Links mentioning several hosts are scanned once
+    with the combined pattern.
+    '''
+    mentioned = [kind for kind, host in LINK_HOSTS.items() if host in link]
+    if not mentioned:
+        return ()
+
+    kind = HOST_KINDS.get(link_host(link))
+    if kind and mentioned == [kind]:
+        match = LINK_REGEXES[kind].search(link)
+        if not match:
+            return ()
+        return ((kind, match.group(0) + LINK_SUFFIXES.get(kind, '')),)
+
+    found = {}
+    for match in COMBINED_LINK_REGEX.finditer(link):
+        kind = match.lastgroup
+        if kind not in found:
+            found[kind] = match.group(0) + LINK_SUFFIXES.get(kind, '')
+
+    return tuple((kind, found[kind]) for kind in LINK_PATTERNS if kind in found)
+
+
+def find_link(link, kind):
+    '''
+    URL of the given kind in a link, or None
+    '''
+    for found_kind, url in classify_link(link):
+        if found_kind == kind:
+            return url
+    return None
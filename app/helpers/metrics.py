@@ -0,0 +1,272 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from starlette.routing import Match
+
+########
+# Prometheus metrics
+# Minimal registry of counters, gauges and histograms rendered in the Prometheus text
+# format by GET /metrics. Every series is a few numbers updated under the lock of its
+# metric, so recording costs about a microsecond and can stay on in production.
+# Label values that come from outside (hosts of probed URLs) are bounded, past
+# MAX_LABEL_VALUES they are reported as `other`.
+#######
+
+# seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+MAX_LABEL_VALUES = 200
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def samples(self):
+        '''
+        (suffix, label values, extra labels, value) of every series
+        '''
+        with self.lock:
+            return [('', key, (), value) for key, value in sorted(self.series.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(self.labelnames, key, extra)} {format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.series.get(self.key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.series[self.key(labels)] = value
+
+    def value(self, **labels):
+        return self.series.get(self.key(labels), 0)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        # counts per bucket (not cumulative), the last one is +Inf
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self.series.get(self.key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self.series.items())
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('_bucket', key, (('le', format_value(float(bound))),), cumulative))
+            samples.append(('_sum', key, (), total))
+            samples.append(('_count', key, (), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f'Metric {metric.name} already registered')
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+class BoundedLabel:
+    '''
+    Keeps the first `limit` values of a label, the next ones become `other`
+    '''
+    def __init__(self, limit=MAX_LABEL_VALUES):
+        self.limit = limit
+        self.values = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        if value in self.values:
+            return value
+        with self.lock:
+            if len(self.values) < self.limit:
+                self.values.add(value)
+                return value
+        return 'other'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Latency of the HTTP requests', ('method', 'route', 'status'))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'http_requests_in_flight', 'HTTP requests being served', ('method', 'route'))
+MONGO_OPERATION_DURATION = REGISTRY.histogram(
+    'mongo_operation_duration_seconds', 'Duration of the database operations, per query shape', ('shape',))
+URL_PROBES = REGISTRY.counter(
+    'url_probes_total', 'URL probes of the FAIR indicators, per host and outcome', ('host', 'outcome'))
+URL_PROBE_DURATION = REGISTRY.histogram(
+    'url_probe_duration_seconds', 'Latency of the URL probes of the FAIR indicators', ('host',))
+INDICATOR_DURATION = REGISTRY.histogram(
+    'fair_indicator_duration_seconds', 'Time to compute each FAIR indicator', ('indicator',))
+
+probe_host = BoundedLabel()
+
+
+def url_host(url):
+    try:
+        host = urlparse(str(url)).hostname
+    except ValueError:
+        host = None
+    return probe_host(host or 'invalid')
+
+
+def probe_outcome(status_code=None, error=None):
+    '''
+    `2xx`...`5xx` for responses, `timeout` or `error` for failed requests
+    '''
+    if status_code is not None:
+        return f'{status_code // 100}xx'
+    if error is not None and 'timeout' in type(error).__name__.lower():
+        return 'timeout'
+    return 'error'
+
+
+def route_template(scope):
+    '''
+    Path template of the route matching the request (e.g. /stats/{variable}), so that
+    the number of series does not depend on the paths requested
+    '''
+    app = scope.get('app')
+    routes = getattr(getattr(app, 'router', None), 'routes', [])
+    partial = None
+    for route in routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or 'unmatched'
+
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware recording the latency and the in-flight requests of every route
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        route = route_template(scope)
+        status = {'code': 500}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec(method=method, route=route)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=method, route=route, status=str(status['code']))
@@ -0,0 +1,160 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+
+########
+# Profiles of FAIR evaluations
+# A profile is a tree of timed spans (preparation, instance, each indicator, scores)
+# with the URL probes made inside each span. The profile of the evaluation being
+# computed is kept in a context variable, so the indicators and the probes do not need
+# to pass it around; when no profile is active, spans and probes cost nothing.
+# Besides profile=true, a percentage of the evaluations (FAIR_PROFILE_SAMPLE_RATE) is
+# profiled and appended to a local JSON Lines file (FAIR_PROFILE_STORE), rotated like a
+# log file once it reaches FAIR_PROFILE_STORE_MAX_BYTES.
+#######
+
+# percentage of evaluations profiled and stored
+FAIR_PROFILE_SAMPLE_RATE = float(os.getenv('FAIR_PROFILE_SAMPLE_RATE', 0))
+FAIR_PROFILE_STORE = os.getenv('FAIR_PROFILE_STORE', './fair_profiles.jsonl')
+# size of the store before it is rotated, and rotated files kept (store.1 is the newest)
+FAIR_PROFILE_STORE_MAX_BYTES = int(os.getenv('FAIR_PROFILE_STORE_MAX_BYTES', 10 * 1024 * 1024))
+FAIR_PROFILE_STORE_BACKUPS = int(os.getenv('FAIR_PROFILE_STORE_BACKUPS', 3))
+
+current_profile = ContextVar('fair_profile', default=None)
+
+
+def new_span(name):
+    return {'name': name, 'seconds': 0.0, 'children': []}
+
+
+class Profile:
+    def __init__(self, name='evaluation'):
+        self.root = new_span(name)
+        self.stack = [self.root]
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        node = new_span(name)
+        self.stack[-1]['children'].append(node)
+        self.stack.append(node)
+        start = time.perf_counter()
+        try:
+            yield node
+        finally:
+            node['seconds'] = round(time.perf_counter() - start, 6)
+            self.stack.pop()
+
+    def probe(self, url, seconds, status=None, outcome=None):
+        self.stack[-1].setdefault('probes', []).append({
+            'url': str(url),
+            'seconds': round(seconds, 6),
+            'status': status,
+            'outcome': outcome,
+        })
+
+    def finish(self):
+        self.root['seconds'] = round(time.perf_counter() - self.start, 6)
+        return self.root
+
+
+@contextmanager
+def profiling(enabled=True):
+    '''
+    Profile the code run inside the block. Yields the profile (None if not enabled).
+    '''
+    if not enabled:
+        yield None
+        return
+    profile = Profile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+
+@contextmanager
+def span(name):
+    '''
+    Span of the active profile, if any
+    '''
+    profile = current_profile.get()
+    if profile is None:
+        yield None
+        return
+    with profile.span(name) as node:
+        yield node
+
+
+def record_probe(url, seconds, status=None, outcome=None):
+    profile = current_profile.get()
+    if profile is not None:
+        profile.probe(url, seconds, status, outcome)
+
+
+def should_sample(rate=None):
+    rate = FAIR_PROFILE_SAMPLE_RATE if rate is None else rate
+    return rate > 0 and random.random() * 100 < rate
+
+
+class ProfileStore:
+    '''
+    Profiles appended to a JSON Lines file. When a profile would take the file past
+    `max_bytes`, the file is renamed to path.1 (path.1 to path.2, ...) and the oldest
+    of the `backups` rotated files is dropped.
+    '''
+    def __init__(self, path, max_bytes=FAIR_PROFILE_STORE_MAX_BYTES, backups=FAIR_PROFILE_STORE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+
+    def _rotate(self, size):
+        try:
+            current = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if current == 0 or current + size <= self.max_bytes:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+    def add(self, tree, **context):
+        record = {
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+            **context,
+            'profile': tree,
+        }
+        line = json.dumps(record, default=str) + '\n'
+        # a sampled profile is not worth failing the evaluation
+        try:
+            with self.lock:
+                self._rotate(len(line.encode()))
+                with open(self.path, 'a') as f:
+                    f.write(line)
+        except OSError as err:
+            print(f'Could not store the profile: {err}')
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+
+@lru_cache(maxsize=None)
+def get_profile_store():
+    return ProfileStore(FAIR_PROFILE_STORE)
@@ -0,0 +1,197 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+from app.helpers.database import connect_DB
+from app.constants import ONLY_GALAXY_METADATA
+from app.helpers import changes
+from app.helpers.cache import invalidate_catalogue
+
+########
+# Publication text index
+# Inverted index of the words in the titles and abstracts of the publications of every
+# agent: sorted vocabulary -> agents (by ordinal). Each term of a query matches the
+# words it is a prefix of (a range of the vocabulary) and the agents must match every
+# term. Phrases are checked in the database, only for the candidate agents.
+# Until the index is ready, the same matching is done in the database with the
+# expressions of `database_expressions`, so results do not depend on the index.
+#######
+
+PUBLICATION_FIELDS = {
+    'title': 'publication_title',
+    'abstract': 'publication_abstract',
+}
+
+INDEX_FIELDS = {
+    '_id': 0,
+    '@id': 1,
+    'source': 1,
+    'publication.title': 1,
+    'publication.abstract': 1,
+}
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# shorter words only match whole words, their prefix ranges are too large
+MIN_PREFIX_LENGTH = 3
+
+# the index is rebuilt from the database: wait for bursts of changes to end
+REBUILD_DELAY = 30.0
+
+
+def words(text):
+    return WORD_PATTERN.findall(str(text).casefold())
+
+
+def word_expression(word):
+    '''
+    MongoDB expression matching the texts with a word that `FieldIndex.matching(word)` matches
+    '''
+    pattern = r'\b' + re.escape(word)
+    if len(word) < MIN_PREFIX_LENGTH:
+        pattern += r'\b'
+    return {'$regex': pattern, '$options': 'i'}
+
+
+def database_expressions(query):
+    '''
+    MongoDB expressions that a publication field must match to match the literal `query`
+    as in the index (an empty list if the query has no words: nothing matches)
+    '''
+    expressions = [word_expression(word) for term in query.terms for word in words(term.text)]
+    if expressions and any(term.phrase for term in query.terms):
+        expressions += query.expressions()
+    return expressions
+
+
+def publication_texts(agent, field):
+    texts = []
+    for publication in agent.get('publication') or []:
+        if isinstance(publication, dict) and publication.get(field):
+            texts.append(str(publication[field]))
+    return texts
+
+
+class FieldIndex:
+    def __init__(self, postings):
+        self.vocabulary = sorted(postings)
+        self.postings = [postings[word] for word in self.vocabulary]
+
+    def matching(self, word):
+        '''
+        Ordinals of the agents with a word starting with `word`
+        '''
+        if len(word) < MIN_PREFIX_LENGTH:
+            i = bisect_left(self.vocabulary, word)
+            if i < len(self.vocabulary) and self.vocabulary[i] == word:
+                return set(self.postings[i])
+            return set()
+
+        lo = bisect_left(self.vocabulary, word)
+        hi = bisect_left(self.vocabulary, word + '\uffff', lo)
+        ordinals = set()
+        for i in range(lo, hi):
+            ordinals.update(self.postings[i])
+        return ordinals
+
+    def search(self, terms):
+        '''
+        Ordinals of the agents matching every word of every term
+        '''
+        result = None
+        for term in terms:
+            for word in words(term.text):
+                ordinals = self.matching(word)
+                result = ordinals if result is None else result & ordinals
+                if not result:
+                    return set()
+        return result or set()
+
+
+class PublicationIndex:
+    def __init__(self, agents_collection=None):
+        self.agents_collection = agents_collection
+        self.ids = []
+        self.fields = {field: FieldIndex({}) for field in PUBLICATION_FIELDS}
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.pending_rebuild = None
+
+    def build(self, agents):
+        ids = []
+        postings = {field: {} for field in PUBLICATION_FIELDS}
+        for agent in agents:
+            if agent.get('source') == ONLY_GALAXY_METADATA:
+                continue
+            ordinal = None
+            for field in PUBLICATION_FIELDS:
+                agent_words = set()
+                for text in publication_texts(agent, field):
+                    agent_words.update(words(text))
+                if not agent_words:
+                    continue
+                if ordinal is None:
+                    ordinal = len(ids)
+                    ids.append(agent['@id'])
+                for word in agent_words:
+                    postings[field].setdefault(word, array('i')).append(ordinal)
+
+        fields = {field: FieldIndex(field_postings) for field, field_postings in postings.items()}
+        self.ids, self.fields = ids, fields
+        self.loaded = True
+
+    def search(self, field, query):
+        '''
+        Ids of the agents whose publications match the literal `query` in `field`
+        (title or abstract), in index order
+        '''
+        ordinals = self.fields[field].search(query.terms) if query.terms else set()
+        ids = [self.ids[ordinal] for ordinal in sorted(ordinals)]
+        if ids and any(term.phrase for term in query.terms):
+            ids = self.check_phrases(field, query, ids)
+        return ids
+
+    def check_phrases(self, field, query, ids):
+        conditions = [{'@id': {'$in': ids}}]
+        conditions += [{f'publication.{field}': expression} for expression in database_expressions(query)]
+        found = {agent['@id'] for agent in self.agents_collection.find({'$and': conditions}, {'_id': 0, '@id': 1})}
+        return [id_ for id_ in ids if id_ in found]
+
+    def load(self):
+        with self.lock:
+            self.pending_rebuild = None
+            self.build(self.agents_collection.find({'publication': {'$exists': True, '$ne': []}}, INDEX_FIELDS))
+        print(f'Publication index: {len(self.ids)} agents with publications indexed')
+        invalidate_catalogue()
+
+    def refresh(self, ids=None):
+        '''
+        Rebuild in the background after a change (the current index keeps serving meanwhile)
+        '''
+        if self.pending_rebuild is None:
+            self.pending_rebuild = threading.Timer(REBUILD_DELAY, self.load)
+            self.pending_rebuild.daemon = True
+            self.pending_rebuild.start()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+
+@lru_cache(maxsize=None)
+def get_publication_index():
+    agents_collection, stats = connect_DB()
+    return PublicationIndex(agents_collection)
+
+
+def start_publication_index():
+    '''
+    Build the publication index in the background and rebuild it when agents change
+    '''
+    publication_index = get_publication_index()
+    thread = threading.Thread(target=publication_index.load, name='publication-index', daemon=True)
+    thread.start()
+    changes.subscribe(publication_index.refresh)
+    return publication_index
@@ -0,0 +1,104 @@
+import re
+
+# Identifiers that make two publication entries the same publication
+PUBLICATION_IDENTIFIERS = ['title', 'pmcid', 'pmid', 'doi']
+
+TAG_PATTERN = re.compile(r'(<.*?>)')
+
+
+def clean_title(title):
+    '''
+    Remove final points and html tags from a publication title
+    '''
+    return TAG_PATTERN.sub('', title.rstrip('.'))
+
+
+def normalize_identifier(field, value):
+    '''
+    Normalize an identifier so that equivalent ids compare equal:
+    - final points are removed (necessary specially in titles)
+    - DOIs are case insensitive
+    - tags are removed from titles
+    '''
+    value = str(value).rstrip('.')
+    if field == 'doi':
+        value = value.upper()
+    elif field == 'title':
+        value = TAG_PATTERN.sub('', value)
+    return value
+
+
+def clean_empty_publications(publications):
+    '''
+    Remove empty fields from publications and publications left empty
+    '''
+    new_pubs = []
+    for pub in publications:
+        new_pub = {k: v for k, v in pub.items() if v}
+        if new_pub:
+            new_pubs.append(new_pub)
+
+    return new_pubs
+
+
+def merge_publications(publications, identifiers=PUBLICATION_IDENTIFIERS):
+    '''
+    Merge publications that share any normalized identifier.
+    Publications are linked in a single pass using a union-find over a hash of
+    (identifier, normalized value) pairs, so the merge is linear in the number
+    of publications. Merges are transitive: if A and B share a DOI and B and C
+    share a title, A, B and C end up in one publication.
+    The merged publication keeps the position of its first member and its
+    fields are combined in the original order (later entries win).
+    '''
+    parent = list(range(len(publications)))
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        # path compression
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    seen = {}
+    for index, pub in enumerate(publications):
+        for field in identifiers:
+            value = pub.get(field)
+            if value is None:
+                continue
+            key = (field, normalize_identifier(field, value))
+            if key in seen:
+                a, b = find(seen[key]), find(index)
+                if a != b:
+                    # keep the smallest index as root to preserve order
+                    if b < a:
+                        a, b = b, a
+                    parent[b] = a
+            else:
+                seen[key] = index
+
+    groups = {}
+    for index, pub in enumerate(publications):
+        root = find(index)
+        if root in groups:
+            groups[root] = {**groups[root], **pub}
+        else:
+            groups[root] = pub
+
+    return [groups[root] for root in sorted(groups)]
+
+
+def deduplicate_publications(publications):
+    '''
+    Clean, merge and tidy up the publications of an agent
+    '''
+    publications = clean_empty_publications(publications)
+    publications = merge_publications(publications)
+
+    for pub in publications:
+        if pub.get('title'):
+            pub['title'] = clean_title(pub['title'])
+
+    return publications
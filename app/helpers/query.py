@@ -0,0 +1,184 @@
+import os
+import re
+
+import regex as regex_module
+
+########
+# Search query compilation
+# The `q` of /search is split into literal terms: words, "quoted phrases" and prefixes
+# (`word*`, matched at the start of a word). Terms are escaped before being turned into
+# regular expressions, so matching is linear in the searched text, both here (EDAM
+# labels) and in MongoDB. Raw regular expressions are only accepted with `regex=true`,
+# after a guard against catastrophic backtracking, and are run with a timeout.
+#######
+
+MAX_QUERY_LENGTH = 256
+MAX_TERMS = 8
+
+# bound of the database time of each search query (ms)
+SEARCH_MAX_TIME_MS = int(os.getenv('SEARCH_MAX_TIME_MS', 2000))
+# bound of each match of a raw regular expression in Python (s)
+REGEX_TIMEOUT = float(os.getenv('SEARCH_REGEX_TIMEOUT', 0.05))
+
+TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+BACKREFERENCE_PATTERN = re.compile(r'\\[1-9]|\(\?P=|\\k<')
+
+QUANTIFIERS = ('*', '+', '{')
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Term:
+    def __init__(self, text, phrase=False, prefix=False):
+        self.text = text
+        self.phrase = phrase
+        self.prefix = prefix
+
+    def pattern(self):
+        # words of a phrase may be separated by any whitespace
+        pattern = r'\s+'.join(re.escape(word) for word in self.text.split())
+        if self.prefix:
+            pattern = r'\b' + pattern
+        return pattern
+
+    def __eq__(self, other):
+        return (self.text, self.phrase, self.prefix) == (other.text, other.phrase, other.prefix)
+
+    def __repr__(self):
+        return f'Term({self.text!r}, phrase={self.phrase}, prefix={self.prefix})'
+
+
+def check_length(q):
+    if len(q) > MAX_QUERY_LENGTH:
+        raise QueryError(f'The query is too long (max. {MAX_QUERY_LENGTH} characters)')
+
+
+def tokenize(q):
+    '''
+    Terms of a query. Quoted text is a phrase, a trailing * makes a word a prefix.
+    '''
+    check_length(q)
+    terms = []
+    for match in TOKEN_PATTERN.finditer(q):
+        phrase, word = match.groups()
+        if phrase is not None:
+            if phrase.strip():
+                terms.append(Term(' '.join(phrase.split()), phrase=True))
+            continue
+        # stray quotes are not operators
+        word = word.strip('"')
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append(Term(word, prefix=prefix))
+
+    if len(terms) > MAX_TERMS:
+        raise QueryError(f'Too many terms in the query (max. {MAX_TERMS})')
+    return terms
+
+
+class LiteralQuery:
+    '''
+    Text matches when it contains every term (case insensitive)
+    '''
+    # can be answered by the word indexes
+    literal = True
+
+    def __init__(self, q):
+        self.text = q
+        self.terms = tokenize(q)
+        self.patterns = [term.pattern() for term in self.terms]
+        self.regexes = [re.compile(pattern, re.I) for pattern in self.patterns]
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def matches(self, text):
+        return all(regex.search(text) for regex in self.regexes)
+
+    def expressions(self):
+        '''
+        MongoDB expressions that a field must match, one per term
+        '''
+        return [{'$regex': pattern, '$options': 'i'} for pattern in self.patterns]
+
+
+def nested_quantifier(pattern):
+    '''
+    Whether a quantified group contains a quantifier or an alternation, as in (a+)+ or
+    (a|aa)*: the usual source of exponential backtracking
+    '''
+    # for each open group: whether it contains a quantifier or an alternation
+    groups = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+            # a ] right after [ or [^ is a literal
+            if pattern[i + 1:i + 2] == '^':
+                i += 1
+            if pattern[i + 1:i + 2] == ']':
+                i += 1
+        elif char == '(':
+            groups.append(False)
+        elif char == ')' and groups:
+            repeating = groups.pop()
+            if repeating and pattern[i + 1:i + 2] in QUANTIFIERS:
+                return True
+            if groups:
+                groups[-1] = groups[-1] or repeating
+        elif char in QUANTIFIERS or char == '|':
+            if groups:
+                groups[-1] = True
+        i += 1
+    return False
+
+
+class RegexQuery:
+    '''
+    Raw regular expression, for `regex=true`
+    '''
+    literal = False
+
+    def __init__(self, q):
+        check_length(q)
+        self.text = q
+        if BACKREFERENCE_PATTERN.search(q):
+            raise QueryError('Backreferences are not allowed in regular expressions')
+        if nested_quantifier(q):
+            raise QueryError('Nested quantifiers are not allowed in regular expressions')
+        try:
+            self.regex = regex_module.compile(q, regex_module.I)
+        except Exception as err:
+            raise QueryError(f'Invalid regular expression: {err}')
+
+    def __bool__(self):
+        return bool(self.text)
+
+    def matches(self, text):
+        try:
+            return bool(self.regex.search(text, timeout=REGEX_TIMEOUT))
+        except TimeoutError:
+            raise QueryError('The regular expression took too long to match')
+
+    def expressions(self):
+        return [{'$regex': self.text, '$options': 'i'}]
+
+
+def compile_query(q, regex=False):
+    '''
+    Compile the `q` of /search. A missing query compiles to an empty (falsy) query.
+    '''
+    q = (q or '').strip()
+    if regex:
+        return RegexQuery(q)
+    return LiteralQuery(q)
@@ -0,0 +1,181 @@
+import threading
+from functools import lru_cache
+from pymongo import ReplaceOne
+
+from app.helpers.database import connect_DB, connect_collection
+from app.helpers.utils import prepareAgentMetadata, prepare_sources_labels
+from app.helpers import changes
+from app.helpers.cache import invalidate_catalogue
+
+########
+# UI read model
+# Agents are stored in `agents_ui` already prepared for the UI, so the request
+# handlers serve them as they are instead of preparing raw documents on every request.
+#######
+
+# Increase whenever the preparation functions change: projections built with an
+# older version are considered stale and rebuilt the next time they are read.
+PROJECTION_VERSION = 3
+
+VERSION_FIELD = '_projection_version'
+
+# `_id` of the raw agent, to know which agent a delete of the change stream was about
+AGENT_ID_FIELD = '_agent_id'
+
+
+def project_agent(agent):
+    '''
+    Build the UI document of a raw agent
+    '''
+    agent_id = agent.get('_id')
+    agent = prepareAgentMetadata(agent)
+    agent = prepare_sources_labels(agent)
+    agent[VERSION_FIELD] = PROJECTION_VERSION
+    agent[AGENT_ID_FIELD] = agent_id
+    return agent
+
+
+def strip_projection(document):
+    document.pop('_id', None)
+    document.pop(VERSION_FIELD, None)
+    document.pop(AGENT_ID_FIELD, None)
+    return document
+
+
+class AgentProjector:
+    '''
+    Maintains the `agents_ui` read model from the raw agents collection
+    '''
+    def __init__(self, agents_collection, agents_ui, batch_size=500):
+        self.agents_collection = agents_collection
+        self.agents_ui = agents_ui
+        self.batch_size = batch_size
+        # called with the ids of the projections written (None after a full rebuild)
+        self.listeners = []
+
+    def _write(self, documents):
+        requests = [ReplaceOne({'@id': doc['@id']}, doc, upsert=True) for doc in documents]
+        if requests:
+            self.agents_ui.bulk_write(requests, ordered=False)
+
+    def _project_cursor(self, cursor):
+        '''
+        Project the raw agents of a cursor, writing them in batches. Returns the projected documents.
+        '''
+        projected = []
+        batch = []
+        for agent in cursor:
+            try:
+                document = project_agent(agent)
+            except Exception as err:
+                print(f'Error projecting agent {agent.get("@id")}: {err}')
+                continue
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                projected.extend(batch)
+                batch = []
+        self._write(batch)
+        projected.extend(batch)
+        return projected
+
+    def project(self, ids=None):
+        '''
+        (Re)build the projections of the agents in `ids`, or of every agent if `ids` is None.
+        Projections of agents that no longer exist are removed.
+        '''
+        if ids is None:
+            projected = self._project_cursor(self.agents_collection.find({}))
+            self.agents_ui.delete_many({'@id': {'$nin': [doc['@id'] for doc in projected]}})
+        else:
+            ids = list(ids)
+            projected = self._project_cursor(self.agents_collection.find({'@id': {'$in': ids}}))
+            found = {doc['@id'] for doc in projected}
+            missing = [id_ for id_ in ids if id_ not in found]
+            if missing:
+                self.agents_ui.delete_many({'@id': {'$in': missing}})
+        self._notify(ids)
+        return projected
+
+    def _notify(self, ids):
+        for listener in self.listeners:
+            try:
+                listener(ids)
+            except Exception as err:
+                print(f'Error notifying projection to {listener.__name__}: {err}')
+
+    def rebuild_stale(self):
+        '''
+        Project the agents whose projection is missing or was built by an older version,
+        and remove the projections of agents that no longer exist
+        '''
+        current = set(self.agents_ui.distinct('@id', {VERSION_FIELD: PROJECTION_VERSION}))
+        existing = {doc['@id'] for doc in self.agents_collection.find({}, {'_id': 0, '@id': 1})}
+        stale = [id_ for id_ in existing if id_ not in current]
+        orphans = [id_ for id_ in self.agents_ui.distinct('@id') if id_ not in existing]
+        # project() removes the projections of the ids it does not find
+        ids = stale + orphans
+        for i in range(0, len(ids), self.batch_size):
+            self.project(ids[i:i + self.batch_size])
+        print(f'Read model: {len(stale)} agents projected, {len(orphans)} removed')
+        invalidate_catalogue()
+
+    def agent_id_of(self, raw_id):
+        '''
+        `@id` of the agent whose raw document has the `_id` `raw_id` (None if not projected)
+        '''
+        document = self.agents_ui.find_one({AGENT_ID_FIELD: raw_id}, {'_id': 0, '@id': 1})
+        return document['@id'] if document else None
+
+    def on_change(self, ids):
+        self.project(ids)
+        invalidate_catalogue()
+
+    def find_one(self, query):
+        '''
+        Return the UI document matching `query`, projecting it on the fly if it is missing or stale
+        '''
+        document = self.agents_ui.find_one(query)
+        if document and document.get(VERSION_FIELD) == PROJECTION_VERSION:
+            return strip_projection(document)
+
+        agent = self.agents_collection.find_one(query)
+        if not agent:
+            return None
+        projected = self.project([agent['@id']])
+        return strip_projection(projected[0]) if projected else None
+
+    def get_many(self, ids):
+        '''
+        Return a dict `@id` -> UI document for the given ids, projecting missing or stale ones
+        '''
+        documents = {}
+        for document in self.agents_ui.find({'@id': {'$in': list(ids)}}):
+            if document.get(VERSION_FIELD) == PROJECTION_VERSION:
+                documents[document['@id']] = strip_projection(document)
+
+        missing = [id_ for id_ in ids if id_ not in documents]
+        if missing:
+            for document in self.project(missing):
+                documents[document['@id']] = strip_projection(document)
+
+        return documents
+
+
+@lru_cache(maxsize=None)
+def get_projector():
+    agents_collection, stats = connect_DB()
+    agents_ui = connect_collection('AGENTS_UI', 'agents_ui')
+    return AgentProjector(agents_collection, agents_ui)
+
+
+def start_projector():
+    '''
+    Bring the read model up to date in the background and keep it updated on changes
+    '''
+    projector = get_projector()
+    changes.subscribe(projector.on_change)
+    changes.start_watcher(projector.agents_collection, projector.agent_id_of)
+    thread = threading.Thread(target=projector.rebuild_stale, name='agents-ui-projector', daemon=True)
+    thread.start()
+    return projector
@@ -1,4 +1,7 @@
 from app.helpers.database import connect_DB 
+from app.helpers.metrics import MONGO_OPERATION_DURATION
+from app.constants import LIVE_STATS_VERSION
+from app.helpers.stats_engine import ENGINE_COLLECTION, VARIABLES as ENGINE_VARIABLES
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 from app.helpers.database import connect_DB
@@ -38,14 +41,24 @@ def query(func):
 def clean_quotations(string: str) -> str:
     return string.replace('"', '').replace("'", '')
 
-def prep_parameters(parameters: dict) -> tuple:
+# `collection` of the stats written by the import pipeline
+IMPORTED_COLLECTION = 'agents'
+
+def default_collection(variable_name: str) -> str:
+    '''
+    Stats served when no collection is stated: the ones computed by the API itself
+    (stats_engine) for the variables it computes, the imported ones for the rest
+    '''
+    return ENGINE_COLLECTION if variable_name in ENGINE_VARIABLES else IMPORTED_COLLECTION
+
+def prep_parameters(parameters: dict, variable_name: str = None) -> tuple:
     '''
     If version not stated, assign `latest` version
-    If collection not stated, assign `agents` collection
+    If collection not stated, assign the default collection of the variable
     '''
     try:
         version = clean_quotations(parameters.get('version', 'latest'))
-        collection = clean_quotations(parameters.get('collection', 'agents'))
+        collection = clean_quotations(parameters.get('collection', default_collection(variable_name)))
     except Exception as err:
         raise HTTPException(status_code=400, detail=(
             'An error occurred while trying to read query parameters. '
@@ -56,16 +69,96 @@ def prep_parameters(parameters: dict) -> tuple:
 
 @query
 async def make_query(variable_name: str, parameters: dict):
-    collection, version = prep_parameters(parameters)
-    if version == 'latest':
-        record = list(stats.find({
-            "variable": variable_name,
-            "collection": collection,
-        }).sort("version", -1).limit(1))
-    else:
-        record = list(stats.find({
-            "variable": variable_name,
+    collection, version = prep_parameters(parameters, variable_name)
+    with MONGO_OPERATION_DURATION.time(shape='make_query'):
+        if version == 'latest':
+            record = list(stats.find({
+                "variable": variable_name,
+                "collection": collection,
+                "version": {"$ne": LIVE_STATS_VERSION},
+            }).sort("version", -1).limit(1))
+        else:
+            record = list(stats.find({
+                "variable": variable_name,
+                "collection": collection,
+                "version": version
+            }))
+    return record
+
+def consistent_version(rows, names):
+    '''
+    Latest version holding every variable in `names`, given the (variable, version) rows
+    of their records. If no version holds them all, the latest of those holding the most.
+    '''
+    variables_of = {}
+    for row in rows:
+        variables_of.setdefault(row['version'], set()).add(row['variable'])
+    if not variables_of:
+        return None
+    return max(variables_of, key=lambda version: (len(variables_of[version] & set(names)), version))
+
+async def make_batch_query(variable_names: list, parameters: dict):
+    '''
+    Records of several variables, all of the same version: the given one, or the latest
+    version for which every variable has a record. Variables are read from their
+    collection (one version per collection). Variables without records are missing.
+    '''
+    by_collection = {}
+    for variable_name in variable_names:
+        collection, version = prep_parameters(parameters, variable_name)
+        by_collection.setdefault(collection, []).append(variable_name)
+
+    results = {}
+    for collection, names in by_collection.items():
+        match = {
+            "variable": {"$in": names},
             "collection": collection,
-            "version": version
-        }))
-    return record
\ No newline at end of file
+        }
+        try:
+            if version == 'latest':
+                # versions of the variables (only those two fields), then their records of a single version
+                rows = stats.find(dict(match, version={"$ne": LIVE_STATS_VERSION}), {'_id': 0, 'variable': 1, 'version': 1})
+                latest = consistent_version(rows, names)
+                if latest is None:
+                    continue
+                match["version"] = latest
+            else:
+                match["version"] = version
+            records = list(stats.find(match))
+        except Exception as err:
+            raise HTTPException(status_code=400, detail=str(err))
+
+        for record in records:
+            record.pop('_id', None)
+            results.setdefault(record['variable'], record)
+    return results
+
+
+# maximum number of versions in a stats history
+MAX_HISTORY_VERSIONS = 1000
+
+async def make_history_query(variable_name: str, parameters: dict):
+    '''
+    Records of a variable for every version between `from` and `to` (both optional and
+    included), oldest first, in a single range query
+    '''
+    collection, version = prep_parameters(parameters, variable_name)
+    # the live version is not a point of the history
+    versions = {"$ne": LIVE_STATS_VERSION}
+    if parameters.get('from'):
+        versions["$gte"] = clean_quotations(parameters['from'])
+    if parameters.get('to'):
+        versions["$lte"] = clean_quotations(parameters['to'])
+
+    query = {
+        "variable": variable_name,
+        "collection": collection,
+        "version": versions,
+    }
+    try:
+        # the newest versions if there are too many
+        records = list(stats.find(query, {'_id': 0}).sort("version", -1).limit(MAX_HISTORY_VERSIONS))
+    except Exception as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    records.reverse()
+    return records
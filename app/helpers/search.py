@@ -1,135 +1,193 @@
-from app.helpers.utils import prepareAgentMetadata
 from app.helpers.database import connect_DB
+from app.helpers.read_model import get_projector
+from app.helpers.facets import get_facet_index, FILTER_FACETS
+from app.helpers.query import QueryError, SEARCH_MAX_TIME_MS, compile_query
+from app.helpers.EDAM_forFE import EDAMDict
+from app.helpers.edam_hierarchy import get_edam_hierarchy
+from app.helpers.fuzzy import get_fuzzy_index
+from app.helpers.publication_index import get_publication_index, database_expressions, PUBLICATION_FIELDS
+from app.helpers.metrics import MONGO_OPERATION_DURATION
+from app.constants import ONLY_GALAXY_METADATA
+from pymongo.errors import ExecutionTimeout
 
 agents_collection, stats = connect_DB()
 
-def search_input(agents, counts, search, label):
-    results = agents_collection.find(search) 
-    results = list(results)
-    results.reverse()
-    for agent in results:
-        # skip agents that are only in galaxy_metadata
-        if agent['source'] == ['galaxy_metadata']:
-            continue
-        else:
-            entry = prepareAgentMetadata(agent)
-            if entry['@id'] in agents.keys():
-                agents[entry['@id']]['foundIn'].append(label)
-            else:
-                entry['foundIn'] = [label]
-                agents[entry['@id']] = entry
+# fields searched when searchIn is not given
+SEARCH_FIELDS = ['name', 'description', 'topics', 'operations']
+
+PAGE_SIZE = 10
+
+# filters with EDAM terms
+EDAM_FILTERS = ['topics', 'operations']
+
 
+def search_input(agents, counts, search, label, allowed=None):
+    '''
+    Add the agents matching `search` to `agents` (`@id` -> labels of the fields where it
+    was found). If given, `allowed` is the bitmap of the facet index with the agents that
+    pass the filters.
+    '''
+    # only ids are read here, the documents of each page come from the read model
+    results = agents_collection.find(search, {'_id': 0, '@id': 1, 'source': 1}).max_time_ms(SEARCH_MAX_TIME_MS)
+    try:
+        with MONGO_OPERATION_DURATION.time(shape='search_input'):
+            results = list(results)
+    except ExecutionTimeout:
+        raise QueryError('The search took too long, try a more specific query')
+    results.reverse()
+    # skip agents that are only in galaxy_metadata
+    ids = [agent['@id'] for agent in results if agent['source'] != ONLY_GALAXY_METADATA]
+    return add_found(agents, counts, ids, label, allowed)
+
+def add_found(agents, counts, ids, label, allowed=None):
+    '''
+    Add the agents in `ids` found in the field `label` (None if there is no query) to
+    `agents`, keeping their order
+    '''
+    if allowed is not None:
+        ids = get_facet_index().select(ids, allowed)
+
+    for id_ in ids:
+        found_in = agents.setdefault(id_, [])
+        # agents listed without a query are not found in any field
+        if label is not None:
+            found_in.append(label)
             counts[label] += 1
 
     return agents, counts
 
-def make_search(label, query_field, query_expression, search, agents, counts):
-    search = search.copy()
-    search[query_field] = query_expression
+def make_search(label, query_field, query_expression, search, agents, counts, allowed=None):
+    '''
+    `query_expression` is the expression for `query_field`, or a list of expressions that it must all match
+    '''
+    expressions = query_expression if isinstance(query_expression, list) else [query_expression]
+    conditions = [{key:value} for key, value in search.items()]
+    conditions += [{query_field: expression} for expression in expressions]
 
-    search = {'$and': [{key:value} for key, value in search.items() ]}
-    agents, counts = search_input(agents, counts, search, label)
+    search = {'$and': conditions}
+    agents, counts = search_input(agents, counts, search, label, allowed)
     return agents, counts
 
-def calculate_stats(agents):
-    stats = {
-        'type': {},
-        'source': {},
-        'topics': {},
-        'operations': {},
-        'license': {},
-        'input': {},
-        'output': {},
-        'collection': {}
+def search_publications(field, label, query, search, agents, counts, allowed=None):
+    '''
+    Search the titles or abstracts of the publications, in the publication index if it
+    is ready and the query is literal (in the database otherwise, matching the same way)
+    '''
+    if not query.literal:
+        return make_search(label, f'publication.{field}', query.expressions(), search, agents, counts, allowed)
+
+    publication_index = get_publication_index()
+    if publication_index.loaded:
+        ids = publication_index.search(field, query)
+        return add_found(agents, counts, ids, label, allowed)
+    expressions = database_expressions(query)
+    if not expressions:
+        return agents, counts
+    return make_search(label, f'publication.{field}', expressions, search, agents, counts, allowed)
+
+def facet_filters(params):
+    '''
+    Facet filters in the query parameters of /search: {facet: [values]}
+    '''
+    filters = {}
+    for facet in FILTER_FACETS:
+        if value := params.get(facet):
+            filters[facet] = value.split(',')
+    return filters
+
+def expand_edam_filters(filters):
+    '''
+    Add the descendants of the EDAM terms in the topics and operations filters
+    '''
+    filters = dict(filters)
+    for facet in EDAM_FILTERS:
+        if facet in filters:
+            filters[facet] = get_edam_hierarchy().expand(filters[facet])
+    return filters
+
+def search_agents(params, facet_index):
+    '''
+    Run the search described by the query parameters of /search. Returns the ranked
+    ids with the fields where each one was found, the counts per field and the stats.
+    '''
+    agents = {}
+    counts = {
+        'name': 0,
+        'description': 0,
+        'topics': 0,
+        'operations': 0,
+        'publication_title': 0,
+        'publication_abstract': 0,
+    }
+
+    search = {}
+
+    # facet filters are resolved in the facet index, not in the database
+    filters = facet_filters(params)
+    include_descendants = params.get('include_descendants', 'false').lower() == 'true'
+    if include_descendants:
+        filters = expand_edam_filters(filters)
+    allowed = facet_index.filter(filters) if filters else None
+
+    query = compile_query(params.get('q'), params.get('regex', 'false').lower() == 'true')
+
+    fuzzy = params.get('fuzzy', 'false').lower() == 'true'
+
+    search_in = [field for field in params.get('searchIn', '').split(',') if field]
+    if not search_in:
+        search_in = SEARCH_FIELDS
+
+    if query:
+        if 'name' in search_in and fuzzy:
+            # closest names first, from the fuzzy name index
+            fuzzy_index = get_fuzzy_index()
+            fuzzy_index.ensure_loaded()
+            ids = [id_ for id_, distance in fuzzy_index.search(query.text)]
+            agents, counts = add_found(agents, counts, ids, 'name', allowed)
+        elif 'name' in search_in:
+            agents, counts = make_search('name', 'name', query.expressions(), search, agents, counts, allowed)
+
+        if 'description' in search_in:
+            agents, counts = make_search('description', 'description', query.expressions(), search, agents, counts, allowed)
+
+        if 'topics' in search_in or 'operations' in search_in:
+            edam_ids = [key for key, value in EDAMDict.items() if query.matches(value)]
+            if include_descendants:
+                edam_ids = get_edam_hierarchy().expand(edam_ids)
+
+        if 'topics' in search_in:
+            agents, counts = make_search('topics', 'edam_topics', {'$in': edam_ids}, search, agents, counts, allowed)
+
+        if 'operations' in search_in:
+            agents, counts = make_search('operations', 'edam_operations', {'$in': edam_ids}, search, agents, counts, allowed)
+
+        for field, label in PUBLICATION_FIELDS.items():
+            if label in search_in:
+                agents, counts = search_publications(field, label, query, search, agents, counts, allowed)
+    else:
+        # without a query, every agent that passes the filters
+        agents, counts = search_input(agents, counts, search, None, allowed)
+
+    ids = list(agents)
+    return {
+        'query': query.text,
+        'ids': ids,
+        'found_in': agents,
+        'counts': counts,
+        'stats': facet_index.stats(ids),
     }
-    for agent in agents:
-        #---- TYPE --------
-        if agent['type'] in stats['type'].keys():
-            stats['type'][agent['type']] += 1
-        else:
-            stats['type'][agent['type']] = 1
-        
-        #---- SOURCE --------
-        seen_sources = []
-        for source in agent['source']:
-        
-            if source == 'opeb_metrics':
-                continue
-            
-            # bioconda_recipes and bioconda are the same for this purpose
-            if source == 'bioconda_recipes':
-                if 'bioconda' in seen_sources:
-                    continue
-                else:
-                    source = 'bioconda'
-
-            # galaxy_metadata and agentshed are the same for this purpose
-            if source == 'galaxy_metadata':
-                if 'agentshed' in seen_sources:
-                    continue
-                else:
-                    source = 'agentshed'
-
-            if source in stats['source'].keys():
-                seen_sources.append(source)
-                stats['source'][source] += 1
-            else:
-                seen_sources.append(source)
-                stats['source'][source] = 1 
-
-        #---- TOPICS ------------
-        for edam_topic in agent['edam_topics']:
-            if edam_topic in stats['topics'].keys():
-                stats['topics'][edam_topic] += 1
-            else:
-                stats['topics'][edam_topic] = 1 
-
-        #---- OPERATIONS --------
-        for edam_operation in agent['edam_operations']:
-            if edam_operation in stats['operations'].keys():
-                stats['operations'][edam_operation] += 1
-            else:
-                stats['operations'][edam_operation] = 1
-
-        #---- LICENSE -----------
-        for license in agent['license']:
-            license = license['name']
-            if license in stats['license'].keys():
-                stats['license'][license] += 1
-            else:
-                stats['license'][license] = 1      
-
-        #---- INPUT -------------
-        # Data format (FASTA, CSV, ...)
-        # Not data type for now
-        for item in agent['input']:
-            if item['uri']:
-                term = item['uri']
-            else:
-                term = item['term']
-
-            if term in stats['input'].keys():
-                stats['input'][term] += 1
-            else:
-                stats['input'][term] = 1
-
-        #---- OUTPUT ------------
-        for item in agent['output']:
-            if item['uri']:
-                term = item['uri']
-            else:
-                term = item['term']
-
-            if term in stats['output'].keys():
-                stats['output'][term] += 1
-            else:
-                stats['output'][term] = 1
-
-        #---- COLLECTION ----------
-        for tag in agent['tags']:
-            if tag in stats['collection'].keys():
-                stats['collection'][tag] += 1
-            else:
-                stats['collection'][tag] = 1
-
-    return stats
\ No newline at end of file
+
+def fetch_page(snapshot, page, page_size=PAGE_SIZE):
+    '''
+    Documents of a page of the results of a search snapshot
+    '''
+    page_ids = snapshot['ids'][page * page_size:(page + 1) * page_size]
+    documents = get_projector().get_many(page_ids) if page_ids else {}
+
+    agents = []
+    for id_ in page_ids:
+        if id_ in documents:
+            agent = documents[id_]
+            agent['foundIn'] = list(snapshot['found_in'][id_])
+            agents.append(agent)
+    return agents
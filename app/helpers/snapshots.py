@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from app.helpers.cache import LRUBackend, normalize_params
+from app.helpers import changes
+
+########
+# Search snapshots
+# The ranked ids, counts and stats of a /search are kept for a few minutes under a
+# snapshot token, so that turning pages only fetches the documents of the page.
+# Tokens are derived from the search parameters (without `page`) and the catalogue
+# version: the same search finds the same snapshot, and a client that sends back the
+# token keeps paging over the same results even if the catalogue changes meanwhile.
+# Snapshots keep the parameters of their search: a token sent with other parameters is
+# ignored.
+#######
+
+SNAPSHOT_TTL = int(os.getenv('SEARCH_SNAPSHOT_TTL', 600))
+SNAPSHOT_MAX_ENTRIES = int(os.getenv('SEARCH_SNAPSHOT_MAX_ENTRIES', 256))
+
+# parameters that do not change the results of a search
+PAGING_PARAMS = ('page', 'snapshot')
+
+
+class SearchSnapshots:
+    def __init__(self, backend, ttl=SNAPSHOT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def search_params(self, params, list_params=()):
+        '''
+        Normalized parameters of the search, without the paging ones
+        '''
+        return [[key, value] for key, value in normalize_params(params, list_params) if key not in PAGING_PARAMS]
+
+    def make_token(self, params, list_params=()):
+        raw = json.dumps([self.search_params(params, list_params), changes.catalogue_version()])
+        return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    def get(self, token):
+        return self.backend.get(token) if token else None
+
+    def get_or_create(self, params, compute, list_params=()):
+        '''
+        Snapshot of the `snapshot` token in `params`, or of the search described by
+        `params` (computed with `compute()` if it is not stored). A token of another
+        search is ignored.
+        '''
+        search_params = self.search_params(params, list_params)
+        snapshot = self.get(params.get('snapshot'))
+        if snapshot is not None and snapshot['params'] == search_params:
+            return snapshot
+
+        token = self.make_token(params, list_params)
+        snapshot = self.get(token)
+        if snapshot is None:
+            snapshot = compute()
+            snapshot['token'] = token
+            snapshot['params'] = search_params
+            self.backend.set(token, snapshot, self.ttl)
+        return snapshot
+
+
+@lru_cache(maxsize=None)
+def get_snapshots():
+    return SearchSnapshots(LRUBackend(SNAPSHOT_MAX_ENTRIES))
@@ -0,0 +1,181 @@
+'''
+Incremental stats counters.
+
+Usage:
+    python -m app.helpers.stats_counters --rebuild
+'''
+import argparse
+from collections import Counter
+from functools import lru_cache
+
+from pymongo import ReplaceOne, UpdateOne, ReturnDocument
+
+from app.helpers.database import connect_DB, connect_collection
+from app.helpers.stats_engine import ENGINE_FIELDS, ENGINE_COLLECTION, CHUNK_SIZE, agent_contributions, results, stats_records
+from app.helpers import changes
+from app.constants import LIVE_STATS_VERSION
+from app.helpers.cache import invalidate_later
+
+########
+# The stats of the live engine are sums of per-agent contributions. The contribution
+# last counted for each agent is kept (stats_contributions) together with the sums
+# (stats_counters, one document per variable and key). When agents change, their new
+# contribution is swapped in atomically and the difference is added to the counters,
+# so only the changed agents are read. The counters are published in the stats
+# collection under the version `live`, served only when requested explicitly.
+# If several processes follow the same changes, only the one that swaps a
+# contribution applies its difference. Full recounts are left to the CLI (--rebuild).
+#######
+
+LIVE_VERSION = LIVE_STATS_VERSION
+
+
+def flatten(contributions):
+    '''
+    Contributions as [variable, key, count] triples (keys may contain dots)
+    '''
+    return [[variable, key, count] for variable, counts in contributions.items() for key, count in counts.items()]
+
+
+def difference(old, new):
+    '''
+    {(variable, key): count} to add to the counters to replace `old` by `new` (flattened)
+    '''
+    diff = Counter()
+    for variable, key, count in new:
+        diff[(variable, key)] += count
+    for variable, key, count in old:
+        diff[(variable, key)] -= count
+    return {item: count for item, count in diff.items() if count}
+
+
+class StatsCounters:
+    def __init__(self, agents_collection, stats, counters, contributions, collection=ENGINE_COLLECTION):
+        self.agents_collection = agents_collection
+        self.stats = stats
+        self.counters = counters
+        self.contributions = contributions
+        self.collection = collection
+
+    def is_seeded(self):
+        return self.counters.find_one({}, {'_id': 1}) is not None
+
+    def rebuild(self):
+        '''
+        Recount every agent from scratch
+        '''
+        totals = Counter()
+        seen = []
+        batch = []
+        for agent in self.agents_collection.find({}, ENGINE_FIELDS, batch_size=CHUNK_SIZE):
+            contribution = flatten(agent_contributions(agent))
+            for variable, key, count in contribution:
+                totals[(variable, key)] += count
+            seen.append(agent['@id'])
+            batch.append(ReplaceOne({'@id': agent['@id']}, {'@id': agent['@id'], 'contribution': contribution}, upsert=True))
+            if len(batch) == CHUNK_SIZE:
+                self.contributions.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            self.contributions.bulk_write(batch, ordered=False)
+        self.contributions.delete_many({'@id': {'$nin': seen}})
+
+        self.counters.delete_many({})
+        if totals:
+            self.counters.insert_many([{'variable': variable, 'key': key, 'count': count} for (variable, key), count in totals.items()])
+        self.publish()
+        print(f'Stats counters rebuilt from {len(seen)} agents')
+
+    def swap(self, id_, contribution):
+        '''
+        Store the new contribution of an agent and return the previous one
+        '''
+        if contribution:
+            previous = self.contributions.find_one_and_update(
+                {'@id': id_},
+                {'$set': {'contribution': contribution}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+        else:
+            previous = self.contributions.find_one_and_delete({'@id': id_})
+        return previous['contribution'] if previous else []
+
+    def apply(self, ids):
+        '''
+        Count again the agents in `ids` (inserted, updated or deleted)
+        '''
+        ids = list(ids)
+        current = {agent['@id']: agent for agent in self.agents_collection.find({'@id': {'$in': ids}}, ENGINE_FIELDS)}
+
+        total = Counter()
+        for id_ in ids:
+            contribution = flatten(agent_contributions(current[id_])) if id_ in current else []
+            total.update(difference(self.swap(id_, contribution), contribution))
+
+        updates = [
+            UpdateOne({'variable': variable, 'key': key}, {'$inc': {'count': count}}, upsert=True)
+            for (variable, key), count in total.items() if count
+        ]
+        if updates:
+            self.counters.bulk_write(updates, ordered=False)
+            self.publish({variable for variable, key in total})
+
+    def publish(self, variables=None):
+        '''
+        Write the counters of `variables` (all if None) as the `live` version of the stats
+        '''
+        query = {'variable': {'$in': list(variables)}} if variables is not None else {}
+        counts = {}
+        for counter in self.counters.find(query, {'_id': 0}):
+            counts.setdefault(counter['variable'], Counter())[counter['key']] = counter['count']
+        if variables is not None:
+            for variable in variables:
+                counts.setdefault(variable, Counter())
+
+        records = stats_records(results(counts), LIVE_VERSION, self.collection)
+        self.stats.bulk_write([
+            ReplaceOne({'variable': record['variable'], 'collection': self.collection, 'version': LIVE_VERSION}, record, upsert=True)
+            for record in records
+        ], ordered=False)
+        invalidate_later('stats')
+
+    def on_change(self, ids=None):
+        if ids is None:
+            # a recount from every worker would race with the increments of the others
+            print('Stats counters: change of the whole catalogue ignored, run `python -m app.helpers.stats_counters --rebuild`')
+            return
+        self.apply(ids)
+
+
+@lru_cache(maxsize=None)
+def get_stats_counters():
+    agents_collection, stats = connect_DB()
+    counters = connect_collection('STATS_COUNTERS', 'stats_counters')
+    contributions = connect_collection('STATS_CONTRIBUTIONS', 'stats_contributions')
+    return StatsCounters(agents_collection, stats, counters, contributions)
+
+
+def start_stats_counters():
+    '''
+    Keep the live stats updated on changes, once the counters have been built
+    (with `python -m app.helpers.stats_counters --rebuild`)
+    '''
+    stats_counters = get_stats_counters()
+    if not stats_counters.is_seeded():
+        print('Stats counters not built yet: live stats are not maintained')
+        return None
+    changes.subscribe(stats_counters.on_change)
+    return stats_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental stats counters')
+    parser.add_argument('--rebuild', action='store_true', help='count every agent again')
+    args = parser.parse_args()
+    if args.rebuild:
+        get_stats_counters().rebuild()
+
+
+if __name__ == '__main__':
+    main()
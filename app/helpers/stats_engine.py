@@ -0,0 +1,306 @@
+'''
+Live stats engine.
+
+Computes stats variables from the agents collection and writes them to the stats
+collection as a new version. Their records have their own shape, so they are kept apart
+from the stats of the import pipeline under their own `collection` value (agents_engine).
+The /stats routes serve them by default for the variables computed here.
+
+Usage:
+    python -m app.helpers.stats_engine [--processes N] [--version VERSION] [--collection agents_engine]
+'''
+import argparse
+import json
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from app.helpers.facets import stats_sources
+from app.constants import ONLY_GALAXY_METADATA
+
+########
+# Every variable is a sum over agents: each agent contributes a few counts
+# ({key: count}) to each variable. Counts of different chunks of agents are merged by
+# adding them, so chunks can be counted in a process pool, and the counts of a single
+# agent can be subtracted and added again when it changes.
+#######
+
+# fields read from the agents collection
+ENGINE_FIELDS = {
+    '_id': 0,
+    '@id': 1,
+    'type': 1,
+    'source': 1,
+    'license': 1,
+    'version': 1,
+    'repository': 1,
+    'links': 1,
+    'src': 1,
+    'description': 1,
+    'authors': 1,
+    'documentation': 1,
+    'download': 1,
+    'edam_topics': 1,
+    'edam_operations': 1,
+    'input': 1,
+    'output': 1,
+    'os': 1,
+    'dependencies': 1,
+    'webpage': 1,
+    'test': 1,
+    'contribPolicy': 1,
+    'publication.doi': 1,
+    'publication.pmid': 1,
+    'publication.pmcid': 1,
+    'publication.title': 1,
+}
+
+# feature -> fields of the agent that provide it
+FEATURES = {
+    'description': ['description'],
+    'version': ['version'],
+    'license': ['license'],
+    'authors': ['authors'],
+    'publication': ['publication'],
+    'documentation': ['documentation'],
+    'repository': ['repository'],
+    'download': ['download', 'src'],
+    'topics': ['edam_topics'],
+    'operations': ['edam_operations'],
+    'input': ['input'],
+    'output': ['output'],
+    'os': ['os'],
+    'dependencies': ['dependencies'],
+    'webpage': ['webpage'],
+    'test': ['test'],
+    'contribution_policy': ['contribPolicy'],
+}
+
+VERSION_CONTROL_HOSTS = {
+    'github.com': 'github',
+    'gitlab.com': 'gitlab',
+    'bitbucket.org': 'bitbucket',
+    'sourceforge.net': 'sourceforge',
+}
+
+SEMVER_PATTERN = re.compile(r'^v?\d+\.\d+\.\d+(-[0-9A-Za-z.-]+)?(\+[0-9A-Za-z.-]+)?$')
+
+SPDX_LICENSES_PATH = './app/routes/licenses.json'
+
+# used when the SPDX license list is not available
+OPEN_SOURCE_PREFIXES = ('gpl', 'lgpl', 'agpl', 'mit', 'apache', 'bsd', 'mpl', 'artistic', 'epl', 'cecill', 'isc', 'zlib', 'bsl', 'cddl', 'afl', 'eupl', 'unlicense')
+
+CHUNK_SIZE = 1000
+
+# `collection` of the stats records written by the engine
+ENGINE_COLLECTION = 'agents_engine'
+
+
+def as_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return [item for item in value if item not in (None, '', {})]
+    return [value]
+
+
+def license_name(license):
+    if isinstance(license, dict):
+        return license.get('name') or ''
+    return str(license)
+
+
+@lru_cache(maxsize=None)
+def osi_licenses():
+    '''
+    Casefolded ids of the OSI approved licenses in the SPDX license list (empty if not available)
+    '''
+    try:
+        with open(SPDX_LICENSES_PATH) as f:
+            data = json.load(f)
+        return frozenset(license['licenseId'].casefold() for license in data['licenses'] if license.get('isOsiApproved'))
+    except Exception as err:
+        print(f'SPDX license list not available ({err}). Using known license families.')
+        return frozenset()
+
+
+def is_open_source(name):
+    name = name.strip().casefold()
+    if not name:
+        return False
+    if name in osi_licenses():
+        return True
+    return name.startswith(OPEN_SOURCE_PREFIXES)
+
+
+def version_control_hosts(agent):
+    hosts = set()
+    for field in ['repository', 'links', 'src']:
+        for link in as_list(agent.get(field)):
+            link = str(link.get('url', '') if isinstance(link, dict) else link).casefold()
+            for host, name in VERSION_CONTROL_HOSTS.items():
+                if host in link:
+                    hosts.add(name)
+    return hosts
+
+
+def agent_features(agent):
+    return [feature for feature, fields in FEATURES.items() if any(as_list(agent.get(field)) for field in fields)]
+
+
+def agent_contributions(agent):
+    '''
+    Counts that an agent contributes to each variable: {variable: {key: count}}
+    '''
+    if agent.get('source') == ONLY_GALAXY_METADATA:
+        return {}
+
+    sources = sorted(set(stats_sources(as_list(agent.get('source')))))
+    licenses = [license_name(license) for license in as_list(agent.get('license'))]
+    versions = [str(version) for version in as_list(agent.get('version'))]
+    hosts = version_control_hosts(agent)
+    features = agent_features(agent)
+
+    if not licenses:
+        open_source = 'no_license'
+    elif any(is_open_source(license) for license in licenses):
+        open_source = 'open_source'
+    else:
+        open_source = 'not_open_source'
+
+    if not versions:
+        semantic = 'no_version'
+    elif any(SEMVER_PATTERN.match(version.strip()) for version in versions):
+        semantic = 'semantic'
+    else:
+        semantic = 'not_semantic'
+
+    return {
+        'agents_count': {'total': 1},
+        'agents_counts_per_source': {source: 1 for source in sources},
+        'types_count': {agent.get('type') or 'unknown': 1},
+        'licenses_open_source': {open_source: 1},
+        'semantic_versioning': {semantic: 1},
+        'version_control_count': {'version_control' if hosts else 'no_version_control': 1},
+        'version_control_repositories': {host: 1 for host in hosts},
+        'features': {feature: 1 for feature in features},
+        'coverage_sources': {str(len(sources)): 1},
+        'distribution_features': {str(len(features)): 1},
+    }
+
+
+VARIABLES = list(agent_contributions({'source': ['bioagents']}))
+
+
+def accumulate(agents):
+    '''
+    Counts of a chunk of agents: {variable: Counter}
+    '''
+    counts = {variable: Counter() for variable in VARIABLES}
+    for agent in agents:
+        for variable, contribution in agent_contributions(agent).items():
+            counts[variable].update(contribution)
+    return counts
+
+
+def merge(counts, other):
+    for variable, counter in other.items():
+        counts.setdefault(variable, Counter()).update(counter)
+    return counts
+
+
+def results(counts):
+    '''
+    Data of each variable
+    '''
+    data = {}
+    for variable, counter in counts.items():
+        if variable == 'agents_count':
+            data[variable] = counter.get('total', 0)
+        else:
+            data[variable] = {key: count for key, count in sorted(counter.items()) if count}
+    return data
+
+
+def chunks(agents, size=CHUNK_SIZE):
+    chunk = []
+    for agent in agents:
+        chunk.append(agent)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def compute_counts(agents, processes=1, chunk_size=CHUNK_SIZE):
+    '''
+    Counts of all the variables in a single pass over `agents`. With several processes,
+    chunks are counted in a process pool (with a bounded number of chunks in flight).
+    '''
+    counts = {variable: Counter() for variable in VARIABLES}
+    if processes <= 1:
+        for chunk in chunks(agents, chunk_size):
+            merge(counts, accumulate(chunk))
+        return counts
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        pending = set()
+        for chunk in chunks(agents, chunk_size):
+            if len(pending) >= 2 * processes:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(counts, future.result())
+            pending.add(pool.submit(accumulate, chunk))
+        for future in pending:
+            merge(counts, future.result())
+    return counts
+
+
+def new_version():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def stats_records(data, version, collection=ENGINE_COLLECTION):
+    computed_at = datetime.now(timezone.utc).isoformat()
+    return [{
+        'variable': variable,
+        'collection': collection,
+        'version': version,
+        'data': value,
+        'computed_at': computed_at,
+    } for variable, value in data.items()]
+
+
+def run(processes=1, version=None, collection=ENGINE_COLLECTION):
+    '''
+    Compute the stats of the agents collection and store them as a new version
+    '''
+    from app.helpers.database import connect_DB
+    from app.helpers.cache import invalidate
+    agents_collection, stats = connect_DB()
+
+    version = version or new_version()
+    start = datetime.now(timezone.utc)
+    counts = compute_counts(agents_collection.find({}, ENGINE_FIELDS, batch_size=CHUNK_SIZE), processes)
+    records = stats_records(results(counts), version, collection)
+    stats.insert_many(records)
+    invalidate('stats')
+    elapsed = (datetime.now(timezone.utc) - start).total_seconds()
+    print(f'Stats version {version}: {len(records)} variables of {counts["agents_count"]["total"]} agents in {elapsed:.1f} s')
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute the stats of the agents collection')
+    parser.add_argument('--processes', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--version', default=None, help='version of the new stats (default: current UTC time)')
+    parser.add_argument('--collection', default=ENGINE_COLLECTION, help='value of the collection field of the stats')
+    args = parser.parse_args()
+    run(args.processes, args.version, args.collection)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import heapq
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+from app.helpers.EDAM_forFE import EDAMDict
+from app.constants import ONLY_GALAXY_METADATA
+from app.helpers.facets import stats_sources, get_facet_index
+from app.helpers.catalogue import get_catalogue
+from app.helpers import changes
+from app.helpers.cache import invalidate_catalogue
+
+########
+# Typeahead suggestions
+# Sorted arrays of normalized keys (agent names and labels, EDAM preferred labels)
+# answered by binary search. Top suggestions of short prefixes are precomputed, since
+# their ranges are too large to rank on every keystroke.
+#######
+
+TOP_K = 20
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+# seconds to wait after a change before rebuilding, so bursts of changes rebuild once
+REBUILD_DELAY = 1.0
+
+EDAM_KINDS = ['topic', 'operation', 'format', 'data']
+
+
+def normalize(text):
+    return ' '.join(str(text).casefold().split())
+
+
+def edam_kind(uri):
+    for kind in EDAM_KINDS:
+        if f'/{kind}_' in uri:
+            return kind
+    return None
+
+
+class PrefixIndex:
+    '''
+    Items under one or more keys, ranked by popularity (then shorter keys first)
+    '''
+    def __init__(self, entries, top_k=TOP_K, precomputed_length=PRECOMPUTED_PREFIX_LENGTH):
+        # entries: (key, popularity, item_id, item)
+        entries = [(normalize(key), popularity, item_id, item) for key, popularity, item_id, item in entries]
+        entries = sorted((entry for entry in entries if entry[0]), key=lambda entry: entry[0])
+        self.keys = [entry[0] for entry in entries]
+        self.ranks = [(-entry[1], len(entry[0]), entry[0]) for entry in entries]
+        self.item_ids = [entry[2] for entry in entries]
+        self.items = [entry[3] for entry in entries]
+        self.top_k = top_k
+        self.precomputed_length = precomputed_length
+        self.top = self._precompute()
+
+    def _best(self, positions, k):
+        positions = sorted(positions, key=lambda i: self.ranks[i])
+        seen = set()
+        best = []
+        for i in positions:
+            if self.item_ids[i] in seen:
+                continue
+            seen.add(self.item_ids[i])
+            best.append(self.items[i])
+            if len(best) == k:
+                break
+        return best
+
+    def _precompute(self):
+        buckets = {}
+        for i, key in enumerate(self.keys):
+            for length in range(1, self.precomputed_length + 1):
+                if len(key) >= length:
+                    buckets.setdefault(key[:length], []).append(i)
+        return {prefix: self._best(positions, self.top_k) for prefix, positions in buckets.items()}
+
+    def search(self, prefix, k=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.precomputed_length and k <= self.top_k:
+            return self.top.get(prefix, [])[:k]
+
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\uffff', lo)
+        # an item can be under several keys: take some extra candidates before deduplicating
+        candidates = heapq.nsmallest(4 * k, range(lo, hi), key=lambda i: self.ranks[i])
+        return self._best(candidates, k)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def agent_entries(catalogue_entries):
+    '''
+    Agents under their name and label, ranked by the number of sources they are in.
+    Agents only in galaxy_metadata are left out, as in the catalogue listings.
+    '''
+    for entry in catalogue_entries:
+        if not entry.get('name') or entry.get('source') == ONLY_GALAXY_METADATA:
+            continue
+        popularity = len(set(stats_sources(entry.get('source', []))))
+        item = {
+            '@id': entry['@id'],
+            'name': entry['name'],
+            'label': entry.get('label') or entry['name'],
+            'type': entry.get('type'),
+            'sources': popularity,
+        }
+        yield entry['name'], popularity, entry['@id'], item
+        if entry.get('label') and normalize(entry['label']) != normalize(entry['name']):
+            yield entry['label'], popularity, entry['@id'], item
+
+
+def edam_entries(edam_dict, counts=None):
+    '''
+    EDAM terms under their preferred label and under each of its words, ranked by the
+    number of agents annotated with them (`counts`: uri -> number of agents)
+    '''
+    counts = counts or {}
+    for uri, label in edam_dict.items():
+        kind = edam_kind(uri)
+        if not kind:
+            continue
+        popularity = counts.get(uri, 0)
+        item = {
+            'uri': uri,
+            'label': label,
+            'kind': kind,
+            'agents': popularity,
+        }
+        words = normalize(label).split(' ')
+        for i in range(len(words)):
+            yield ' '.join(words[i:]), popularity, uri, item
+
+
+class SuggestIndex:
+    def __init__(self, catalogue=None, facet_index=None):
+        self.catalogue = catalogue
+        self.facet_index = facet_index
+        self.agents = PrefixIndex([])
+        self.edam = PrefixIndex([])
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.pending_rebuild = None
+
+    def build(self, catalogue_entries, edam_dict=EDAMDict, edam_counts=None):
+        agents = PrefixIndex(agent_entries(catalogue_entries))
+        edam = PrefixIndex(edam_entries(edam_dict, edam_counts))
+        self.agents, self.edam = agents, edam
+        self.loaded = True
+
+    def load(self):
+        with self.lock:
+            self.pending_rebuild = None
+            edam_counts = self.facet_index.value_counts() if self.facet_index else None
+            self.build(self.catalogue.all_entries(), EDAMDict, edam_counts)
+        invalidate_catalogue()
+
+    def refresh(self, ids=None):
+        '''
+        Rebuild in the background shortly after a change (the current index keeps serving meanwhile)
+        '''
+        if self.pending_rebuild is None:
+            self.pending_rebuild = threading.Timer(REBUILD_DELAY, self.load)
+            self.pending_rebuild.daemon = True
+            self.pending_rebuild.start()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def suggest(self, q, k=10):
+        self.ensure_loaded()
+        return {
+            'query': q,
+            'agents': self.agents.search(q, k),
+            'edam': self.edam.search(q, k),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_suggest_index():
+    return SuggestIndex(get_catalogue(), get_facet_index())
+
+
+def start_suggest_index():
+    '''
+    Build the suggestions and rebuild them when the catalogue changes
+    '''
+    suggest_index = get_suggest_index()
+    suggest_index.load()
+    changes.subscribe(suggest_index.refresh)
+    return suggest_index
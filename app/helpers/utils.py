@@ -4,6 +4,12 @@ import warnings
 import time
 
 from app.helpers.EDAM_forFE import EDAMDict
+from app.helpers.publications import clean_empty_publications, deduplicate_publications
+from app.helpers.links import classify_link, find_link
+from app.helpers.authors import (
+    clean_brakets, clean_doctor, keep_after_code, clean_first_end_parenthesis, clean_spaces,
+    classify_person_organization, clean_long, build_organization, build_person, build_authors
+)
 
 
 def attribute_check_and_set(instance, key, value, default_name='fairsoft_default_name', default_value=None):
@@ -313,182 +319,6 @@ def getWebPage(metadata):
 
     return metadata
 
-def clean_brakets(string):
-    '''
-    Remove anything between {}, [], or <>, or after {, [, <
-    '''
-    def clena_after_braket(string):
-        '''
-        Remove anything between {}, [], or <>
-        '''
-        pattern = re.compile(r'\{.*|\[.*|\(.*|\<.*')
-        return re.sub(pattern, '', string)
-
-    def clean_between_brakets(string):
-        '''
-        Remove anything between {, [, <
-        '''
-        pattern = re.compile(r'\{.*?\}|\[.*?\]|\(.*?\)|\<.*?\>')
-        return re.sub(pattern, '', string)
-
-    def clean_before_braket(string):
-        '''
-        Remove anything before }, ], or >
-        '''
-        pattern = re.compile(r'.*?\}.*?|.*?\].*?|.*?\>.*?')
-        return re.sub(pattern, '', string)
-
-
-    string = clean_between_brakets(string)
-    string = clena_after_braket(string)
-    string = clean_before_braket(string)
-
-    return string
-
-def clean_doctor(string):
-    '''
-    remove title at the begining of the string
-    '''
-    pattern = re.compile(r'^Dr\.|Dr |Dr\. |Dr')
-    return re.sub(pattern, '', string)
-
-def keep_after_code(string):
-    '''
-    Remove anything before code and others
-    '''
-    if 'initial R code' in string:
-        return ''
-    if 'contact form' in string:
-        return ''
-    else:
-        pattern = re.compile(r'.*?code')
-        string = re.sub(pattern, '', string)
-        pattern = re.compile(r'.*?Code')
-        string = re.sub(pattern, '', string)
-        pattern = re.compile(r'.*?from')
-        string = re.sub(pattern, '', string)
-        return re.sub(pattern, '', string)
-
-def clean_first_end_parenthesis(string):
-    if string[0] == '(' and string[-1] == ')':
-        string = string[1:]
-        string = string[:-1]
-
-    return string
-
-def clean_spaces(string):
-    '''
-    Clean spaces around the string
-    '''
-    return string.strip()
-
-
-def classify_person_organization(string):
-    '''
-    tokenize the string
-    if any of the words in the string is in the list of keywords
-    then it is an institution
-    otherwise it is a person
-    '''
-    inst_keywords = [
-        'university',
-        'université',
-        'universidad',
-        'universidade',
-        'università',
-        'universität',
-        'institut',
-        'institute',
-        'college',
-        'school',
-        'department',
-        'laboratory',
-        'laboratoire',
-        'lab',
-        'center',
-        'centre',
-        'research',
-        'researcher',
-        'researchers',
-        'group',
-        'support',
-        'foundation',
-        'company',
-        'corporation',
-        'team',
-        'helpdesk',
-        'service',
-        'platform',
-        'program',
-        'programme',
-        'community'
-    ]
-    words = string.split()
-    for word in words:
-        if word.lower() in inst_keywords:
-            return 'organization'
-    return 'person'
-
-def clean_long(string):
-    if len(string.split()) >= 5:
-        return ''
-    else:
-        return string
-
-
-def build_organization(string):
-    return {
-        'type': 'organization',
-        'name': string,
-        'email': '',
-        'maintainer': False
-        }
-
-def build_person(string):
-    '''
-    Extract first and last name from a string
-    '''
-    if string:
-        return {
-            'type': 'person' ,
-            'name': string, 
-            'email': '',
-            'maintainer': False
-            }
-    else:
-        return ''
-        
-
-
-def build_authors(authors):
-    '''
-    Build a list of authors
-    '''
-    new_authors = []
-    seen_authors = set()
-    for author in authors:
-        name = clean_first_end_parenthesis(author)
-        name = clean_brakets(name)
-        name = clean_doctor(name)
-        name = keep_after_code(name)
-        name = clean_spaces(name)
-        if name in seen_authors:
-            continue
-        else:
-            seen_authors.add(name)
-            classification = classify_person_organization(name)
-            if classification == 'person':
-                if name:
-                    name = clean_long(name)
-                    person = build_person(name)
-                    new_authors.append(person)
-
-            else:
-                organization = build_organization(name)
-                new_authors.append(organization)
-
-    return new_authors
-
 def prepareAuthors(agent):
     '''
     {
@@ -560,121 +390,18 @@ def prepareDescription(agent):
     return agent
 
 def cleanEmptyPublications(publications):
-    new_pubs = []
-    for pub in publications:
-        new_pub = {k: v for k, v in pub.items() if v}
-        if new_pub:
-            new_pubs.append(new_pub)
-    
-    return new_pubs
+    return clean_empty_publications(publications)
 
 def preparePublications(agent):
     '''
     Merge publications that share ids or title
     '''
-    identifiers = ['title', 'pmcid', 'pmid', 'doi']
-
-    def indices(lst, item):
-       return [i for i, x in enumerate(lst) if x == item]
-
-    def stripPoints(ids):
-        '''
-        remove final points from ids (necessary specially in titles)
-        '''
-        new_ids = []
-        for id_ in ids:
-            if id_!= None:
-                new_ids.append(id_.rstrip('.'))
-            else:
-                new_ids.append(id_)
-
-        return new_ids
-    
-    def capitalizeDOIs(ids):
-        '''
-        capitalize ids
-        '''
-        new_ids = []
-        for id_ in ids:
-            if id_!= None:
-                new_ids.append(id_.upper())
-            else:
-                new_ids.append(id_)
-        return new_ids
-
-    def removeTags(titles):
-        '''
-        remove tags from titles
-        '''
-        new_titles = []
-        for title in titles:
-            if title != None:
-                pattern = re.compile(r'(<.*?>)')
-                new_title = re.sub(pattern, '', title)
-                new_titles.append(new_title)
-            else:
-                new_titles.append(title)
-        return new_titles
-
-    def merge_by_id(publications, id_):
-        seen_ids = []
-        ids = [pub.get(id_) for pub in publications]
-        ids = stripPoints(ids)
-        if id_ == 'doi':
-            ids = capitalizeDOIs(ids)
-        if id_ == 'title':
-            ids = removeTags(ids)
-
-        new_publications = []
-
-        # get indexes of repeated ids
-        for a in range(len(ids)):
-            id =  ids[a]
-            if id != None:
-                if id in seen_ids:
-                    continue
-                else:
-                    seen_ids.append(id)
-                    indexes = indices(ids, id)
-                    new_publication = {}
-                    # merge repeated publications by pairs
-
-                    if len(indexes) > 1:
-                        # merge needed
-                        for i in indexes:
-                            new_publication = {**new_publication, **publications[i]}
-                                                
-                        # merged publications
-                        new_publications.append(new_publication)
-                    else:
-                        # no possible merge. Append publication as it is
-                        index = indexes[0]
-                        new_publications.append(publications[index])
-
-            else:
-                new_publications.append(publications[a])
-
-        return new_publications
-    
-    publications = cleanEmptyPublications(agent['publication'])
     try:
-        for id_ in identifiers:
-            publications  = merge_by_id(publications, id_)
-        
-        for pub in publications:
-            if pub.get('title'):
-                pub['title'] = pub['title'].rstrip('.')
-                pattern = re.compile(r'(<.*?>)')
-                pub['title'] = re.sub(pattern, '', pub['title'])
-
-        
-        agent['publication'] = publications
+        agent['publication'] = deduplicate_publications(agent['publication'])
 
     except Exception as e:
         print('Error merging publications')
         print(e)
-    else:
-        pass
     
     return agent
 
@@ -770,53 +497,28 @@ def keep_first_label(agent):
 ##############
 
 def find_github_repo(link):
-    regex = re.compile(r'(http(s)?:\/\/)?(www\.)?github\.com\/[A-Za-z0-9_-]+\/[A-Za-z0-9_-]+')
-    x = re.search(regex, link)
-    if x:
-        return x.group(0)
-    else:
-        return None
+    return find_link(link, 'github')
 
 def find_bioconductor_link(link):
-    regex = re.compile(r'(http(s)?:\/\/)?(www\.)?bioconductor\.org\/packages\/[A-Za-z0-9_-]+\/bioc\/html\/[A-Za-z0-9_-]+')
-    x = re.search(regex, link)
-    if x:
-        return x.group(0) + '.html'
-    else:
-        return None
+    return find_link(link, 'bioconductor')
 
 def find_bitbucket_repo(link):
     '''
     Find Bitbuket repository in URL string
     '''
-    regex = re.compile(r'(http(s)?:\/\/)?(www\.)?bitbucket\.org\/[A-Za-z0-9_-]+\/[A-Za-z0-9_-]+')
-    x = re.search(regex, link)
-    if x:
-        return x.group(0)
-    else:
-        return None
+    return find_link(link, 'bitbucket')
 
 def find_galaxy_instance(link):
     '''
     Find Galaxy instance in URL string
     '''
-    regex = re.compile(r'(http(s)?:\/\/)?(www\.)?usegalaxy\.eu')
-    x = re.search(regex, link)
-    if x:
-        return x.group(0)
-    else:
-        return None
+    return find_link(link, 'galaxy')
 
 def find_galaxyagentshed_link(link):
     '''
     Find Galaxy agentshed in URL string
     '''
-    regex = re.compile(r'(http(s)?:\/\/)?(www\.)?agentshed\.galaxyproject\.org')
-    x = re.search(regex, link)
-    if x:
-        return x.group(0)
-    else:
-        return None
+    return find_link(link, 'agentshed')
 
 
 
@@ -835,93 +537,52 @@ def prepare_sources_labels(agent):
     }
     '''
     sources_labels = {}
-    remain_sources = agent['source'].copy()
+    # sources without a label yet (dict as an ordered set)
+    remain_sources = dict.fromkeys(agent['source'])
+    sources = set(agent['source'])
 
-    if 'opeb_metrics' in remain_sources:
-        remain_sources.remove('opeb_metrics')
+    remain_sources.pop('opeb_metrics', None)
 
-    if 'bioagents' in agent['source']:
+    if 'bioagents' in sources:
         sources_labels['bioagents'] = f'https://bio.agents/{agent["name"]}'
-        remain_sources.remove('bioagents')
+        remain_sources.pop('bioagents', None)
 
-    if 'bioconda' in agent['source'] or 'bioconda_recipes' in agent['source']:
+    if 'bioconda' in sources or 'bioconda_recipes' in sources:
         sources_labels['bioconda'] = f'https://anaconda.org/bioconda/{agent["name"]}'
-        if 'bioconda_recipes' in agent['source']:
-            remain_sources.remove('bioconda_recipes')
-        if 'bioconda' in agent['source']:
-            remain_sources.remove('bioconda')
+        remain_sources.pop('bioconda_recipes', None)
+        remain_sources.pop('bioconda', None)
 
-    if 'bioconductor' in agent['source']:
+    if 'bioconductor' in sources:
         sources_labels['bioconductor'] = f'https://bioconductor.org/packages/release/bioc/html/{agent["name"]}.html'
-        remain_sources.remove('bioconductor')
+        remain_sources.pop('bioconductor', None)
     
-    if 'sourceforge' in agent['source']:
+    if 'sourceforge' in sources:
         sources_labels['sourceforge'] = f'https://sourceforge.net/projects/{agent["name"]}'
-        remain_sources.remove('sourceforge')
+        remain_sources.pop('sourceforge', None)
     
-    if 'agentshed' in agent['source']:
+    if 'agentshed' in sources:
         sources_labels['agentshed'] = f'https://agentshed.g2.bx.psu.edu/repository'
-        remain_sources.remove('agentshed')
+        remain_sources.pop('agentshed', None)
 
     if 'galaxy_metadata' in remain_sources:
         sources_labels['agentshed'] = f'https://agentshed.g2.bx.psu.edu/repository'
-        remain_sources.append('galaxy')
-        remain_sources.remove('galaxy_metadata')
+        remain_sources['galaxy'] = None
+        remain_sources.pop('galaxy_metadata', None)
     
-    if 'galaxy' in agent['source']:
+    if 'galaxy' in sources:
         sources_labels['galaxy'] = 'https://usegalaxy.eu/'
-        remain_sources.remove('galaxy')
-
+        remain_sources.pop('galaxy', None)
 
+    # some agents have bioconductor in name in some sources like bioconda
+    bioconductor_name = f'bioconductor-{agent["name"]}'
     for link in agent['links']:
-        foundLink = False
-        while not foundLink:
-            # bioconda
-            # some agents have bioconductor in name in some sources like bioconda
-            if f'bioconductor-{agent["name"]}' in link:
-                sources_labels['bioconda'] = f'https://anaconda.org/bioconda/bioconductor-{agent["name"]}'
-
-            # github
-            github_repo = find_github_repo(link)
-            if github_repo:
-                sources_labels['github'] = github_repo
-                foundLink = True
-                if 'github' in remain_sources:
-                    remain_sources.remove('github')
-            
-            # bioconductor
-            bioconductor_link = find_bioconductor_link(link)
-            if bioconductor_link:
-                sources_labels['bioconductor'] = bioconductor_link
-                foundLink = True
-                if 'bioconductor' in remain_sources:
-                    remain_sources.remove('bioconductor')
-            
-            # bitbucket 
-            bitbucket_repo = find_bitbucket_repo(link)
-            if bitbucket_repo:
-                sources_labels['bitbucket'] = bitbucket_repo
-                foundLink = True
-                if 'bitbucket' in remain_sources:
-                    remain_sources.remove('bitbucket')
-
-            # galaxy
-            galaxy_instance = find_galaxy_instance(link)
-            if galaxy_instance:
-                sources_labels['galaxy'] = galaxy_instance
-                foundLink = True
-                if 'galaxy' in remain_sources:
-                    remain_sources.remove('galaxy')
-
-            # agentshed
-            galaxyagentshed_link = find_galaxyagentshed_link(link)
-            if galaxyagentshed_link:
-                sources_labels['agentshed'] = galaxyagentshed_link
-                foundLink = True
-                if 'agentshed' in remain_sources:
-                    remain_sources.remove('agentshed')
-
-            foundLink = True
+        if bioconductor_name in link:
+            sources_labels['bioconda'] = f'https://anaconda.org/bioconda/{bioconductor_name}'
+
+        # github, bioconductor, bitbucket, galaxy and agentshed links
+        for kind, url in classify_link(link):
+            sources_labels[kind] = url
+            remain_sources.pop(kind, None)
 
     for source in remain_sources:
         sources_labels[source] = ''
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 from app.helpers.database import connect_DB
+from app.helpers.catalogue import get_catalogue
 
 router = APIRouter()
 
@@ -10,11 +11,13 @@ agents_collection, stats = connect_DB()
 @router.get('/description')
 async def description(name: str):
     try:
-        entry = agents_collection.find_one({'name': name})
+        entry = get_catalogue().get_by_name(name)
+        if entry is None or entry['description'] is None:
+            raise ValueError(f'no description found for {name}')
         data = {
             'name': name,
             'type': entry['type'],
-            'description': entry['description'][0]
+            'description': entry['description']
         }
     except Exception as err:
         raise HTTPException(status_code=400, detail=f"Something went wrong while fetching agent description: {err}")
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from app.helpers.indexes import explain_query_shapes
+
+router = APIRouter()
+
+
+@router.get('/indexes', tags=["diagnostics"])
+async def indexes():
+    '''
+    Plan chosen by the database for each query shape of the API. Shapes resolved with a
+    collection scan (no usable index) are flagged with `collscan: true`.
+    '''
+    try:
+        report = explain_query_shapes()
+    except Exception as err:
+        raise HTTPException(status_code=400, detail=f"Something went wrong while explaining the queries: {err}")
+
+    data = {
+        'collscan': [shape['name'] for shape in report if shape.get('collscan')],
+        'shapes': report,
+    }
+    return JSONResponse(content=data)
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 from app.helpers.prepareVocabularies import prepareEDAM
+from app.helpers.cache import cached
 
 import json
 
 router = APIRouter()
 
 @router.get('/EDAMTerms', tags=["edam"])
-async def EDAMTerms():
+@cached(ttl=24 * 3600)
+async def EDAMTerms(request: Request):
     try:
         EDAMVocabularyItems = prepareEDAM()
     except:
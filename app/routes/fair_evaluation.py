@@ -3,6 +3,8 @@ from fastapi.responses import JSONResponse
 from app.helpers.FAIR_indicators_eval import computeScores_from_list
 from app.helpers.utils import prepareMetadataForEvaluation
 from app.helpers.database import connect_DB
+from app.helpers.metrics import MONGO_OPERATION_DURATION
+from app.helpers.profiling import profiling, span, should_sample, get_profile_store
 from app.models.instance import Instance
 from app.services.indicator_computation import IndicatorComputation
 from app.services.fair_scores import compute_fair_scores
@@ -32,6 +34,20 @@ async def evaluate(request: Request):
 class MetadataRequest(BaseModel):
     agent_metadata: Dict[str, Any] = Body(..., description="The metadata related to the agent that needs to be evaluated.")
     prepare: Optional[bool] = Body(True, description="Indicates whether the metadata needs to be prepared before evaluation. Defaults to True.")
+    profile: Optional[bool] = Body(False, description="Return the time spent in each step of the evaluation, with the URLs probed. Defaults to False.")
+
+
+def profiled_response(profile, response_data, requested, **context):
+    '''
+    Add the timing tree of the evaluation to the response if requested, and keep it in
+    the local store if the evaluation was sampled
+    '''
+    tree = profile.finish()
+    if requested:
+        response_data['profile'] = tree
+    else:
+        get_profile_store().add(tree, **context)
+    return response_data
 
 
 @router.post("/evaluate", tags=["fair"])
@@ -42,53 +58,60 @@ async def evaluate(
     try:
         agent_metadata = data.agent_metadata
         prepare = data.prepare
-        
-        # Check if preparation is needed
-        if prepare:
+
+        with profiling(data.profile or should_sample()) as profile:
+            # Check if preparation is needed
+            if prepare:
+                try:
+                    with span('preparation'):
+                        prepared_agent = prepareMetadataForEvaluation(agent_metadata)
+                except Exception as e:
+                    logging.error(f"Error during metadata preparation: {str(e)}")
+                    raise HTTPException(status_code=400, detail=f"Metadata preparation failed: {str(e)}")
+            else:
+                prepared_agent = agent_metadata
+
+            # Create an instance object
             try:
-                prepared_agent = prepareMetadataForEvaluation(agent_metadata)
+                with span('instance'):
+                    instance = Instance(**prepared_agent)
             except Exception as e:
-                logging.error(f"Error during metadata preparation: {str(e)}")
-                raise HTTPException(status_code=400, detail=f"Metadata preparation failed: {str(e)}")
-        else:
-            prepared_agent = agent_metadata
-        
-        # Create an instance object
-        try:
-            instance = Instance(**prepared_agent)
-        except Exception as e:
-            logging.error(f"Error creating instance: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Instance creation failed: {str(e)}")
-        
-        # Set super type based on web types
-        try:
-            instance.set_super_type(WEB_TYPES)
-        except Exception as e:
-            logging.error(f"Error setting super type: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error setting super type: {str(e)}")
-        
-        # Compute metrics
-        try:
-            computation = IndicatorComputation(instance)
-            computation.compute_indicators()
-        except Exception as e:
-            logging.error(f"Error computing indicators: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error computing indicators: {str(e)}")
-        
-        # Compute FAIR scores and get the result dictionary
-        try:
-            result = compute_fair_scores(instance)
-            logs = instance.logs.__dict__
-        except Exception as e:
-            logging.error(f"Error computing FAIR scores: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error computing FAIR scores: {str(e)}")
+                logging.error(f"Error creating instance: {str(e)}")
+                raise HTTPException(status_code=400, detail=f"Instance creation failed: {str(e)}")
+
+            # Set super type based on web types
+            try:
+                instance.set_super_type(WEB_TYPES)
+            except Exception as e:
+                logging.error(f"Error setting super type: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Error setting super type: {str(e)}")
+
+            # Compute metrics
+            try:
+                with span('indicators'):
+                    computation = IndicatorComputation(instance)
+                    computation.compute_indicators()
+            except Exception as e:
+                logging.error(f"Error computing indicators: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Error computing indicators: {str(e)}")
+
+            # Compute FAIR scores and get the result dictionary
+            try:
+                with span('compute_fair_scores'):
+                    result = compute_fair_scores(instance)
+                logs = instance.logs.__dict__
+            except Exception as e:
+                logging.error(f"Error computing FAIR scores: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Error computing FAIR scores: {str(e)}")
 
         # If all goes well, prepare the response
         response_data = {
             'result': result,
             'logs': logs
         }
-        
+        if profile:
+            response_data = profiled_response(profile, response_data, data.profile, route='/fair/evaluate', name=instance.name, type=instance.type)
+
         return JSONResponse(content=response_data)
 
     except HTTPException as http_exc:
@@ -105,27 +128,35 @@ async def evaluateId(request: Request):
     data = await request.json()
     id_ = data.get('id')
     if id_:
-        agent = agents_collection.find_one({'@id': id_})
+        with MONGO_OPERATION_DURATION.time(shape='find_one_by_id'):
+            agent = agents_collection.find_one({'@id': id_})
         if agent:
-            # Create an instance object
-            instance = Instance(**agent)
-            
-            # Set super type based on web types
-            instance.set_super_type(WEB_TYPES)
-            
-            # Compute metrics
-            computation = IndicatorComputation(instance)
-            computation.compute_indicators()
-            
-            # Compute FAIR scores and get the result dictionary
-            result = compute_fair_scores(instance)
-            
+            requested = bool(data.get('profile'))
+            with profiling(requested or should_sample()) as profile:
+                # Create an instance object
+                with span('instance'):
+                    instance = Instance(**agent)
+
+                # Set super type based on web types
+                instance.set_super_type(WEB_TYPES)
+
+                # Compute metrics
+                with span('indicators'):
+                    computation = IndicatorComputation(instance)
+                    computation.compute_indicators()
+
+                # Compute FAIR scores and get the result dictionary
+                with span('compute_fair_scores'):
+                    result = compute_fair_scores(instance)
+
             logs = instance.logs.__dict__
 
             data = {
                 'result': result,
                 'logs': logs
             }
+            if profile:
+                data = profiled_response(profile, data, requested, route='/fair/evaluateId', id=id_)
             return JSONResponse(content=data)
         else:
             raise HTTPException(status_code=400, detail="No agent id or metadata provided")
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
-from app.helpers.utils import prepareAgentMetadata, prepareMetadataForEvaluation, prepareListsIds, keep_first_label
+from app.helpers.utils import prepareMetadataForEvaluation, prepareListsIds
 from app.helpers.makejson import build_json_ld
 from app.helpers.makecff import create_cff
 from app.helpers.database import connect_DB
+from app.helpers.read_model import get_projector
+from app.helpers.catalogue import get_catalogue
+from app.helpers.cache import cached
 
 router = APIRouter()
 
@@ -12,25 +15,19 @@ agents_collection, stats = connect_DB()
 
 
 @router.get('/names_type_labels', tags=["agents"])
-async def names_type_labels():
-    agents = list(agents_collection.find({'source': {'$ne': ['galaxy_metadata']}}, {
-        '_id': 0,
-        '@id': 1,
-        'label': 1,
-        'type': 1,
-        'sources_labels': 1,
-        'name': 1
-    }))
-    resp = [keep_first_label(agent) for agent in agents]
+@cached()
+async def names_type_labels(request: Request):
+    # served from the in-memory catalogue index
+    resp = get_catalogue().get_names_type_labels()
     return JSONResponse(content=resp)
 
 @router.get('', tags=["agents"])
-async def agent_metadata(name: str = None, type: str = None):
+@cached()
+async def agent_metadata(request: Request, name: str = None, type: str = None):
     if not name and not type:
         raise HTTPException(status_code=400, detail="No agent name or type provided")
-    agent = agents_collection.find_one({'name': name, 'type': type})
+    agent = get_projector().find_one({'name': name, 'type': type})
     if agent:
-        agent = prepareAgentMetadata(agent)
         agent = prepareListsIds(agent)
         return JSONResponse(content=agent)
     else:
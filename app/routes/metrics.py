@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.helpers.metrics import REGISTRY, CONTENT_TYPE
+
+router = APIRouter()
+
+
+@router.get('/metrics', tags=["diagnostics"])
+async def metrics():
+    '''
+    Metrics of the API in the Prometheus text format
+    '''
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
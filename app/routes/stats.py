@@ -1,97 +1,165 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
-from app.helpers.router import make_query
+from app.helpers.router import make_query, make_batch_query, make_history_query, default_collection
+from app.helpers.history import delta_encode
+from app.helpers.cache import cached
 
 router = APIRouter()
 
 @router.get('/agents/licenses_summary_sunburst', tags=["stats"])
+@cached()
 async def licenses_summary_sunburst(request: Request):
     params = request.query_params
     resp = await make_query('licenses_summary_sunburst', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/licenses_open_source', tags=["stats"])
+@cached()
 async def licenses_open_source(request: Request):
     params = request.query_params
     resp = await make_query('licenses_open_source', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/semantic_versioning', tags=["stats"])
+@cached()
 async def semantic_versioning(request: Request):
     params = request.query_params
     resp = await make_query('semantic_versioning', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/version_control_count', tags=["stats"])
+@cached()
 async def version_control_count(request: Request):
     params = request.query_params
     resp = await make_query('version_control_count', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/version_control_repositories', tags=["stats"])
+@cached()
 async def version_control_repositories(request: Request):
     params = request.query_params
     resp = await make_query('version_control_repositories', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/publications_journals_IF', tags=["stats"])
+@cached()
 async def publications_journals_IF(request: Request):
     params = request.query_params
     resp = await make_query('publications_journals_IF', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/count_per_source', tags=["stats"])
+@cached()
 async def counts_per_source(request: Request):
     params = request.query_params
     resp = await make_query('agents_counts_per_source', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/count_total', tags=["stats"])
+@cached()
 async def count_total(request: Request):
     params = request.query_params
     resp = await make_query('agents_count', params)
     return JSONResponse(content=[resp])
 
 @router.get('/agents/features', tags=["stats"])
+@cached()
 async def features(request: Request):
     params = request.query_params
     resp = await make_query('features', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/coverage_sources', tags=["stats"])
+@cached()
 async def coverage_sources(request: Request):
     params = request.query_params
     resp = await make_query('coverage_sources', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/features_cummulative', tags=["stats"])
+@cached()
 async def features_cummulative(request: Request):
     params = request.query_params
     resp = await make_query('features_cummulative', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/distribution_features', tags=["stats"])
+@cached()
 async def distribution_features(request: Request):
     params = request.query_params
     resp = await make_query('distribution_features', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/types_count', tags=["stats"])
+@cached()
 async def types_count(request: Request):
     params = request.query_params
     resp = await make_query('types_count', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/fair_scores_summary', tags=["stats"])
+@cached()
 async def fair_scores_summary(request: Request):
     params = request.query_params
     resp = await make_query('FAIR_scores_summary', params)
     return JSONResponse(content=resp)
 
 @router.get('/agents/fair_scores_means', tags=["stats"])
+@cached()
 async def fair_scores_means(request: Request):
     params = request.query_params
     resp = await make_query('FAIR_scores_means', params)
     return JSONResponse(content=resp)
 
+# maximum number of variables in a /stats/batch request
+MAX_BATCH_VARIABLES = 50
 
+@router.get('/batch', tags=["stats"])
+@cached(list_params=('variables',))
+async def batch(request: Request):
+    '''
+    Several stats variables (comma-separated `variables`) in one request, with the same
+    `collection` and `version` parameters as the other stats routes
+    '''
+    params = request.query_params
+    variables = sorted({variable.strip() for variable in params.get('variables', '').split(',') if variable.strip()})
+    if not variables:
+        raise HTTPException(status_code=400, detail='The parameter variables is required')
+    if len(variables) > MAX_BATCH_VARIABLES:
+        raise HTTPException(status_code=400, detail=f'Too many variables (max. {MAX_BATCH_VARIABLES})')
+
+    records = await make_batch_query(variables, params)
+    resp = {
+        'variables': {variable: records.get(variable, 'No results found') for variable in variables},
+        'missing': [variable for variable in variables if variable not in records],
+    }
+    return JSONResponse(content=resp)
+
+@router.get('/history', tags=["stats"])
+@cached()
+async def history(request: Request):
+    '''
+    Every version of a stats `variable` between the versions `from` and `to` (optional),
+    oldest first. Unless `delta=false`, each version after the first one is a JSON Merge
+    Patch (RFC 7386) of the previous one.
+    '''
+    params = request.query_params
+    variable = params.get('variable', '').strip()
+    if not variable:
+        raise HTTPException(status_code=400, detail='The parameter variable is required')
+
+    records = await make_history_query(variable, params)
+    if params.get('delta', 'true').lower() == 'false':
+        versions = [{'version': record.get('version'), 'record': record} for record in records]
+        encoding = None
+    else:
+        versions = delta_encode(records)
+        encoding = 'merge-patch'
+
+    resp = {
+        'variable': variable,
+        'collection': params.get('collection', default_collection(variable)),
+        'encoding': encoding,
+        'versions': versions,
+    }
+    return JSONResponse(content=resp)
@@ -1,33 +1,79 @@
+import os
 import requests
+import time
 from typing import List
+from urllib.parse import quote
 from app.models.instance import Instance
+from app.helpers.metrics import URL_PROBES, URL_PROBE_DURATION, url_host, probe_outcome
+from app.helpers.profiling import record_probe
 import requests
 from typing import Optional
 
-def is_url_operational(url: str, timeout: int = 15) -> bool:
+# Timeout of the URL probes, in seconds
+PROBE_TIMEOUT = float(os.getenv('URL_PROBE_TIMEOUT', 15))
+
+
+def prefix_rewrite(prefix: str):
+    '''
+    Rewrite that sends every probe to `prefix` followed by the quoted URL (the form
+    served by the local stand-ins of benchmarks/standins.py)
+    '''
+    return lambda url: prefix + quote(str(url), safe='')
+
+# Hook applied to the URLs before probing them, to direct the probes to local stand-ins
+# in tests and benchmarks. Can be set with URL_PROBE_REWRITE=<prefix>.
+url_rewrite = prefix_rewrite(os.getenv('URL_PROBE_REWRITE')) if os.getenv('URL_PROBE_REWRITE') else None
+
+
+def set_url_rewrite(rewrite):
+    '''
+    Set the function applied to the URLs before probing them (None to probe them as they are).
+    Returns the previous one.
+    '''
+    global url_rewrite
+    previous, url_rewrite = url_rewrite, rewrite
+    return previous
+
+
+def is_url_operational(url: str, timeout: Optional[float] = None) -> bool:
     '''
     Check if a URL is operational by performing a HEAD request.
 
     Args:
         url (str): The URL to check.
-        timeout (int, optional): The timeout for the request in seconds. Defaults to 5.
+        timeout (float, optional): The timeout for the request in seconds. Defaults to PROBE_TIMEOUT (15).
     Returns:
         bool: True if the URL is operational, False otherwise.
     '''
+    if timeout is None:
+        timeout = PROBE_TIMEOUT
+    host = url_host(url)
+    start = time.perf_counter()
     try:
         # Perform a HEAD request to check if the URL is reachable
-        response = requests.head(url, timeout=timeout)
-
-        # Check if the response status code is in the range of 200-299
-        if response.status_code >= 200 and response.status_code < 300:
-            return True  # URL is operational
-        else:
-            print(f"URL responded with status: {response.status_code}")
-            return False  # URL is not operational
+        target = url_rewrite(url) if url_rewrite else url
+        response = requests.head(target, timeout=timeout)
     except requests.RequestException as e:
+        record_probe_metrics(url, host, time.perf_counter() - start, None, probe_outcome(error=e))
         print(f"Error checking URL: {e}")
         return False  # URL is not operational
 
+    record_probe_metrics(url, host, time.perf_counter() - start, response.status_code, probe_outcome(response.status_code))
+    # Check if the response status code is in the range of 200-299
+    if response.status_code >= 200 and response.status_code < 300:
+        return True  # URL is operational
+    else:
+        print(f"URL responded with status: {response.status_code}")
+        return False  # URL is not operational
+
+def record_probe_metrics(url, host, seconds, status, outcome):
+    '''
+    Record a URL probe in the metrics and in the profile of the evaluation, if any.
+    '''
+    URL_PROBE_DURATION.observe(seconds, host=host)
+    URL_PROBES.inc(host=host, outcome=outcome)
+    record_probe(url, seconds, status, outcome)
+
 def log_version(Instance: Instance, logs: list[str]) -> list[str]:
     '''
     Log the version of the Instance.
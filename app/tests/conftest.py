@@ -0,0 +1,45 @@
+import pytest
+
+from benchmarks.standins import StandinFarm
+
+# Answers of the URLs probed by the indicator tests, as the real sites give them
+STANDIN_WEB = {
+    'https://github.com/inab/oeb-visualizations': 200,
+    'http://github.com/inab/oeb-visualizations': {'status': 301, 'redirect': 'https://github.com/inab/oeb-visualizations'},
+    'https://github.com/inab/oeb-random': 404,
+    'https://inab.github.io/oeb-visualizations/': 200,
+    'https://github.io/oeb-visualizations/': 404,
+    'https://bitbucket.org/user/repo': 404,
+    'https://vre.multiscalegenomics.eu/': 200,
+    'https://vre.multiscalegenomics.eu/resource': 404,
+    'https://usegalaxy.eu': 200,
+    'https://usegalaxy.org/resource': 404,
+    'https://example.com': 200,
+    'https://opensource.org/licenses/MIT': 200,
+}
+
+# short, so that scripted timeouts do not slow the tests down
+PROBE_TIMEOUT = 0.5
+
+
+@pytest.fixture(scope='session')
+def standin_farm():
+    with StandinFarm(STANDIN_WEB, hang=2 * PROBE_TIMEOUT) as farm:
+        yield farm
+
+
+@pytest.fixture
+def standin_web(standin_farm):
+    '''
+    URL probes answered by the local stand-ins instead of the real sites
+    '''
+    with standin_farm.installed(probe_timeout=PROBE_TIMEOUT):
+        yield standin_farm
+
+
+@pytest.fixture(autouse=True)
+def offline_indicators(request):
+    # the indicator tests probe URLs: keep them deterministic and offline
+    if request.module.__name__.split('.')[-1].startswith('test_comp'):
+        request.getfixturevalue('standin_web')
+    yield
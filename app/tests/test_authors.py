@@ -0,0 +1,23 @@
+from app.helpers.authors import build_authors, resolve_author
+
+
+def test_build_authors_person_and_organization():
+    authors = build_authors(['Dr. Jane Doe <jane@doe.org>', 'ELIXIR Support Team', '(John Smith)'])
+    assert authors == [
+        {'type': 'person', 'name': 'Jane Doe', 'email': '', 'maintainer': False},
+        {'type': 'organization', 'name': 'ELIXIR Support Team', 'email': '', 'maintainer': False},
+        {'type': 'person', 'name': 'John Smith', 'email': '', 'maintainer': False},
+    ]
+
+def test_build_authors_deduplicates_cleaned_names():
+    authors = build_authors(['Jane Doe', 'Jane Doe [aut, cre]', ' Jane Doe '])
+    assert len(authors) == 1
+
+def test_build_authors_drops_empty_and_code_mentions():
+    assert build_authors(['', 'initial R code by someone', '[ctb]']) == []
+
+def test_build_authors_returns_copies_of_cached_entries():
+    first = build_authors(['Ada Lovelace'])
+    first[0]['maintainer'] = True
+    assert build_authors(['Ada Lovelace'])[0]['maintainer'] == False
+    assert resolve_author('Ada Lovelace')[1]['maintainer'] == False
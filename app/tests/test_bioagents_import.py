@@ -0,0 +1,72 @@
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+# the import script runs in the import container, where FAIRsoft is installed
+pytest.importorskip('FAIRsoft')
+
+SCRIPT = Path(__file__).resolve().parents[2] / 'mongo-compose' / 'bioagents-import.py'
+spec = importlib.util.spec_from_file_location('bioagents_import', SCRIPT)
+bioagents_import = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bioagents_import)
+
+
+def test_documents_are_stored_as_fairsoft_stores_them():
+    instance = {'name': 'bwa', 'type': 'cmd', 'about': {'date': object(), 'home': 'https://bwa'}}
+    document = bioagents_import.instance_document(instance)
+    assert document == {'name': 'bwa', 'type': 'cmd', 'about': {'home': 'https://bwa'}}
+    assert 'date' in instance['about']
+
+def test_bounded_map_keeps_order_and_bounds_reads():
+    read = []
+
+    def items():
+        for item in range(10):
+            read.append(item)
+            yield item
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = bioagents_import.bounded_map(pool, lambda item: item * 2, items(), in_flight=3)
+        assert next(results) == 0
+        assert len(read) == 4
+        assert list(results) == [2 * item for item in range(1, 10)]
+
+def test_changed_keys_are_the_written_keys():
+    instances = [{'@id': 'https://openebench.bsc.es/monitor/agent/bwa/cmd', 'name': 'bwa', 'type': 'cmd'}, {'name': 'trimal', 'type': 'cmd'}]
+    assert bioagents_import.changed_keys(instances) == [
+        {'@id': 'https://openebench.bsc.es/monitor/agent/bwa/cmd'},
+        {'name': 'trimal', 'type': 'cmd'},
+    ]
+
+def test_spooled_agents_are_read_again(tmp_path):
+    agents = [{'@id': 'a', 'score': Decimal('0.5')}, {'@id': 'b'}]
+    with open(tmp_path / 'spool', 'w+') as spool:
+        assert list(bioagents_import.spooled(agents, spool)) == agents
+        assert list(bioagents_import.read_spool(spool)) == [{'@id': 'a', 'score': 0.5}, {'@id': 'b'}]
+
+def test_fingerprints_do_not_depend_on_the_parser():
+    with_ijson = {'@id': 'a', 'score': Decimal('0.5'), 'stars': Decimal('3'), 'ratio': Decimal('2.0')}
+    with_json = {'@id': 'a', 'score': 0.5, 'stars': 3, 'ratio': 2.0}
+    assert bioagents_import.fingerprint(with_ijson) == bioagents_import.fingerprint(with_json)
+
+def test_groups_with_failed_writes_are_not_stored():
+    groups = {'bwa', 'trimal', 'samtools'}
+    assert bioagents_import.written_groups(groups, []) == groups
+    assert bioagents_import.written_groups(groups, ['TrimAl']) == {'bwa', 'samtools'}
+    # a failure that cannot be matched to its group: nothing is known to be written
+    assert bioagents_import.written_groups(groups, ['unknown']) == set()
+
+class FailingCollection:
+    def bulk_write(self, operations, ordered):
+        raise BulkWriteError({'writeErrors': [{'index': 1, 'errmsg': 'document too large'}], 'nUpserted': 1})
+
+def test_failed_writes_are_logged_by_name():
+    log = {'errors': []}
+    instances = [{'name': 'bwa', 'type': 'cmd'}, {'name': 'trimal', 'type': 'cmd'}]
+    log = bioagents_import.upsert_instances(FailingCollection(), instances, bioagents_import.Throughput('write'), log)
+    assert log['failed'] == ['trimal']
+    assert log['errors'] == [{'error': 'document too large'}]
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.helpers.cache import cached, ResponseCache, LRUBackend, CacheVersions, get_cache, get_versions, invalidate, invalidate_catalogue
+from app.helpers import changes
+
+app = FastAPI()
+calls = []
+
+@app.get('/items')
+@cached(list_params=('source',))
+async def items(request: Request):
+    calls.append(dict(request.query_params))
+    return JSONResponse(content={'source': request.query_params.get('source')})
+
+client = TestClient(app)
+
+
+def test_cached_route_hits_and_normalizes_list_params():
+    get_cache().backend.clear()
+    calls.clear()
+    first = client.get('/items?source=b,a&page=')
+    second = client.get('/items?source=a,b')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert first.json() == second.json()
+    assert len(calls) == 1
+
+def test_cached_route_etag_not_modified():
+    response = client.get('/items?source=c')
+    etag = response.headers['ETag']
+    response = client.get('/items?source=c', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+
+def test_catalogue_refresh_invalidates_after_the_change():
+    get_cache().backend.clear()
+    calls.clear()
+    client.get('/items?source=d')
+    # derived data is not refreshed yet: the cached response is still served
+    changes.publish(['some-agent'])
+    assert client.get('/items?source=d').headers['X-Cache'] == 'HIT'
+    invalidate_catalogue(['some-agent'])
+    time.sleep(get_versions().delay + 0.1)
+    response = client.get('/items?source=d')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(calls) == 2
+
+def test_single_flight_coalesces_concurrent_misses():
+    cache = ResponseCache(LRUBackend())
+    computations = []
+
+    async def compute():
+        computations.append(1)
+        await asyncio.sleep(0.01)
+        return {'value': 1}
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_compute('key', compute, 60) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert len(computations) == 1
+    assert {entry.body for entry, hit in results} == {b'{"value":1}'}
+
+def test_waiters_compute_when_the_leader_is_cancelled():
+    cache = ResponseCache(LRUBackend())
+    computations = []
+
+    async def compute():
+        computations.append(1)
+        await asyncio.sleep(0.05)
+        return {'value': len(computations)}
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute('key', compute, 60))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute('key', compute, 60))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.wait_for(waiter, 1)
+
+    entry, hit = asyncio.run(run())
+    assert entry.body == b'{"value":2}'
+    assert len(computations) == 2
+    assert not cache.inflight
+
+class VersionsCollection:
+    def __init__(self):
+        self.docs = {}
+        self.writes = 0
+
+    def find(self, query):
+        return [{'_id': name, 'version': version} for name, version in self.docs.items() if name in query['_id']['$in']]
+
+    def find_one_and_update(self, query, update, upsert, return_document):
+        self.writes += 1
+        name = query['_id']
+        self.docs[name] = self.docs.get(name, 0) + update['$inc']['version']
+        return {'_id': name, 'version': self.docs[name]}
+
+def test_versions_are_shared_between_processes():
+    collection = VersionsCollection()
+    worker, cli = CacheVersions(collection, poll=0), CacheVersions(collection, poll=0)
+    before = asyncio.run(worker.current())
+    cli.bump('stats')
+    after = asyncio.run(worker.current())
+    assert after != before
+    assert after == cli.snapshot()
+
+def test_bumps_are_gathered_into_one_write():
+    collection = VersionsCollection()
+    versions = CacheVersions(collection, poll=0, delay=0.05)
+    for _ in range(5):
+        versions.bump_later('catalogue')
+    time.sleep(0.2)
+    assert collection.writes == 1
+    assert versions.snapshot() == [1, 0]
+
+def test_stats_write_invalidates():
+    get_cache().backend.clear()
+    calls.clear()
+    client.get('/items?source=e')
+    invalidate('stats')
+    response = client.get('/items?source=e')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(calls) == 2
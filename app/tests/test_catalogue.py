@@ -0,0 +1,42 @@
+from app.helpers.catalogue import CatalogueIndex
+
+
+class AgentsCollection:
+    def __init__(self, agents):
+        self.agents = {agent['@id']: agent for agent in agents}
+        self.found = []
+
+    def find(self, query, projection=None):
+        ids = query['@id']['$in'] if query else list(self.agents)
+        self.found.append(len(ids))
+        return [dict(self.agents[id_]) for id_ in ids if id_ in self.agents]
+
+
+AGENTS = [
+    {'@id': 'trimal/cmd', 'name': 'trimal', 'type': 'cmd', 'label': ['trimAl'], 'source': ['bioagents']},
+    {'@id': 'trimal/web', 'name': 'trimal', 'type': 'web', 'label': ['trimAl web'], 'source': ['bioagents']},
+    {'@id': 'bwa/cmd', 'name': 'bwa', 'type': 'cmd', 'label': ['BWA'], 'source': ['galaxy_metadata']},
+]
+
+
+def test_changes_update_only_the_changed_agents():
+    collection = AgentsCollection(AGENTS)
+    catalogue = CatalogueIndex(collection)
+    catalogue.load()
+    assert catalogue.get_by_name('trimal')['@id'] == 'trimal/cmd'
+    assert [item['@id'] for item in catalogue.get_names_type_labels()] == ['trimal/cmd', 'trimal/web']
+
+    # the first agent of a name is deleted: the next one takes its name
+    del collection.agents['trimal/cmd']
+    collection.agents['samtools/cmd'] = {'@id': 'samtools/cmd', 'name': 'samtools', 'type': 'cmd', 'source': ['bioconda']}
+    catalogue.refresh(['trimal/cmd', 'samtools/cmd'])
+    assert collection.found[-1] == 2
+    assert catalogue.get_by_name('trimal')['@id'] == 'trimal/web'
+    assert catalogue.get_by_name('samtools')['label'] is None
+    assert sorted(item['@id'] for item in catalogue.get_names_type_labels()) == ['samtools/cmd', 'trimal/web']
+
+    del collection.agents['trimal/web']
+    catalogue.refresh(['trimal/web'])
+    assert catalogue.get_by_name('trimal') is None
+    assert 'trimal' not in catalogue.ids_by_name
+    assert len(catalogue.all_entries()) == 2
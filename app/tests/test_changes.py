@@ -0,0 +1,13 @@
+from app.helpers.changes import changed_id
+
+
+def test_id_of_inserts_and_updates():
+    change = {'operationType': 'update', 'documentKey': {'_id': 1}, 'fullDocument': {'_id': 1, '@id': 'agent-a'}}
+    assert changed_id(change) == 'agent-a'
+
+def test_id_of_deletes_is_resolved_from_the_document_key():
+    known = {1: 'agent-a'}
+    delete = {'operationType': 'delete', 'documentKey': {'_id': 1}}
+    assert changed_id(delete, known.get) == 'agent-a'
+    assert changed_id({'operationType': 'delete', 'documentKey': {'_id': 2}}, known.get) is None
+    assert changed_id(delete) is None
@@ -0,0 +1,83 @@
+import random
+
+from app.helpers.edam_hierarchy import EDAMHierarchy, read_edam_csv, get_edam_hierarchy
+from app.helpers.EDAM_forFE import EDAMDict
+
+T = 'http://edamontology.org/topic_'
+
+CSV = f'''Class ID,Preferred Label,Obsolete,Parents
+{T}0003,Topic,FALSE,http://www.w3.org/2002/07/owl#Thing
+{T}0080,Sequence analysis,FALSE,{T}0003
+{T}0182,Sequence alignment,FALSE,{T}0080|{T}0160
+{T}0160,Sequence sites,FALSE,{T}0003
+{T}0184,Structure alignment,FALSE,{T}0182
+{T}9999,Old topic,TRUE,{T}0080
+'''
+
+
+def closure(parents):
+    children = {uri: set() for uri in parents}
+    for uri, uri_parents in parents.items():
+        for parent in uri_parents:
+            children[parent].add(uri)
+    def descendants(uri):
+        found = {uri}
+        for child in children[uri]:
+            found |= descendants(child)
+        return found
+    return {uri: descendants(uri) for uri in parents}
+
+
+def test_read_csv_and_expand(tmp_path):
+    path = tmp_path / 'EDAM.csv'
+    path.write_text(CSV)
+    parents = read_edam_csv(path)
+    assert f'{T}9999' not in parents
+    hierarchy = EDAMHierarchy(parents)
+    assert hierarchy.available
+
+    assert sorted(hierarchy.descendants(f'{T}0080')) == [f'{T}0080', f'{T}0182', f'{T}0184']
+    # reached through both parents, listed once
+    expanded = hierarchy.expand([f'{T}0080', f'{T}0160', f'{T}0184', 'other'])
+    assert sorted(expanded) == sorted([f'{T}0080', f'{T}0160', f'{T}0182', f'{T}0184', 'other'])
+    assert len(expanded) == 5
+    assert hierarchy.ancestors[f'{T}0184'] == {f'{T}0182', f'{T}0080', f'{T}0160', f'{T}0003'}
+    assert hierarchy.is_descendant(f'{T}0184', f'{T}0160')
+    assert not hierarchy.is_descendant(f'{T}0160', f'{T}0080')
+
+def test_intervals_match_closure_of_random_dag():
+    rng = random.Random(3)
+    nodes = [f'n{i}' for i in range(300)]
+    parents = {node: rng.sample(nodes[:i], min(i, rng.choice([0, 1, 1, 2, 3]))) for i, node in enumerate(nodes)}
+    hierarchy = EDAMHierarchy(parents)
+    expected = closure(parents)
+    for node in nodes:
+        descendants = hierarchy.descendants(node)
+        assert len(descendants) == len(set(descendants))
+        assert set(descendants) == expected[node]
+        for other in rng.sample(nodes, 10):
+            assert hierarchy.is_descendant(other, node) == (other in expected[node])
+    assert sum(len(intervals) for intervals in hierarchy.intervals.values()) < 4 * len(nodes)
+
+def test_missing_file_expands_to_the_terms(monkeypatch, tmp_path):
+    monkeypatch.setenv('EDAM_CSV_PATH', str(tmp_path / 'missing.csv'))
+    get_edam_hierarchy.cache_clear()
+    try:
+        hierarchy = get_edam_hierarchy()
+        assert not hierarchy.available
+        assert hierarchy.expand([f'{T}0080', f'{T}0080']) == [f'{T}0080']
+    finally:
+        get_edam_hierarchy.cache_clear()
+
+def test_shipped_file_is_loaded(monkeypatch):
+    monkeypatch.delenv('EDAM_CSV_PATH', raising=False)
+    get_edam_hierarchy.cache_clear()
+    try:
+        hierarchy = get_edam_hierarchy()
+        assert hierarchy.available
+        # Sequence analysis is below Computational biology
+        assert hierarchy.is_descendant(f'{T}0080', f'{T}3307')
+        assert f'{T}0080' in hierarchy.descendants(f'{T}0003')
+        assert all(EDAMDict.get(uri) for uri in hierarchy.by_number)
+    finally:
+        get_edam_hierarchy.cache_clear()
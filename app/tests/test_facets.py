@@ -0,0 +1,65 @@
+from app.helpers.facets import FacetIndex, bitmap_from_ordinals, ordinals_from_bitmap
+
+
+def make_agent(id_, type_, sources, license=(), tags=(), topics=()):
+    return {
+        '@id': id_,
+        'type': type_,
+        'source': list(sources),
+        'license': [{'name': name, 'url': ''} for name in license],
+        'tags': list(tags),
+        'topics': [{'vocabulary': 'EDAM', 'term': '', 'uri': uri} for uri in topics],
+        'edam_topics': list(topics),
+        'operations': [],
+        'edam_operations': [],
+        'input': [{'vocabulary': 'EDAM', 'term': 'FASTA', 'uri': 'http://edamontology.org/format_1929'}],
+        'output': [{'vocabulary': '', 'term': 'CSV', 'uri': ''}],
+    }
+
+AGENTS = [
+    make_agent('a', 'cmd', ['bioconda', 'bioconda_recipes'], ['MIT'], ['RIS3CAT VEIS'], ['t1']),
+    make_agent('b', 'web', ['bioagents', 'opeb_metrics'], ['GPL-3.0'], [], ['t1', 't2']),
+    make_agent('c', 'cmd', ['galaxy_metadata', 'github'], ['MIT']),
+]
+
+def build_index():
+    index = FacetIndex()
+    index.build(AGENTS)
+    return index
+
+
+def test_bitmap_round_trip():
+    assert ordinals_from_bitmap(bitmap_from_ordinals([0, 9, 64, 3])) == [0, 3, 9, 64]
+
+def test_filter_and_across_facets_or_within_facet():
+    index = build_index()
+    allowed = index.filter({'type': ['cmd'], 'license': ['MIT', 'GPL-3.0']})
+    assert index.select(['c', 'b', 'a'], allowed) == ['c', 'a']
+    allowed = index.filter({'topics': ['t2'], 'source': ['bioagents', 'github']})
+    assert index.select(['a', 'b', 'c'], allowed) == ['b']
+
+def test_stats_per_facet():
+    index = build_index()
+    stats = index.stats(['a', 'b', 'c'])
+    assert stats['type'] == {'cmd': 2, 'web': 1}
+    assert stats['source'] == {'bioconda': 1, 'bioagents': 1, 'agentshed': 1, 'github': 1}
+    assert stats['license'] == {'MIT': 2, 'GPL-3.0': 1}
+    assert stats['topics'] == {'t1': 2, 't2': 1}
+    assert stats['input'] == {'http://edamontology.org/format_1929': 3}
+    assert stats['output'] == {'CSV': 3}
+    assert stats['collection'] == {'RIS3CAT VEIS': 1}
+
+def test_stats_with_bitmaps_and_with_values_agree(monkeypatch):
+    index = build_index()
+    with_bitmaps = index.stats(['a', 'c'])
+    # counting the values of each agent instead of a popcount per value
+    monkeypatch.setattr('app.helpers.facets.AVERAGE_VALUES', 0)
+    assert index.stats(['a', 'c']) == with_bitmaps
+
+def test_incremental_update():
+    index = build_index()
+    changed = make_agent('a', 'lib', ['bioconda'], ['Apache-2.0'])
+    index.update([changed, make_agent('d', 'cmd', ['github'])], removed_ids=['c'])
+    assert index.select(['a', 'b', 'c', 'd'], index.filter({'type': ['cmd']})) == ['d']
+    assert index.select(['a', 'b', 'c', 'd'], index.filter({'license': ['MIT']})) == []
+    assert index.stats(['a', 'b', 'c', 'd'])['type'] == {'lib': 1, 'web': 1, 'cmd': 1}
@@ -0,0 +1,44 @@
+from app.helpers.fuzzy import FuzzyNameIndex, bounded_distance, compact
+
+
+CATALOGUE = [
+    {'@id': 'bwa', 'name': 'bwa-mem', 'label': 'BWA MEM', 'source': ['bioagents']},
+    {'@id': 'samtools', 'name': 'samtools', 'label': 'SAMtools', 'source': ['bioconda']},
+    {'@id': 'samblaster', 'name': 'samblaster', 'label': 'samblaster', 'source': ['bioconda']},
+    {'@id': 'trimal', 'name': 'trimal', 'label': 'trimAl', 'source': ['bioagents']},
+    {'@id': 'galaxy', 'name': 'samtool', 'label': 'samtool', 'source': ['galaxy_metadata']},
+]
+
+
+def build_index():
+    index = FuzzyNameIndex()
+    index.build(CATALOGUE)
+    return index
+
+
+def test_compact_variants():
+    assert compact('bwa-mem') == compact('bwa_mem') == compact('BWA MEM') == 'bwamem'
+
+def test_bounded_distance():
+    assert bounded_distance('samtools', 'samtols', 2) == 1
+    assert bounded_distance('samtools', 'smatools', 2) == 2
+    assert bounded_distance('samtools', 'trimal', 2) is None
+    assert bounded_distance('', 'ab', 2) == 2
+
+def test_near_matches_closest_first():
+    index = build_index()
+    assert index.search('bwa_mem') == [('bwa', 0)]
+    assert index.search('SAM tools') == [('samtools', 0)]
+    assert index.search('samtols') == [('samtools', 1)]
+    assert index.search('trimall') == [('trimal', 1)]
+    assert index.search('blast') == []
+    assert index.search('--') == []
+
+def test_galaxy_metadata_only_agents_are_skipped():
+    index = build_index()
+    assert 'galaxy' not in [id_ for id_, distance in index.search('samtool')]
+
+def test_short_queries_find_names_without_shared_trigrams():
+    index = FuzzyNameIndex()
+    index.build([{'@id': 'ab', 'name': 'ab', 'source': ['bioagents']}, {'@id': 'abcd', 'name': 'abcd', 'source': ['bioagents']}])
+    assert index.search('xb') == [('ab', 1)]
@@ -0,0 +1,40 @@
+from app.helpers.history import merge_patch, apply_merge_patch, delta_encode, delta_decode
+
+
+RECORDS = [
+    {'variable': 'agents_counts_per_source', 'version': '1.0', 'data': {'bioconda': 10, 'galaxy': 5, 'github': 3}},
+    {'variable': 'agents_counts_per_source', 'version': '1.1', 'data': {'bioconda': 12, 'galaxy': 5, 'github': 3}},
+    {'variable': 'agents_counts_per_source', 'version': '1.2', 'data': {'bioconda': 12, 'galaxy': 5}},
+    {'variable': 'agents_counts_per_source', 'version': '1.3', 'data': {'bioconda': 12, 'galaxy': None}},
+    {'variable': 'agents_counts_per_source', 'version': '1.4', 'data': [1, 2, 3]},
+]
+
+
+def test_merge_patch_only_has_changes():
+    assert merge_patch(RECORDS[0], RECORDS[1]) == {'version': '1.1', 'data': {'bioconda': 12}}
+    assert merge_patch(RECORDS[1], RECORDS[2]) == {'version': '1.2', 'data': {'github': None}}
+    assert apply_merge_patch(RECORDS[1], merge_patch(RECORDS[1], RECORDS[2])) == RECORDS[2]
+
+def test_delta_encoding_round_trip():
+    encoded = delta_encode(RECORDS)
+    assert 'record' in encoded[0]
+    assert 'patch' in encoded[1] and 'patch' in encoded[2]
+    # null values cannot be sent in a patch
+    assert encoded[3] == {'version': '1.3', 'record': RECORDS[3]}
+    assert encoded[4] == {'version': '1.4', 'patch': {'version': '1.4', 'data': [1, 2, 3]}}
+    assert delta_decode(encoded) == RECORDS
+
+def test_empty_history():
+    assert delta_encode([]) == []
+
+def test_nested_nulls_are_sent_whole():
+    old = {'version': '1', 'data': 3, 'other': {'a': 1}}
+    for new in [
+        # an object replacing a number
+        {'version': '2', 'data': {'bioconda': None}, 'other': {'a': 1}},
+        # a new key holding an object with a null
+        {'version': '2', 'data': 3, 'other': {'a': 1, 'b': {'c': None}}},
+    ]:
+        encoded = delta_encode([old, new])
+        assert 'record' in encoded[1]
+        assert delta_decode(encoded) == [old, new]
@@ -0,0 +1,14 @@
+from app.helpers.indexes import plan_stages
+
+
+def test_plan_stages_with_index_scan():
+    plan = {'stage': 'LIMIT', 'inputStage': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}
+    assert plan_stages(plan) == ['LIMIT', 'FETCH', 'IXSCAN']
+
+def test_plan_stages_with_collection_scan_in_or_branch():
+    plan = {'stage': 'SUBPLAN', 'inputStage': {'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}]}}
+    assert 'COLLSCAN' in plan_stages(plan)
+
+def test_plan_stages_slot_based_plan():
+    plan = {'queryPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}, 'slotBasedPlan': {}}
+    assert plan_stages(plan) == ['FETCH', 'IXSCAN']
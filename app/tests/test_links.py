@@ -0,0 +1,22 @@
+from app.helpers.links import classify_link, find_link
+
+
+def test_classify_link_github_repository():
+    assert classify_link('https://github.com/inab/oeb-visualizations/issues') == (('github', 'https://github.com/inab/oeb-visualizations'),)
+
+def test_classify_link_bioconductor_adds_html():
+    link = 'http://www.bioconductor.org/packages/release/bioc/html/limma.html'
+    assert find_link(link, 'bioconductor') == 'http://www.bioconductor.org/packages/release/bioc/html/limma.html'
+
+def test_classify_link_galaxy_and_agentshed():
+    assert classify_link('https://usegalaxy.eu/?agent_id=x') == (('galaxy', 'https://usegalaxy.eu'),)
+    assert classify_link('https://agentshed.galaxyproject.org/view/x') == (('agentshed', 'https://agentshed.galaxyproject.org'),)
+
+def test_classify_link_host_mentioned_in_another_url():
+    link = 'https://example.org/redirect?to=github.com/owner/repo&mirror=bitbucket.org/owner/repo'
+    assert classify_link(link) == (('github', 'github.com/owner/repo'), ('bitbucket', 'bitbucket.org/owner/repo'))
+
+def test_classify_link_unrelated_or_incomplete():
+    assert classify_link('https://example.org/agent') == ()
+    assert classify_link('https://github.com/') == ()
+    assert find_link('https://bitbucket.org/owner/repo', 'github') is None
@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from app.helpers.database import read_config
+from benchmarks.load_test import (
+    read_seed, seed_stats, select_database, synthetic_agents, scale_up, parse_mix, RequestMix, run_load, summarize, compare,
+    STATS_ROUTES,
+)
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class Client:
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, path, params=None, json=None):
+        self.requests.append((method, path))
+        if path == '/edam/EDAMTerms':
+            return Response(200, {'X-Cache': 'HIT'})
+        return Response(500 if path == '/fair/evaluateId' else 200)
+
+
+def test_read_seed_skips_lfs_pointers(tmp_path):
+    pointer = tmp_path / 'agents.json'
+    pointer.write_text('version https://git-lfs.github.com/spec/v1\noid sha256:abc\nsize 1\n')
+    assert read_seed(str(pointer)) is None
+    assert read_seed(str(tmp_path / 'missing.json')) is None
+
+    dump = tmp_path / 'dump.json'
+    dump.write_text('[{"_id": {"$oid": "5f1b2c3d4e5f6a7b8c9d0e1f"}, "@id": "a", "name": "x"}]')
+    assert read_seed(str(dump)) == [{'@id': 'a', 'name': 'x'}]
+
+def test_scale_up_keeps_ids_unique():
+    agents = synthetic_agents(20)
+    scaled = scale_up(agents, 10)
+    assert len(scaled) == 200
+    assert len({agent['@id'] for agent in scaled}) == 200
+    assert len({(agent['name'], agent['type']) for agent in scaled}) == 200
+    assert scaled[:20] == agents
+
+def test_mix_draws_every_kind():
+    request_mix = RequestMix(synthetic_agents(50), parse_mix('search=1,evaluate_id=1,stats_batch=1'))
+    rng = random.Random(0)
+    drawn = {request_mix.draw(rng)[0] for _ in range(200)}
+    assert drawn == {'search', 'evaluate_id', 'stats_batch'}
+    method, path, params, body = request_mix.evaluate_id(rng)
+    assert (method, path) == ('POST', '/fair/evaluateId') and body['id']
+
+def test_seeded_stats_are_served_by_the_stats_routes():
+    records = seed_stats(synthetic_agents(20))
+    assert {record['variable'] for record in records} == set(STATS_ROUTES.values())
+    engine = [record for record in records if record['collection'] == 'agents_engine']
+    assert {record['variable']: record['data'] for record in engine}['agents_count'] == 20
+    synthetic = [record for record in records if record not in engine]
+    assert synthetic and all(record['synthetic'] and record['collection'] == 'agents' for record in synthetic)
+    request_mix = RequestMix(synthetic_agents(5), variables={'agents_count', 'types_count'})
+    rng = random.Random(0)
+    paths = {request_mix.stats(rng)[1] for _ in range(50)}
+    assert paths == {'/stats/agents/count_total', '/stats/agents/types_count'}
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    def write(host):
+        path = tmp_path / 'config.ini'
+        path.write_text(f'[MONGO_DETAILS]\nDBHOST = {host}\nDATABASE = observatory\n')
+        monkeypatch.setenv('CONFIG_PATH', str(path))
+        read_config.cache_clear()
+    yield write
+    read_config.cache_clear()
+
+def test_seeding_a_remote_database_needs_a_dedicated_one(config):
+    config('mongo.example.org')
+    with pytest.raises(SystemExit):
+        select_database(seed=True)
+    with pytest.raises(SystemExit):
+        select_database('observatory', seed=True)
+    assert select_database(seed=False) == 'observatory'
+    assert select_database('observatory_load', seed=True) == 'observatory_load'
+    assert read_config()['MONGO_DETAILS']['DATABASE'] == 'observatory_load'
+
+def test_seeding_a_local_database(config):
+    config('localhost')
+    assert select_database(seed=True) == 'observatory'
+
+def test_run_and_summarize():
+    client = Client()
+    request_mix = RequestMix(synthetic_agents(50), parse_mix('edam=1,evaluate_id=1'))
+    samples, elapsed = run_load(client, request_mix, 0.2, 2)
+    summary = summarize(samples, elapsed)
+    assert summary['all']['requests'] == len(samples) == len(client.requests)
+    assert summary['evaluate_id']['errors'] == summary['evaluate_id']['requests']
+    assert summary['edam']['cache_hits'] == summary['edam']['requests']
+    assert summary['all']['p50_ms'] <= summary['all']['p99_ms'] <= summary['all']['max_ms']
+
+def test_compare_flags_regressions():
+    previous = {'meta': {'commit': 'abc'}, 'summary': {'search': {'p50_ms': 10, 'p99_ms': 50, 'rps': 100}}}
+    report = {'meta': {'commit': 'def'}, 'summary': {'search': {'p50_ms': 10.5, 'p99_ms': 80, 'rps': 70}}}
+    regressions = compare(report, previous)
+    assert [(r['kind'], r['metric']) for r in regressions] == [('search', 'p99_ms'), ('search', 'rps')]
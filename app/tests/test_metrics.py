@@ -0,0 +1,74 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.helpers.metrics import (
+    Registry, BoundedLabel, MetricsMiddleware, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT,
+    probe_outcome, url_host,
+)
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+@app.get('/items/{item_id}')
+async def item(item_id: str):
+    return {'id': item_id}
+
+client = TestClient(app)
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    counter = registry.counter('probes_total', 'Probes', ('host', 'outcome'))
+    gauge = registry.gauge('in_flight', 'In flight')
+    counter.inc(host='a.org', outcome='2xx')
+    counter.inc(2, host='a.org', outcome='2xx')
+    counter.inc(host='b"\\', outcome='timeout')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    text = registry.render()
+    assert '# TYPE probes_total counter' in text
+    assert 'probes_total{host="a.org",outcome="2xx"} 3' in text
+    assert 'probes_total{host="b\\"\\\\",outcome="timeout"} 1' in text
+    assert 'in_flight 1' in text
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1))
+    for value in [0.05, 0.1, 0.5, 3]:
+        histogram.observe(value, route='/x')
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/x"} 4' in lines
+    assert 'latency_seconds_sum{route="/x"} 3.65' in lines
+
+def test_duplicate_metric_rejected():
+    registry = Registry()
+    registry.counter('x_total', 'X')
+    try:
+        registry.counter('x_total', 'X')
+    except ValueError:
+        pass
+    else:
+        assert False
+
+def test_middleware_uses_route_templates():
+    before = HTTP_REQUEST_DURATION.count(method='GET', route='/items/{item_id}', status='200')
+    client.get('/items/1')
+    client.get('/items/2')
+    client.get('/nothing')
+    assert HTTP_REQUEST_DURATION.count(method='GET', route='/items/{item_id}', status='200') == before + 2
+    assert HTTP_REQUEST_DURATION.count(method='GET', route='unmatched', status='404') >= 1
+    assert HTTP_REQUESTS_IN_FLIGHT.value(method='GET', route='/items/{item_id}') == 0
+
+def test_bounded_label():
+    label = BoundedLabel(limit=2)
+    assert [label(value) for value in ['a', 'b', 'c', 'a']] == ['a', 'b', 'other', 'a']
+
+def test_probe_labels():
+    assert probe_outcome(404) == '4xx'
+    assert probe_outcome(error=TimeoutError()) == 'timeout'
+    assert probe_outcome(error=ValueError()) == 'error'
+    assert url_host('https://GitHub.com/a/b') == 'github.com'
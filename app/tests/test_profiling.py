@@ -0,0 +1,80 @@
+import requests
+
+from app.helpers.profiling import profiling, span, record_probe, should_sample, ProfileStore
+from app.services.indicator_computation import IndicatorComputation
+from app.services import utils
+
+
+class Response:
+    status_code = 404
+
+
+def test_spans_nest_and_collect_probes():
+    with profiling() as profile:
+        with span('indicators'):
+            with span('compA1_3'):
+                record_probe('https://example.org', 0.5, 404, '4xx')
+        with span('compute_fair_scores'):
+            pass
+    tree = profile.finish()
+    assert [child['name'] for child in tree['children']] == ['indicators', 'compute_fair_scores']
+    indicator = tree['children'][0]['children'][0]
+    assert indicator['name'] == 'compA1_3'
+    assert indicator['probes'] == [{'url': 'https://example.org', 'seconds': 0.5, 'status': 404, 'outcome': '4xx'}]
+    assert tree['seconds'] >= indicator['seconds']
+
+def test_spans_without_profile_are_noops():
+    with profiling(False) as profile:
+        with span('instance') as node:
+            record_probe('https://example.org', 0.1)
+    assert profile is None
+    assert node is None
+
+def test_probe_and_indicator_recorded(monkeypatch):
+    monkeypatch.setattr(utils.requests, 'head', lambda url, timeout: Response())
+
+    def compA1_3(instance):
+        return utils.is_url_operational('https://example.org/x'), ['log']
+
+    class Instance:
+        pass
+
+    with profiling() as profile:
+        computation = IndicatorComputation(Instance())
+        computation.compute('A1_3', compA1_3)
+    node = profile.finish()['children'][0]
+    assert node['name'] == 'compA1_3'
+    assert node['probes'][0]['status'] == 404
+    assert node['probes'][0]['outcome'] == '4xx'
+    assert computation.instance.metrics.A1_3 is False
+
+def test_probe_error_outcome(monkeypatch):
+    def head(url, timeout):
+        raise requests.exceptions.ConnectTimeout('slow')
+    monkeypatch.setattr(utils.requests, 'head', head)
+    with profiling() as profile:
+        assert utils.is_url_operational('https://example.org/slow') is False
+    assert profile.finish()['probes'][0]['outcome'] == 'timeout'
+
+def test_sampling_rate():
+    assert not should_sample(0)
+    assert should_sample(100)
+
+def test_store_appends_jsonl(tmp_path):
+    store = ProfileStore(str(tmp_path / 'profiles.jsonl'))
+    store.add({'name': 'evaluation'}, route='/fair/evaluateId', id='a')
+    store.add({'name': 'evaluation'}, route='/fair/evaluateId', id='b')
+    records = store.read()
+    assert [record['id'] for record in records] == ['a', 'b']
+    assert records[0]['profile'] == {'name': 'evaluation'}
+
+def test_store_is_rotated(tmp_path):
+    path = str(tmp_path / 'profiles.jsonl')
+    store = ProfileStore(path, max_bytes=200, backups=2)
+    for i in range(12):
+        store.add({'name': 'evaluation'}, id=str(i))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['profiles.jsonl', 'profiles.jsonl.1', 'profiles.jsonl.2']
+    assert all(p.stat().st_size <= 200 for p in tmp_path.iterdir())
+    # the newest profiles are in the store, the oldest ones were dropped
+    assert store.read()[-1]['id'] == '11'
+    assert ProfileStore(path + '.2').read()[0]['id'] != '0'
@@ -0,0 +1,93 @@
+import re
+
+from app.helpers.publication_index import PublicationIndex, database_expressions, publication_texts
+from app.helpers.query import compile_query
+
+
+AGENTS = [
+    {'@id': 'a', 'source': ['bioagents'], 'publication': [
+        {'title': 'trimAl: a tool for automated alignment trimming', 'abstract': 'Multiple sequence alignments are central...'},
+    ]},
+    {'@id': 'b', 'source': ['bioconda'], 'publication': [
+        {'title': 'Fast sequence alignment'},
+        {'title': 'Trimming of reads', 'abstract': None},
+    ]},
+    {'@id': 'c', 'source': ['galaxy_metadata'], 'publication': [{'title': 'Alignment'}]},
+    {'@id': 'd', 'source': ['bioagents'], 'publication': ['not a publication', {}]},
+]
+
+
+class PhraseCollection:
+    '''
+    Collection that finds the agents in `matching` among the requested ids
+    '''
+    def __init__(self, matching):
+        self.matching = matching
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        ids = query['$and'][0]['@id']['$in']
+        return [{'@id': id_} for id_ in ids if id_ in self.matching]
+
+
+def build_index(collection=None):
+    index = PublicationIndex(collection)
+    index.build(AGENTS)
+    return index
+
+
+def test_words_match_by_prefix_in_every_publication():
+    index = build_index()
+    assert index.search('title', compile_query('align*')) == ['a', 'b']
+    assert index.search('title', compile_query('ALIGNMENT trim')) == ['a', 'b']
+    assert index.search('title', compile_query('automated trim')) == ['a']
+    assert index.search('abstract', compile_query('sequence')) == ['a']
+    assert index.search('abstract', compile_query('reads')) == []
+
+def test_short_words_match_whole_words():
+    index = build_index()
+    assert index.search('title', compile_query('a')) == ['a']
+    assert index.search('title', compile_query('fa')) == []
+
+def test_galaxy_metadata_only_agents_are_skipped():
+    index = build_index()
+    assert index.ids == ['a', 'b']
+
+def test_phrases_are_checked_for_the_candidates_only():
+    collection = PhraseCollection({'b'})
+    index = build_index(collection)
+    assert index.search('title', compile_query('"sequence alignment"')) == ['b']
+    assert collection.queries[0]['$and'][0] == {'@id': {'$in': ['b']}}
+    # words of the phrase in different publications: candidate, rejected by the database
+    collection.matching = set()
+    assert index.search('title', compile_query('"fast trimming"')) == []
+    assert collection.queries[1]['$and'][0] == {'@id': {'$in': ['b']}}
+    assert index.search('title', compile_query('"automated trimming" reads')) == []
+    assert len(collection.queries) == 2
+
+def database_search(field, query):
+    '''
+    Agents matched by the database fallback, with MongoDB semantics (any publication of
+    the agent matches each expression)
+    '''
+    expressions = database_expressions(query)
+    found = []
+    for agent in AGENTS:
+        if agent['source'] == ['galaxy_metadata'] or not expressions:
+            continue
+        texts = publication_texts(agent, field)
+        if all(any(re.search(expression['$regex'], text, re.I) for text in texts) for expression in expressions):
+            found.append(agent['@id'])
+    return found
+
+def test_database_fallback_matches_as_the_index():
+    index = build_index(PhraseCollection({'b'}))
+    for q in ['align*', 'ALIGNMENT trim', 'a', 'fa', 'c++', 'lign', 'automated trim', '"sequence alignment"', '++']:
+        for field in ['title', 'abstract']:
+            query = compile_query(q)
+            expected = index.search(field, query)
+            if any(term.phrase for term in query.terms):
+                # the phrase collection answers for the title only
+                continue
+            assert database_search(field, query) == expected, (q, field)
@@ -0,0 +1,33 @@
+from app.helpers.publications import merge_publications, deduplicate_publications
+
+
+def test_merge_publications_by_doi_case_insensitive():
+    pubs = [
+        {'doi': '10.1093/nar/gkab1', 'pmid': '123'},
+        {'doi': '10.1093/NAR/GKAB1', 'cit_count': 4},
+    ]
+    result = merge_publications(pubs)
+    assert result == [{'doi': '10.1093/NAR/GKAB1', 'pmid': '123', 'cit_count': 4}]
+
+def test_merge_publications_transitive():
+    pubs = [
+        {'doi': '10.1/a'},
+        {'doi': '10.1/a', 'title': 'A agent.'},
+        {'title': 'A <i>agent</i>', 'pmid': '7'},
+        {'pmid': '8'},
+    ]
+    result = merge_publications(pubs)
+    assert len(result) == 2
+    assert result[0]['doi'] == '10.1/a'
+    assert result[0]['pmid'] == '7'
+    assert result[1] == {'pmid': '8'}
+
+def test_merge_publications_keeps_order_and_unidentified():
+    pubs = [{'year': 2020}, {'pmid': '1'}, {'year': 2021}, {'pmid': '1', 'year': 2022}]
+    result = merge_publications(pubs)
+    assert result == [{'year': 2020}, {'pmid': '1', 'year': 2022}, {'year': 2021}]
+
+def test_deduplicate_publications_cleans_titles_and_empty():
+    pubs = [{'title': '<b>Title</b>.', 'doi': ''}, {}]
+    result = deduplicate_publications(pubs)
+    assert result == [{'title': 'Title'}]
@@ -0,0 +1,66 @@
+import pytest
+
+from app.helpers import query as query_module
+from app.helpers.query import QueryError, Term, compile_query, nested_quantifier, tokenize
+
+
+def test_tokenize_words_phrases_and_prefixes():
+    assert tokenize(' trim*  "multiple   sequence alignment" blast "unclosed') == [
+        Term('trim', prefix=True),
+        Term('multiple sequence alignment', phrase=True),
+        Term('blast'),
+        Term('unclosed'),
+    ]
+
+def test_missing_query_is_empty():
+    assert not compile_query(None)
+    assert not compile_query('  "" * ')
+
+def test_terms_are_literal():
+    query = compile_query('(a+)+$ c++')
+    assert query.matches('x (a+)+$ and C++')
+    assert not query.matches('aaa c++')
+    assert query.expressions() == [
+        {'$regex': r'\(a\+\)\+\$', '$options': 'i'},
+        {'$regex': r'c\+\+', '$options': 'i'},
+    ]
+
+def test_literal_matching_is_linear():
+    query = compile_query('(a+)+$')
+    assert not query.matches('a' * 100000 + 'b')
+
+def test_every_term_matches():
+    query = compile_query('sequence align*')
+    assert query.matches('Multiple sequence alignment')
+    assert not query.matches('Sequence realignment')
+    assert compile_query('"sequence  alignment"').matches('sequence\nalignment')
+    assert not compile_query('"sequence alignment"').matches('alignment of sequence')
+
+def test_limits():
+    with pytest.raises(QueryError):
+        compile_query('a' * 300)
+    with pytest.raises(QueryError):
+        compile_query(' '.join('abcdefghij'))
+
+def test_nested_quantifiers():
+    assert nested_quantifier('(a+)+$')
+    assert nested_quantifier('(a|aa)*')
+    assert nested_quantifier('((ab)*){2,}')
+    assert not nested_quantifier('(ab)+c*')
+    assert not nested_quantifier(r'\(a+\)+')
+    assert not nested_quantifier('[(a+]+')
+
+def test_regex_mode():
+    query = compile_query('^trim(al|galore)$', regex=True)
+    assert query.matches('TrimAl')
+    assert query.expressions() == [{'$regex': '^trim(al|galore)$', '$options': 'i'}]
+    for pattern in ['(a+)+$', r'(a)\1', '(unclosed']:
+        with pytest.raises(QueryError):
+            compile_query(pattern, regex=True)
+
+def test_slow_regex_matches_time_out(monkeypatch):
+    # a backtracking pattern that the guard would reject, let through to reach the timeout
+    monkeypatch.setattr(query_module, 'nested_quantifier', lambda pattern: False)
+    query = compile_query('(a|a)*$', regex=True)
+    with pytest.raises(QueryError):
+        query.matches('a' * 40 + '!')
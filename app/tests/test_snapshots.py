@@ -0,0 +1,62 @@
+from starlette.datastructures import QueryParams
+
+from app.helpers.cache import LRUBackend
+from app.helpers.snapshots import SearchSnapshots
+from app.helpers import changes
+
+
+def make_snapshots():
+    return SearchSnapshots(LRUBackend(16))
+
+def compute_counter():
+    calls = []
+    def compute():
+        calls.append(1)
+        return {'ids': ['a', 'b'], 'calls': len(calls)}
+    return compute, calls
+
+
+def test_pages_share_the_snapshot():
+    snapshots = make_snapshots()
+    compute, calls = compute_counter()
+    first = snapshots.get_or_create(QueryParams('q=trim&type=cmd,web'), compute, ('type',))
+    second = snapshots.get_or_create(QueryParams('q=trim&type=web,cmd&page=3'), compute, ('type',))
+    assert first is second
+    assert len(calls) == 1
+    assert first['token']
+
+def test_different_searches_get_different_snapshots():
+    snapshots = make_snapshots()
+    compute, calls = compute_counter()
+    snapshots.get_or_create(QueryParams('q=trim'), compute)
+    snapshots.get_or_create(QueryParams('q=trinity'), compute)
+    assert len(calls) == 2
+
+def test_token_keeps_the_snapshot_after_a_change():
+    snapshots = make_snapshots()
+    compute, calls = compute_counter()
+    token = snapshots.get_or_create(QueryParams('q=trim'), compute)['token']
+    changes.publish(['a'])
+    again = snapshots.get_or_create(QueryParams(f'q=trim&page=1&snapshot={token}'), compute)
+    assert again['token'] == token
+    assert len(calls) == 1
+    # without the token the search runs again over the new catalogue
+    fresh = snapshots.get_or_create(QueryParams('q=trim&page=1'), compute)
+    assert fresh['token'] != token
+    assert len(calls) == 2
+
+def test_unknown_token_runs_the_search():
+    snapshots = make_snapshots()
+    compute, calls = compute_counter()
+    snapshot = snapshots.get_or_create(QueryParams('q=trim&snapshot=expired'), compute)
+    assert len(calls) == 1
+    assert snapshot['token'] != 'expired'
+
+def test_token_of_another_search_is_ignored():
+    snapshots = make_snapshots()
+    compute, calls = compute_counter()
+    token = snapshots.get_or_create(QueryParams('q=bar'), compute)['token']
+    other = snapshots.get_or_create(QueryParams(f'q=foo&page=1&snapshot={token}'), compute)
+    assert other['token'] != token
+    assert other['params'] == [['q', 'foo']]
+    assert len(calls) == 2
@@ -0,0 +1,40 @@
+from app.services.utils import is_url_operational
+from app.helpers.profiling import profiling
+from benchmarks.standins import StandinFarm
+
+
+def test_scripted_statuses(standin_web):
+    assert is_url_operational('https://github.com/inab/oeb-visualizations')
+    assert is_url_operational('https://github.com/inab/oeb-visualizations/')
+    assert not is_url_operational('https://github.com/inab/oeb-random')
+    assert not is_url_operational('https://unknown.example.org/')
+    assert standin_web.hits['https://github.com/inab/oeb-random'] >= 1
+
+def test_redirect_is_not_operational(standin_web):
+    with profiling() as profile:
+        assert not is_url_operational('http://github.com/inab/oeb-visualizations')
+    assert profile.finish()['probes'][0]['status'] == 301
+
+def test_latency_timeout_and_host_scripts():
+    farm = StandinFarm({
+        'https://slow.org/a': {'status': 200, 'latency': 0.05},
+        'https://down.org/a': {'timeout': True},
+        'hosted.org': 204,
+    }, hang=0.5)
+    with farm, farm.installed(probe_timeout=0.2):
+        with profiling() as profile:
+            assert is_url_operational('https://slow.org/a')
+            assert not is_url_operational('https://down.org/a')
+            assert is_url_operational('https://hosted.org/any/path')
+        probes = profile.finish()['probes']
+    assert probes[0]['seconds'] >= 0.05
+    assert probes[1]['outcome'] == 'timeout'
+    assert probes[2]['status'] == 204
+
+def test_rewrite_removed_after_block(standin_farm):
+    from app.services import utils
+    previous = utils.url_rewrite
+    with standin_farm.installed(probe_timeout=0.1):
+        assert utils.url_rewrite is not None
+        assert utils.PROBE_TIMEOUT == 0.1
+    assert utils.url_rewrite is previous
@@ -0,0 +1,51 @@
+import random
+from collections import Counter
+
+from app.helpers.stats_engine import agent_contributions, accumulate, results
+from app.helpers.stats_counters import StatsCounters, flatten, difference
+
+
+AGENTS = [
+    {'@id': 'a', 'type': 'cmd', 'source': ['bioconda', 'bioagents'], 'license': ['MIT'], 'version': ['1.0.0']},
+    {'@id': 'b', 'type': 'web', 'source': ['bioagents'], 'license': [], 'repository': ['https://github.com/a/b']},
+    {'@id': 'c', 'type': 'lib', 'source': ['github'], 'license': ['Proprietary'], 'version': ['beta']},
+    {'@id': 'd', 'type': 'cmd', 'source': ['galaxy_metadata']},
+]
+
+
+def test_difference_of_contributions():
+    old = flatten(agent_contributions(AGENTS[0]))
+    new = flatten(agent_contributions(dict(AGENTS[0], license=[], source=['bioconda'])))
+    diff = difference(old, new)
+    assert diff[('licenses_open_source', 'open_source')] == -1
+    assert diff[('licenses_open_source', 'no_license')] == 1
+    assert diff[('agents_counts_per_source', 'bioagents')] == -1
+    assert ('agents_count', 'total') not in diff
+    assert difference(old, old) == {}
+
+def test_applying_differences_tracks_a_full_recount():
+    rng = random.Random(1)
+    catalogue = {}
+    stored = {}
+    counters = Counter()
+    for step in range(300):
+        id_ = str(rng.randrange(20))
+        if rng.random() < 0.2:
+            catalogue.pop(id_, None)
+        else:
+            catalogue[id_] = dict(rng.choice(AGENTS), **{'@id': id_})
+        new = flatten(agent_contributions(catalogue[id_])) if id_ in catalogue else []
+        counters.update(difference(stored.pop(id_, []), new))
+        if new:
+            stored[id_] = new
+
+    counts = {}
+    for (variable, key), count in counters.items():
+        counts.setdefault(variable, Counter())[key] = count
+    expected = results(accumulate(catalogue.values()))
+    assert {variable: data for variable, data in results(counts).items() if data} == {variable: data for variable, data in expected.items() if data}
+
+def test_whole_catalogue_changes_do_not_recount():
+    # no collections: any access would fail
+    stats_counters = StatsCounters(None, None, None, None)
+    stats_counters.on_change(None)
@@ -0,0 +1,53 @@
+import random
+
+from app.helpers.stats_engine import agent_contributions, accumulate, compute_counts, merge, results, is_open_source, stats_records
+
+
+AGENTS = [
+    {'@id': 'a', 'type': 'cmd', 'source': ['bioconda', 'bioconda_recipes', 'bioagents'], 'license': ['GPL-3.0'],
+     'version': ['1.4.1'], 'repository': ['https://github.com/inab/trimal'], 'description': ['Alignment trimming'],
+     'publication': [{'doi': '10.1093/bioinformatics/btp348'}]},
+    {'@id': 'b', 'type': 'web', 'source': ['bioagents'], 'license': [{'name': 'Proprietary', 'url': ''}],
+     'version': ['2021 release'], 'links': ['https://bitbucket.org/team/agent'], 'description': []},
+    {'@id': 'c', 'type': 'cmd', 'source': ['galaxy_metadata']},
+    {'@id': 'd', 'source': ['github', 'opeb_metrics'], 'license': [], 'version': []},
+]
+
+
+def test_contributions_of_an_agent():
+    contributions = agent_contributions(AGENTS[0])
+    assert contributions['agents_counts_per_source'] == {'bioconda': 1, 'bioagents': 1}
+    assert contributions['licenses_open_source'] == {'open_source': 1}
+    assert contributions['semantic_versioning'] == {'semantic': 1}
+    assert contributions['version_control_repositories'] == {'github': 1}
+    assert set(contributions['features']) == {'description', 'version', 'license', 'repository', 'publication'}
+    # only in galaxy_metadata: not counted
+    assert agent_contributions(AGENTS[2]) == {}
+
+def test_results():
+    data = results(accumulate(AGENTS))
+    assert data['agents_count'] == 3
+    assert data['types_count'] == {'cmd': 1, 'unknown': 1, 'web': 1}
+    assert data['licenses_open_source'] == {'no_license': 1, 'not_open_source': 1, 'open_source': 1}
+    assert data['semantic_versioning'] == {'no_version': 1, 'not_semantic': 1, 'semantic': 1}
+    assert data['version_control_count'] == {'no_version_control': 1, 'version_control': 2}
+    assert data['coverage_sources'] == {'1': 2, '2': 1}
+
+def test_chunks_merge_to_the_same_counts():
+    rng = random.Random(0)
+    agents = [dict(rng.choice(AGENTS), **{'@id': str(i)}) for i in range(500)]
+    single = results(accumulate(agents))
+    assert results(compute_counts(agents, chunk_size=7)) == single
+    assert results(compute_counts(agents, processes=2, chunk_size=50)) == single
+    counts = merge(accumulate(agents[:100]), accumulate(agents[100:]))
+    assert results(counts) == single
+
+def test_open_source_license_families():
+    assert is_open_source('MIT')
+    assert is_open_source('Apache-2.0')
+    assert not is_open_source('Proprietary')
+    assert not is_open_source('')
+
+def test_records_are_kept_apart_from_the_imported_stats():
+    records = stats_records(results(accumulate(AGENTS)), '2026-01-01T00:00:00Z')
+    assert {record['collection'] for record in records} == {'agents_engine'}
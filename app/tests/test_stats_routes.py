@@ -0,0 +1,134 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.helpers import cache, database
+from app.helpers.stats_engine import accumulate, results, stats_records
+
+# the routers connect to the database of CONFIG_PATH when imported (lazily: nothing is
+# sent until a query), and the stats collection is replaced below
+CONFIG = '''[MONGO_DETAILS]
+DBHOST = localhost
+DBPORT = 27017
+DBUSER = test
+DBPASS = test
+DBAUTHSRC = admin
+DATABASE = observatory_test
+TOOLS = agents
+STATS = stats
+'''
+
+
+def import_stats_routes(tmp_path_factory):
+    path = tmp_path_factory.mktemp('config') / 'config.ini'
+    path.write_text(CONFIG)
+    previous = os.environ.get('CONFIG_PATH')
+    os.environ['CONFIG_PATH'] = str(path)
+    database.read_config.cache_clear()
+    try:
+        from app.helpers import router
+        from app.routes import stats
+    finally:
+        if previous is None:
+            os.environ.pop('CONFIG_PATH')
+        else:
+            os.environ['CONFIG_PATH'] = previous
+        database.read_config.cache_clear()
+    return router, stats
+
+
+def matches(value, condition):
+    if isinstance(condition, dict):
+        return all({
+            '$ne': lambda expected: value != expected,
+            '$in': lambda expected: value in expected,
+            '$gte': lambda expected: value >= expected,
+            '$lte': lambda expected: value <= expected,
+        }[operator](expected) for operator, expected in condition.items())
+    return value == condition
+
+
+class Cursor(list):
+    def sort(self, key, direction=1):
+        return Cursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+    def limit(self, n):
+        return Cursor(self[:n])
+
+
+class StatsCollection:
+    '''
+    The queries of the stats routes on a list of records
+    '''
+    def __init__(self, records):
+        self.records = records
+
+    def find(self, query, projection=None):
+        found = [dict(record) for record in self.records if all(matches(record.get(key), condition) for key, condition in query.items())]
+        if projection:
+            found = [{key: value for key, value in record.items() if projection.get(key, 1)} for record in found]
+        return Cursor(found)
+
+
+
+AGENTS = [
+    {'@id': 'a', 'type': 'cmd', 'source': ['bioconda', 'bioagents'], 'license': ['MIT'], 'version': ['1.0.0']},
+    {'@id': 'b', 'type': 'web', 'source': ['bioagents'], 'license': []},
+]
+
+IMPORTED = [
+    {'variable': 'types_count', 'collection': 'agents', 'version': '1.0', 'data': [{'type': 'cmd', 'count': 7}]},
+    {'variable': 'FAIR_scores_means', 'collection': 'agents', 'version': '1.0', 'data': {'cmd': {'F1': 0.5}}},
+    {'variable': 'FAIR_scores_summary', 'collection': 'agents', 'version': '1.0', 'data': {'cmd': {'F1': [0.5]}}},
+    # a newer version that does not have every variable yet
+    {'variable': 'FAIR_scores_means', 'collection': 'agents', 'version': '1.1', 'data': {'cmd': {'F1': 0.6}}},
+]
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    router, stats = import_stats_routes(tmp_path_factory)
+    engine_records = stats_records(results(accumulate(AGENTS)), '2026-01-01T00:00:00Z')
+    collection = StatsCollection(IMPORTED + engine_records)
+    app = FastAPI()
+    app.include_router(stats.router, prefix='/stats')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(router, 'stats', collection)
+        patch.setattr(cache, 'get_versions', lambda: cache.CacheVersions())
+        cache.get_cache().backend.clear()
+        yield TestClient(app)
+
+
+def test_routes_serve_the_stats_computed_by_the_engine(client):
+    # count_total answers a list (as it always did)
+    assert client.get('/stats/agents/count_total').json()[0]['data'] == 2
+    record = client.get('/stats/agents/types_count').json()
+    assert record['collection'] == 'agents_engine'
+    assert record['data'] == {'cmd': 1, 'web': 1}
+    assert client.get('/stats/agents/licenses_open_source').json()['data'] == {'no_license': 1, 'open_source': 1}
+
+def test_imported_stats_are_still_served(client):
+    assert client.get('/stats/agents/fair_scores_means').json()['data'] == {'cmd': {'F1': 0.6}}
+    assert client.get('/stats/agents/types_count?collection=agents').json()['data'] == [{'type': 'cmd', 'count': 7}]
+
+def test_batch_reads_each_variable_from_its_collection(client):
+    resp = client.get('/stats/batch?variables=agents_count,FAIR_scores_means').json()
+    assert resp['missing'] == []
+    assert resp['variables']['agents_count']['collection'] == 'agents_engine'
+    assert resp['variables']['FAIR_scores_means']['collection'] == 'agents'
+
+def test_history_of_an_engine_variable(client):
+    resp = client.get('/stats/history?variable=types_count&delta=false').json()
+    assert resp['collection'] == 'agents_engine'
+    assert [version['version'] for version in resp['versions']] == ['2026-01-01T00:00:00Z']
+
+def test_batch_variables_are_of_the_same_version(client):
+    resp = client.get('/stats/batch?variables=FAIR_scores_means,FAIR_scores_summary').json()
+    assert {record['version'] for record in resp['variables'].values()} == {'1.0'}
+    resp = client.get('/stats/batch?variables=FAIR_scores_means').json()
+    assert resp['variables']['FAIR_scores_means']['version'] == '1.1'
+    resp = client.get('/stats/batch?variables=FAIR_scores_means,licenses_summary_sunburst').json()
+    assert resp['variables']['FAIR_scores_means']['version'] == '1.1'
+    assert resp['missing'] == ['licenses_summary_sunburst']
@@ -0,0 +1,60 @@
+from app.helpers.suggest import PrefixIndex, SuggestIndex
+
+
+CATALOGUE = [
+    {'@id': 'a', 'name': 'trimal', 'label': 'trimAl', 'type': 'cmd', 'source': ['bioagents', 'bioconda', 'github']},
+    {'@id': 'b', 'name': 'trinity', 'label': 'Trinity assembler', 'type': 'cmd', 'source': ['bioconda', 'bioconda_recipes']},
+    {'@id': 'c', 'name': 'trimmomatic', 'label': 'Trimmomatic', 'type': 'cmd', 'source': ['bioagents', 'bioconda']},
+    {'@id': 'd', 'name': 'blast', 'label': 'BLAST', 'type': 'web', 'source': ['bioagents']},
+    {'@id': 'e', 'name': 'trimgalore', 'label': 'Trim Galore', 'type': 'cmd', 'source': ['galaxy_metadata']},
+]
+
+EDAM = {
+    'http://edamontology.org/topic_0080': 'Sequence analysis',
+    'http://edamontology.org/operation_0292': 'Sequence alignment',
+    'http://edamontology.org/format_1929': 'FASTA',
+    'http://edamontology.org/other_0001': 'Sequence ignored',
+}
+
+
+def build_index(counts=None):
+    index = SuggestIndex()
+    index.build(CATALOGUE, EDAM, counts)
+    return index
+
+
+def test_agents_ranked_by_sources():
+    index = build_index()
+    names = [agent['name'] for agent in index.suggest('tri')['agents']]
+    # bioconda and bioconda_recipes count once
+    assert names == ['trimal', 'trimmomatic', 'trinity']
+
+def test_agent_listed_once_when_name_and_label_match():
+    index = build_index()
+    assert [agent['@id'] for agent in index.suggest('trim')['agents']] == ['a', 'c']
+    assert [agent['@id'] for agent in index.suggest('trinity a')['agents']] == ['b']
+
+def test_agents_only_in_galaxy_metadata_are_not_suggested():
+    index = build_index()
+    assert index.suggest('trimg')['agents'] == []
+
+def test_edam_matches_start_of_words():
+    index = build_index({'http://edamontology.org/operation_0292': 10})
+    uris = [term['uri'] for term in index.suggest('sequence')['edam']]
+    assert uris == ['http://edamontology.org/operation_0292', 'http://edamontology.org/topic_0080']
+    assert [term['kind'] for term in index.suggest('alignment')['edam']] == ['operation']
+    assert index.suggest('ignored')['edam'] == []
+
+def test_short_prefixes_match_long_prefixes():
+    entries = [(f'name{i}', i % 7, i, i) for i in range(200)]
+    index = PrefixIndex(entries, top_k=20, precomputed_length=2)
+    full = PrefixIndex(entries, top_k=20, precomputed_length=0)
+    assert index.search('na', 10) == full.search('na', 10)
+    assert index.search('NA', 30) == full.search('na', 30)
+    # most popular first, then shorter names
+    assert index.search('name1', 5) == [13, 104, 111, 118, 125]
+
+def test_empty_and_unknown_prefixes():
+    index = build_index()
+    assert index.suggest('   ') == {'query': '   ', 'agents': [], 'edam': []}
+    assert index.suggest('zzz')['agents'] == []
@@ -0,0 +1,104 @@
+'''
+Benchmark of the FAIR evaluation of agents, with the URL probes answered by local
+stand-ins (benchmarks/standins.py) instead of the real sites.
+
+Usage:
+    python -m benchmarks.bench_fair [n_agents] [workers]
+'''
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+
+from app.constants import WEB_TYPES
+from app.helpers.metrics import INDICATOR_DURATION
+from app.models.instance import Instance
+from app.services.indicator_computation import IndicatorComputation
+from app.services.fair_scores import compute_fair_scores
+from benchmarks.bench_suggest import percentile
+from benchmarks.standins import StandinFarm
+
+DOCUMENTATION_TYPES = ['general', 'installation instructions', 'usage guide', 'test data', 'API specification', 'release policy', 'contribution policy']
+
+# share of the URLs with each behaviour, and the latency range of the ones that answer
+BEHAVIOURS = [(0.75, {'status': 200}), (0.12, {'status': 404}), (0.05, {'status': 301, 'redirect': 'https://example.org/'}), (0.05, {'status': 500}), (0.03, {'timeout': True})]
+LATENCY = (0.005, 0.08)
+
+PROBE_TIMEOUT = 0.5
+
+
+def synthetic_agents(n, seed=0):
+    '''
+    Agents (and the behaviour of every URL they have) over a few hundred hosts
+    '''
+    rng = random.Random(seed)
+    hosts = [f'site{i}.example.org' for i in range(300)] + ['github.com', 'bitbucket.org', 'usegalaxy.eu']
+    urls = {}
+
+    def url(name, kind):
+        url = f'https://{rng.choice(hosts)}/{name}/{kind}'
+        draw = rng.random()
+        for share, behaviour in BEHAVIOURS:
+            if draw < share:
+                break
+            draw -= share
+        urls[url] = {**behaviour, 'latency': rng.uniform(*LATENCY)}
+        return url
+
+    agents = []
+    for i in range(n):
+        name = f'agent{i}'
+        agents.append({
+            'name': name,
+            'type': rng.choice(['cmd', 'lib', 'web', 'rest', 'db']),
+            'version': rng.choice(['1.0.0', '2.1', 'v3']),
+            'description': [f'Synthetic agent {i}'],
+            'source': rng.sample(['bioagents', 'bioconda', 'github', 'galaxy'], rng.randint(1, 3)),
+            'webpage': [url(name, 'home')],
+            'repository': [url(name, 'repo') for _ in range(rng.randint(0, 2))],
+            'download': [url(name, 'download') for _ in range(rng.randint(0, 1))],
+            'documentation': [{'type': rng.choice(DOCUMENTATION_TYPES), 'url': url(name, f'doc{j}')} for j in range(rng.randint(1, 4))],
+            'license': [{'name': rng.choice(['MIT', 'GPL-3.0', 'Apache-2.0'])}],
+            'test': [url(name, 'test')] if rng.random() < 0.3 else [],
+        })
+    return agents, urls
+
+
+def evaluate(agent):
+    start = time.perf_counter()
+    instance = Instance(**agent)
+    instance.set_super_type(WEB_TYPES)
+    IndicatorComputation(instance).compute_indicators()
+    compute_fair_scores(instance)
+    return time.perf_counter() - start
+
+
+def main(n_agents=200, workers=8):
+    agents, urls = synthetic_agents(n_agents)
+    with StandinFarm(urls, hang=2 * PROBE_TIMEOUT) as farm, farm.installed(probe_timeout=PROBE_TIMEOUT):
+        # the indicators print their progress
+        with redirect_stdout(StringIO()):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                latencies = list(pool.map(evaluate, agents))
+            elapsed = time.perf_counter() - start
+        probes = sum(farm.hits.values())
+
+    latencies = [latency * 1000 for latency in latencies]
+    print(f'{n_agents} synthetic agents, {len(urls)} URLs, {workers} workers, probe timeout {PROBE_TIMEOUT} s')
+    print(f'probes:     {probes} ({probes / n_agents:.1f} per agent)')
+    print(f'throughput: {n_agents / elapsed:.1f} evaluations/s')
+    print(f'p50:        {percentile(latencies, 50):.1f} ms')
+    print(f'p99:        {percentile(latencies, 99):.1f} ms')
+    print('slowest indicators (mean):')
+    means = {}
+    for key, (counts, total) in INDICATOR_DURATION.series.items():
+        means[key[0]] = total / sum(counts) * 1000
+    for indicator, mean in sorted(means.items(), key=lambda item: -item[1])[:5]:
+        print(f'    {indicator:<6} {mean:.1f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
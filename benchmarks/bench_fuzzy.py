@@ -0,0 +1,56 @@
+'''
+Benchmark of the fuzzy name search of /search (fuzzy=true).
+
+Usage:
+    python -m benchmarks.bench_fuzzy [n_agents] [n_queries]
+'''
+import random
+import string
+import sys
+import time
+
+from app.helpers.fuzzy import FuzzyNameIndex
+from benchmarks.bench_suggest import synthetic_catalogue, percentile
+
+
+def typo(name, rng):
+    '''
+    The name with one random edit
+    '''
+    i = rng.randrange(len(name))
+    edit = rng.choice(['insert', 'delete', 'replace', 'separator'])
+    if edit == 'insert':
+        return name[:i] + rng.choice(string.ascii_lowercase) + name[i:]
+    if edit == 'delete':
+        return name[:i] + name[i + 1:]
+    if edit == 'replace':
+        return name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1:]
+    return name[:i] + rng.choice('-_ ') + name[i:].upper()
+
+
+def main(n_agents=100000, n_queries=5000):
+    rng = random.Random(2)
+    catalogue = synthetic_catalogue(n_agents)
+    index = FuzzyNameIndex()
+
+    start = time.perf_counter()
+    index.build(catalogue)
+    build = time.perf_counter() - start
+
+    latencies = []
+    found = 0
+    for entry in rng.sample(catalogue, n_queries):
+        start = time.perf_counter()
+        results = index.search(typo(entry['name'], rng))
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += entry['@id'] in [id_ for id_, distance in results]
+
+    print(f'{n_agents} synthetic agents, {n_queries} queries with one typo')
+    print(f'build:  {build:.2f} s')
+    print(f'recall: {found / n_queries:.1%}')
+    print(f'p50:    {percentile(latencies, 50):.3f} ms')
+    print(f'p99:    {percentile(latencies, 99):.3f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
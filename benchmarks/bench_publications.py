@@ -0,0 +1,84 @@
+'''
+Benchmark of the publication merge used by preparePublications.
+
+Usage:
+    python -m benchmarks.bench_publications [n_publications] [n_agents]
+'''
+import random
+import sys
+import time
+
+from app.helpers.publications import deduplicate_publications, clean_empty_publications, clean_title, normalize_identifier
+
+
+def legacy_merge(publications):
+    '''
+    Pairwise merge (one pass per identifier) as done by preparePublications before.
+    Kept here only as a reference for the benchmark.
+    '''
+    publications = clean_empty_publications(publications)
+    for id_ in ['title', 'pmcid', 'pmid', 'doi']:
+        ids = [normalize_identifier(id_, pub[id_]) if pub.get(id_) is not None else None for pub in publications]
+        seen_ids = []
+        new_publications = []
+        for a, id in enumerate(ids):
+            if id is None:
+                new_publications.append(publications[a])
+            elif id not in seen_ids:
+                seen_ids.append(id)
+                indexes = [i for i, x in enumerate(ids) if x == id]
+                new_publication = {}
+                for i in indexes:
+                    new_publication = {**new_publication, **publications[i]}
+                new_publications.append(new_publication)
+        publications = new_publications
+
+    for pub in publications:
+        if pub.get('title'):
+            pub['title'] = clean_title(pub['title'])
+    return publications
+
+
+def synthetic_publications(n, seed=0):
+    '''
+    Publications where roughly a third are duplicates of another entry
+    under a different identifier or spelling.
+    '''
+    rng = random.Random(seed)
+    n_unique = max(1, (2 * n) // 3)
+    publications = []
+    for i in range(n):
+        j = rng.randrange(n_unique) if i >= n_unique else i
+        kind = rng.choice(['doi', 'pmid', 'title', 'pmcid'])
+        pub = {'year': 2000 + j % 20, 'cit_count': rng.randrange(100)}
+        if kind == 'doi':
+            pub['doi'] = f'10.1093/bioinformatics/btx{j}' if rng.random() < 0.5 else f'10.1093/BIOINFORMATICS/BTX{j}'
+        elif kind == 'pmid':
+            pub['pmid'] = str(20000000 + j)
+        elif kind == 'pmcid':
+            pub['pmcid'] = f'PMC{5000000 + j}'
+        else:
+            pub['title'] = f'<i>Agent</i> number {j} for sequence analysis.'
+        publications.append(pub)
+    return publications
+
+
+def run(func, agents):
+    start = time.perf_counter()
+    for publications in agents:
+        func([dict(pub) for pub in publications])
+    return time.perf_counter() - start
+
+
+def main(n_publications=1000, n_agents=5):
+    agents = [synthetic_publications(n_publications, seed) for seed in range(n_agents)]
+    new = run(deduplicate_publications, agents)
+    old = run(legacy_merge, agents)
+    print(f'{n_agents} synthetic agents with {n_publications} publications each')
+    print(f'union-find merge: {new / n_agents * 1000:.2f} ms/agent')
+    print(f'pairwise merge:   {old / n_agents * 1000:.2f} ms/agent')
+    print(f'speed-up:         {old / new:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
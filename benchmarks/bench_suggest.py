@@ -0,0 +1,72 @@
+'''
+Benchmark of the typeahead suggestions of /search/suggest.
+
+Usage:
+    python -m benchmarks.bench_suggest [n_agents] [n_queries]
+'''
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+from app.helpers.EDAM_forFE import EDAMDict
+from app.helpers.suggest import SuggestIndex
+
+
+def synthetic_catalogue(n, seed=0):
+    rng = random.Random(seed)
+    sources = ['bioagents', 'bioconda', 'bioconda_recipes', 'galaxy', 'github', 'biocontainers', 'sourceforge']
+    catalogue = []
+    for i in range(n):
+        name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 12))) + str(i % 97)
+        catalogue.append({
+            '@id': f'https://openebench.bsc.es/monitor/agent/bioagents:{name}/cmd/{i}',
+            'name': name,
+            'label': name.capitalize() if rng.random() < 0.5 else f'{name} {rng.choice(["toolkit", "suite", "pipeline"])}',
+            'type': rng.choice(['cmd', 'web', 'lib']),
+            'source': rng.sample(sources, rng.randint(1, 4)),
+        })
+    return catalogue
+
+
+def synthetic_queries(catalogue, n, seed=1):
+    '''
+    Prefixes of 1 to 8 characters of existing names and EDAM labels, as typed
+    '''
+    rng = random.Random(seed)
+    words = [entry['name'] for entry in catalogue] + list(EDAMDict.values())
+    return [rng.choice(words)[:rng.randint(1, 8)] for _ in range(n)]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main(n_agents=30000, n_queries=20000):
+    catalogue = synthetic_catalogue(n_agents)
+    index = SuggestIndex()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index.build(catalogue, EDAMDict)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    latencies = []
+    for query in synthetic_queries(catalogue, n_queries):
+        start = time.perf_counter()
+        index.suggest(query, 10)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f'{n_agents} synthetic agents, {len(EDAMDict)} EDAM terms, {n_queries} queries')
+    print(f'build:  {build:.2f} s, {memory / 2**20:.1f} MiB')
+    print(f'p50:    {percentile(latencies, 50):.3f} ms')
+    print(f'p99:    {percentile(latencies, 99):.3f} ms')
+    print(f'max:    {max(latencies):.3f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
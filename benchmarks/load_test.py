@@ -0,0 +1,512 @@
+'''
+End-to-end load test of the API against a locally seeded database.
+
+Seeds the database with the agents of mongo-seed/agents-bioagents.json (or synthetic
+agents if the file is not available), optionally scaled up, and with stats records: the
+ones the stats engine computes from those agents plus synthetic records for the other
+variables (or an export of a stats collection). Drives the API with a mix of /search,
+/agents, /stats, /fair/evaluateId and /edam/EDAMTerms requests. Writes a JSON report that can be compared with the report of
+another commit.
+
+Usage:
+    python -m benchmarks.load_test [--backend mongod|memory] [--seed] [--scale 10]
+        [--database observatory_load] [--stats-file stats.json] [--duration 30] [--workers 8] [--url http://localhost:3500]
+        [--report load-report.json] [--compare previous-report.json]
+
+--backend mongod (default) uses the database of CONFIG_PATH, or the one named with
+--database. --seed replaces its agents and stats, so it refuses a database on another
+host unless it is named with --database. --backend memory runs on an in-memory
+stand-in of MongoDB (mongomock, see benchmarks/requirements.txt) and always seeds it.
+Without --url, the API runs in-process and its URL probes go to local stand-ins.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, redirect_stdout
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from benchmarks.bench_suggest import percentile
+
+SEED_FILE = 'mongo-compose/mongo-seed/agents-bioagents.json'
+
+# hosts whose databases --seed may replace without --database
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+# /stats/agents/<route> -> variable it serves
+STATS_ROUTES = {
+    'licenses_summary_sunburst': 'licenses_summary_sunburst',
+    'licenses_open_source': 'licenses_open_source',
+    'semantic_versioning': 'semantic_versioning',
+    'version_control_count': 'version_control_count',
+    'version_control_repositories': 'version_control_repositories',
+    'publications_journals_IF': 'publications_journals_IF',
+    'count_per_source': 'agents_counts_per_source',
+    'count_total': 'agents_count',
+    'features': 'features',
+    'coverage_sources': 'coverage_sources',
+    'features_cummulative': 'features_cummulative',
+    'distribution_features': 'distribution_features',
+    'types_count': 'types_count',
+    'fair_scores_summary': 'FAIR_scores_summary',
+    'fair_scores_means': 'FAIR_scores_means',
+}
+
+# share of each kind of request
+DEFAULT_MIX = {
+    'search': 35,
+    'agents': 20,
+    'stats': 20,
+    'stats_batch': 5,
+    'edam': 10,
+    'evaluate_id': 10,
+}
+
+# change (%) of the p50/p99 latency or the throughput reported as a regression
+REGRESSION_THRESHOLD = 10.0
+
+SYNTHETIC_AGENTS = 2000
+
+EDAM_TOPICS = ['http://edamontology.org/topic_0080', 'http://edamontology.org/topic_0091', 'http://edamontology.org/topic_0622', 'http://edamontology.org/topic_3168']
+EDAM_OPERATIONS = ['http://edamontology.org/operation_0292', 'http://edamontology.org/operation_2403', 'http://edamontology.org/operation_3198']
+
+
+def read_seed(path=SEED_FILE):
+    '''
+    Agents of a mongoimport dump (JSON array), None if the file is not available (e.g. a
+    Git LFS pointer that was not pulled)
+    '''
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data.startswith(b'version https://git-lfs'):
+        return None
+
+    from bson import json_util
+    agents = json_util.loads(data)
+    for agent in agents:
+        agent.pop('_id', None)
+    return agents
+
+
+def synthetic_agents(n, seed=0):
+    '''
+    Raw agents with the fields used by the preparation functions and the indicators
+    '''
+    rng = random.Random(seed)
+    sources = ['bioagents', 'bioconda', 'bioconda_recipes', 'galaxy', 'github', 'biocontainers', 'sourceforge']
+    words = ['sequence', 'alignment', 'variant', 'protein', 'genome', 'assembly', 'expression', 'network', 'structure', 'annotation']
+    agents = []
+    for i in range(n):
+        name = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))) + str(i)
+        type_ = rng.choice(['cmd', 'web', 'lib', 'rest', 'db'])
+        description = ' '.join(rng.sample(words, 4))
+        agents.append({
+            '@id': f'https://openebench.bsc.es/monitor/agent/bioagents:{name}:1.0/{type_}/{name}.org',
+            'name': name,
+            'type': type_,
+            'label': [name.capitalize()],
+            'version': [rng.choice(['1.0.0', '2.1', 'v3.2.1'])],
+            'description': [f'{description.capitalize()} agent {i}'],
+            'source': rng.sample(sources, rng.randint(1, 3)),
+            'edam_topics': rng.sample(EDAM_TOPICS, rng.randint(0, 2)),
+            'edam_operations': rng.sample(EDAM_OPERATIONS, rng.randint(0, 2)),
+            'documentation': [['documentation', f'https://{name}.org/docs']],
+            'authors': [f'Author {rng.randint(1, 500)}'],
+            'license': [rng.choice(['MIT', 'GPL-3.0', 'Apache-2.0'])],
+            'publication': [],
+            'repository': [f'https://github.com/org{i % 50}/{name}'] if rng.random() < 0.6 else [],
+            'webpage': [f'https://{name}.org'],
+            'links': [f'https://{name}.org'],
+            'download': [],
+            'src': [],
+            'os': rng.sample(['Linux', 'Mac', 'Windows'], rng.randint(1, 3)),
+            'input': [],
+            'output': [],
+            'dependencies': [],
+            'tags': [],
+            'test': [],
+            'contribPolicy': [],
+        })
+    return agents
+
+
+def scale_up(agents, factor):
+    '''
+    `factor` copies of every agent, with distinct names and @id
+    '''
+    if factor <= 1:
+        return list(agents)
+    scaled = []
+    for copy in range(factor):
+        for agent in agents:
+            if copy == 0:
+                scaled.append(agent)
+                continue
+            agent = dict(agent)
+            agent['name'] = f'{agent["name"]}-{copy}'
+            agent['@id'] = f'{agent["@id"]}-{copy}'
+            scaled.append(agent)
+    return scaled
+
+
+def memory_backend():
+    '''
+    Point the API to an in-memory stand-in of MongoDB. Must be called before the app is imported.
+    '''
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit('--backend memory needs mongomock (pip install -r benchmarks/requirements.txt)')
+
+    from app.helpers import database
+    config = tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False)
+    config.write('[MONGO_DETAILS]\nDATABASE = observatory\nTOOLS = agents\nSTATS = stats\n')
+    config.close()
+    os.environ['CONFIG_PATH'] = config.name
+    database.read_config.cache_clear()
+    client = mongomock.MongoClient()
+    database.connect_client = lru_cache(maxsize=None)(lambda: client)
+
+
+def read_stats(path):
+    '''
+    Stats records of a mongoexport dump (JSON array)
+    '''
+    from bson import json_util
+    with open(path, 'rb') as f:
+        records = json_util.loads(f.read())
+    for record in records:
+        record.pop('_id', None)
+    return records
+
+
+def synthetic_stats(variables, seed=0, categories=20):
+    '''
+    Made-up records for `variables`, labelled `synthetic`: a map of `categories` counts
+    each, under the collection of the imported stats. Their real layout is not known
+    here, so they only stand for the payload of a stats record in the load.
+    '''
+    rng = random.Random(seed)
+    return [{
+        'variable': variable,
+        'collection': 'agents',
+        'version': 'synthetic',
+        'synthetic': True,
+        'data': {f'category_{i}': rng.randint(0, 10000) for i in range(categories)},
+    } for variable in variables]
+
+
+def seed_stats(agents):
+    '''
+    Stats records of the seeded agents: those the stats engine computes from them, and
+    synthetic ones for the other variables of the /stats/agents/* routes
+    '''
+    from app.helpers.stats_engine import compute_counts, new_version, results, stats_records
+    records = stats_records(results(compute_counts(agents)), new_version())
+    computed = {record['variable'] for record in records}
+    return records + synthetic_stats([variable for variable in STATS_ROUTES.values() if variable not in computed])
+
+def select_database(database=None, seed=False):
+    '''
+    Point the API to `database` (if given) and return the database used. Seeding deletes
+    its agents and stats, so a database on another host is only seeded if it was named
+    explicitly, and is not the one of the config file.
+    '''
+    from app.helpers.database import read_config
+    details = read_config()['MONGO_DETAILS']
+    host = details.get('DBHOST', 'localhost')
+    configured = details['DATABASE']
+    if database:
+        details['DATABASE'] = database
+    if seed and host not in LOCAL_HOSTS and (not database or database == configured):
+        raise SystemExit(f'--seed would replace the agents and stats of {configured} on {host}: '
+                         'seed a local database, or a dedicated one named with --database')
+    return details['DATABASE']
+
+
+def seed_database(agents, stats_records, batch_size=1000):
+    '''
+    Replace the agents and stats of the database with `agents` and `stats_records`
+    '''
+    from app.helpers.database import connect_DB, connect_collection
+
+    agents_collection, stats = connect_DB()
+    agents_collection.delete_many({})
+    stats.delete_many({})
+    connect_collection('AGENTS_UI', 'agents_ui').delete_many({})
+
+    start = time.perf_counter()
+    for i in range(0, len(agents), batch_size):
+        agents_collection.insert_many([dict(agent) for agent in agents[i:i + batch_size]])
+    stats.insert_many([dict(record) for record in stats_records])
+    print(f'Seeded {len(agents)} agents and {len(stats_records)} stats records in {time.perf_counter() - start:.1f} s')
+
+
+def wait_for_read_model(expected, timeout=300):
+    '''
+    Wait until the read model, built in the background at startup, holds every agent
+    '''
+    from app.helpers.database import connect_collection
+    agents_ui = connect_collection('AGENTS_UI', 'agents_ui')
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if agents_ui.count_documents({}) >= expected:
+            return True
+        time.sleep(1)
+    print('The read model was not ready in time: results include its construction')
+    return False
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        kind, weight = item.split('=')
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'Unknown request kind {kind} (one of {", ".join(DEFAULT_MIX)})')
+        mix[kind] = float(weight)
+    return mix
+
+
+class RequestMix:
+    '''
+    Requests drawn from the seeded agents, with the share of each kind given by `mix`
+    '''
+    def __init__(self, agents, mix=None, variables=None):
+        self.mix = mix or DEFAULT_MIX
+        self.kinds = list(self.mix)
+        self.weights = [self.mix[kind] for kind in self.kinds]
+        self.agents = [(agent['name'], agent['type'], agent['@id']) for agent in agents]
+        self.words = sorted({word for agent in agents for text in agent.get('description') or [] for word in str(text).split() if len(word) > 3})[:500]
+        self.words += [agent['name'][:5] for agent in agents[:500]]
+        # the variables of the seeded stats, and the routes that serve them
+        self.variables = sorted(variables or STATS_ROUTES.values())
+        self.stats_routes = [route for route, variable in STATS_ROUTES.items() if variable in self.variables]
+
+    def draw(self, rng):
+        '''
+        (kind, method, path, query parameters, json body)
+        '''
+        kind = rng.choices(self.kinds, self.weights)[0]
+        return (kind,) + getattr(self, kind)(rng)
+
+    def search(self, rng):
+        params = {'q': rng.choice(self.words)}
+        if rng.random() < 0.3:
+            params['page'] = rng.randint(1, 3)
+        if rng.random() < 0.2:
+            params['type'] = rng.choice(['cmd', 'web', 'lib'])
+        return 'GET', '/search', params, None
+
+    def agents(self, rng):
+        name, type_, id_ = rng.choice(self.agents)
+        return 'GET', '/agents', {'name': name, 'type': type_}, None
+
+    def stats(self, rng):
+        return 'GET', f'/stats/agents/{rng.choice(self.stats_routes)}', {}, None
+
+    def stats_batch(self, rng):
+        return 'GET', '/stats/batch', {'variables': ','.join(rng.sample(self.variables, 3))}, None
+
+    def edam(self, rng):
+        return 'GET', '/edam/EDAMTerms', {}, None
+
+    def evaluate_id(self, rng):
+        name, type_, id_ = rng.choice(self.agents)
+        return 'POST', '/fair/evaluateId', {}, {'id': id_}
+
+
+def run_load(client, request_mix, duration, workers, seed=0):
+    '''
+    Send requests from `workers` threads for `duration` seconds. Returns the samples
+    (kind, latency in ms, status, cache hit) and the time elapsed.
+    '''
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local = []
+        while time.monotonic() < deadline:
+            kind, method, path, params, body = request_mix.draw(rng)
+            start = time.perf_counter()
+            try:
+                response = client.request(method, path, params=params, json=body)
+                status, hit = response.status_code, response.headers.get('X-Cache') == 'HIT'
+            except Exception:
+                status, hit = 0, False
+            local.append((kind, (time.perf_counter() - start) * 1000, status, hit))
+        with lock:
+            samples.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    '''
+    Requests, errors, throughput and latency percentiles of each kind of request and overall
+    '''
+    groups = {}
+    for kind, latency, status, hit in samples:
+        groups.setdefault(kind, []).append((latency, status, hit))
+    groups['all'] = [(latency, status, hit) for kind, latency, status, hit in samples]
+
+    summary = {}
+    for kind, group in sorted(groups.items()):
+        latencies = [latency for latency, status, hit in group]
+        summary[kind] = {
+            'requests': len(group),
+            'errors': sum(1 for latency, status, hit in group if not 200 <= status < 400),
+            'cache_hits': sum(1 for latency, status, hit in group if hit),
+            'rps': round(len(group) / elapsed, 2) if elapsed else 0,
+            'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0,
+            'p50_ms': round(percentile(latencies, 50), 3) if latencies else 0,
+            'p90_ms': round(percentile(latencies, 90), 3) if latencies else 0,
+            'p99_ms': round(percentile(latencies, 99), 3) if latencies else 0,
+            'max_ms': round(max(latencies), 3) if latencies else 0,
+        }
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(report, previous, threshold=REGRESSION_THRESHOLD):
+    '''
+    Changes (%) of the latency and throughput of every kind of request with respect to a
+    previous report. Returns the list of regressions (larger than `threshold`).
+    '''
+    regressions = []
+    print(f'\nCompared with {previous["meta"].get("commit")} ({previous["meta"].get("date")}):')
+    print(f'{"kind":<12} {"p50 ms":>18} {"p99 ms":>18} {"req/s":>18}')
+    for kind, current in report['summary'].items():
+        before = previous['summary'].get(kind)
+        if not before:
+            continue
+        cells = []
+        for metric, higher_is_worse in [('p50_ms', True), ('p99_ms', True), ('rps', False)]:
+            change = (current[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            worse = change if higher_is_worse else -change
+            if worse > threshold:
+                regressions.append({'kind': kind, 'metric': metric, 'before': before[metric], 'after': current[metric], 'change': round(change, 1)})
+            cells.append(f'{current[metric]:>9.1f} ({change:+5.1f}%)')
+        print(f'{kind:<12} ' + ' '.join(cells))
+    for regression in regressions:
+        print(f'REGRESSION {regression["kind"]} {regression["metric"]}: {regression["before"]} -> {regression["after"]} ({regression["change"]:+}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test of the API')
+    parser.add_argument('--backend', choices=['mongod', 'memory'], default='mongod')
+    parser.add_argument('--seed', action='store_true', help='replace the agents and stats of the database')
+    parser.add_argument('--seed-file', default=SEED_FILE)
+    parser.add_argument('--stats-file', default=None, help='stats records to seed (mongoexport --jsonArray of a stats collection) '
+                        'instead of those computed from the agents and the synthetic ones')
+    parser.add_argument('--database', default=None, help='dedicated database to use instead of the one of CONFIG_PATH')
+    parser.add_argument('--scale', type=int, default=1, help='copies of every seeded agent (e.g. 10, 100)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of load before measuring')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--mix', type=parse_mix, default=None, help='e.g. search=50,agents=20,stats=30')
+    parser.add_argument('--url', default=None, help='base URL of a running API (default: in-process)')
+    parser.add_argument('--report', default=None, help='JSON report (default: load-report-<commit>.json)')
+    parser.add_argument('--compare', default=None, help='previous JSON report to compare with')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    if args.backend == 'memory':
+        memory_backend()
+        args.seed = True
+    # a running API (--url) that is not seeded needs no database here
+    database = select_database(args.database, args.seed) if args.seed or args.database or not args.url else None
+
+    agents = read_seed(args.seed_file)
+    source = args.seed_file
+    if agents is None:
+        print(f'{args.seed_file} is not available: using {SYNTHETIC_AGENTS} synthetic agents')
+        agents, source = synthetic_agents(SYNTHETIC_AGENTS), 'synthetic'
+    agents = scale_up(agents, args.scale)
+    stats_records = read_stats(args.stats_file) if args.stats_file else seed_stats(agents)
+    if args.seed:
+        seed_database(agents, stats_records)
+    request_mix = RequestMix(agents, args.mix, {record['variable'] for record in stats_records})
+
+    meta = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(),
+        'backend': args.backend,
+        'database': database,
+        'target': args.url or 'in-process',
+        'seed': source,
+        'stats': args.stats_file or 'stats engine + synthetic',
+        'agents': len(agents),
+        'scale': args.scale,
+        'workers': args.workers,
+        'duration': args.duration,
+        'mix': request_mix.mix,
+        'python': platform.python_version(),
+    }
+
+    with ExitStack() as stack:
+        if args.url:
+            import httpx
+            client = stack.enter_context(httpx.Client(base_url=args.url, timeout=60))
+        else:
+            from fastapi.testclient import TestClient
+            from benchmarks.standins import StandinFarm
+            from main import app
+            # FAIR evaluations probe local stand-ins instead of the real sites
+            farm = stack.enter_context(StandinFarm(default={'status': 200, 'latency': 0.02}))
+            stack.enter_context(farm.installed(probe_timeout=1.0))
+            client = stack.enter_context(TestClient(app))
+            if args.seed:
+                wait_for_read_model(len(agents))
+
+        # the request handlers print their progress: keep it out of the report
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            if args.warmup:
+                run_load(client, request_mix, args.warmup, args.workers, seed=1000)
+            samples, elapsed = run_load(client, request_mix, args.duration, args.workers)
+
+    report = {'meta': meta, 'summary': summarize(samples, elapsed)}
+    path = args.report or f'load-report-{meta["commit"]}.json'
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f'{meta["agents"]} agents ({source}, x{args.scale}), {args.workers} workers, {elapsed:.1f} s, commit {meta["commit"]}')
+    print(f'{"kind":<12} {"requests":>9} {"errors":>7} {"hits":>6} {"req/s":>8} {"p50 ms":>9} {"p90 ms":>9} {"p99 ms":>9}')
+    for kind, row in report['summary'].items():
+        print(f'{kind:<12} {row["requests"]:>9} {row["errors"]:>7} {row["cache_hits"]:>6} {row["rps"]:>8.1f} {row["p50_ms"]:>9.1f} {row["p90_ms"]:>9.1f} {row["p99_ms"]:>9.1f}')
+    print(f'Report written to {path}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f))
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
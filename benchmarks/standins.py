@@ -0,0 +1,174 @@
+'''
+Local HTTP stand-ins for the URLs probed by the FAIR indicators.
+
+A threaded server on localhost answers for any URL, with a scripted behaviour per URL
+(status, latency, timeout, redirect). Probes reach it through the URL rewrite hook of
+app/services/utils.py: https://github.com/x is requested as
+http://127.0.0.1:<port>/https%3A%2F%2Fgithub.com%2Fx.
+
+Usage:
+    python -m benchmarks.standins [script.json] [--port 8099]
+
+    script.json: {"urls": {"https://github.com/x": {"status": 200, "latency": 0.05}},
+                  "default": {"status": 404}}
+
+    The API then probes the stand-ins when started with
+    URL_PROBE_REWRITE=http://127.0.0.1:8099/
+'''
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote, urlparse
+
+from app.services import utils
+
+# behaviour of the URLs that are not scripted
+DEFAULT_BEHAVIOUR = {'status': 404}
+
+# seconds a `timeout` URL waits before answering (longer than the probe timeout)
+HANG_SECONDS = 5.0
+
+
+def normalize(url):
+    return str(url).rstrip('/')
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        url = unquote(self.path[1:])
+        behaviour = self.server.farm.behaviour(url)
+        self.server.farm.record(url)
+
+        if behaviour.get('timeout'):
+            time.sleep(self.server.farm.hang)
+        elif behaviour.get('latency'):
+            time.sleep(behaviour['latency'])
+
+        status = behaviour.get('status', 301 if behaviour.get('redirect') else 200)
+        self.send_response(status)
+        if behaviour.get('redirect'):
+            self.send_header('Location', behaviour['redirect'])
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandinFarm:
+    '''
+    Stand-ins answering with the behaviour scripted for each URL: {url: behaviour} where
+    behaviour has `status`, `latency` (seconds), `timeout` (true to never answer in time)
+    and `redirect` (Location of a 3xx). URLs are matched exactly (ignoring a trailing
+    slash), then by host; the rest get `default`.
+    '''
+    def __init__(self, urls=None, default=None, hang=HANG_SECONDS, host='127.0.0.1', port=0):
+        self.urls = {}
+        self.hosts = {}
+        for url, behaviour in (urls or {}).items():
+            self.script(url, behaviour)
+        self.default = default or DEFAULT_BEHAVIOUR
+        self.hang = hang
+        self.address = (host, port)
+        self.server = None
+        self.hits = {}
+        self.lock = threading.Lock()
+
+    def script(self, url, behaviour):
+        '''
+        Set the behaviour of a URL, or of every URL of a host if `url` is a bare host
+        '''
+        if isinstance(behaviour, int):
+            behaviour = {'status': behaviour}
+        if '://' in url:
+            self.urls[normalize(url)] = behaviour
+        else:
+            self.hosts[url.lower()] = behaviour
+
+    def behaviour(self, url):
+        behaviour = self.urls.get(normalize(url))
+        if behaviour is None:
+            behaviour = self.hosts.get((urlparse(url).hostname or '').lower(), self.default)
+        return behaviour
+
+    def record(self, url):
+        with self.lock:
+            self.hits[url] = self.hits.get(url, 0) + 1
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def rewrite(self, url):
+        return utils.prefix_rewrite(self.base_url)(url)
+
+    def start(self):
+        self.server = ThreadingHTTPServer(self.address, StandinHandler)
+        self.server.daemon_threads = True
+        self.server.farm = self
+        thread = threading.Thread(target=self.server.serve_forever, name='standins', daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @contextmanager
+    def installed(self, probe_timeout=None):
+        '''
+        Direct the URL probes to the stand-ins inside the block
+        '''
+        previous_timeout = utils.PROBE_TIMEOUT
+        previous = utils.set_url_rewrite(self.rewrite)
+        if probe_timeout is not None:
+            utils.PROBE_TIMEOUT = probe_timeout
+        try:
+            yield self
+        finally:
+            utils.set_url_rewrite(previous)
+            utils.PROBE_TIMEOUT = previous_timeout
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def load_script(path):
+    with open(path) as f:
+        script = json.load(f)
+    return script.get('urls', {}), script.get('default')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local HTTP stand-ins for the URLs probed by the FAIR indicators')
+    parser.add_argument('script', nargs='?', help='JSON file with the behaviour of the URLs')
+    parser.add_argument('--port', type=int, default=8099)
+    args = parser.parse_args()
+
+    urls, default = load_script(args.script) if args.script else ({}, None)
+    farm = StandinFarm(urls, default, port=args.port).start()
+    print(f'Stand-ins serving {len(urls)} scripted URLs at {farm.base_url}')
+    print(f'Start the API with URL_PROBE_REWRITE={farm.base_url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        farm.stop()
+
+
+if __name__ == '__main__':
+    main()
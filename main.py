@@ -4,7 +4,17 @@ from starlette.responses import HTMLResponse
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import FileResponse
-from app.routes import edam, spdx, stats, metadata, fair_evaluation, search, agent
+from app.routes import edam, spdx, stats, metadata, fair_evaluation, search, agent, diagnostics, metrics
+from app.helpers.read_model import start_projector, get_projector
+from app.helpers.catalogue import start_catalogue
+from app.helpers.indexes import start_ensure_indexes
+from app.helpers.facets import start_facet_index
+from app.helpers.suggest import start_suggest_index
+from app.helpers.edam_hierarchy import get_edam_hierarchy
+from app.helpers.fuzzy import start_fuzzy_index
+from app.helpers.publication_index import start_publication_index
+from app.helpers.stats_counters import start_stats_counters
+from app.helpers.metrics import MetricsMiddleware
 
 tags_metadata = [
         {
@@ -31,6 +41,10 @@ tags_metadata = [
             "name": "search",
             "description": "Search related endpoints",
         },
+        {
+            "name": "diagnostics",
+            "description": "Diagnostics of the API and its database",
+        },
     ]
 
 app = FastAPI(
@@ -59,6 +73,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latency and in-flight requests per route, exposed in /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include Routers
 app.include_router(stats.router, prefix="/stats")
 app.include_router(metadata.router, prefix="/agents")
@@ -68,7 +85,30 @@ app.include_router(spdx.router, prefix="/spdx")
 app.include_router(fair_evaluation.router, prefix="/fair")
 app.include_router(agent.router, prefix="/agent")
 app.include_router(search.router, prefix="")
+app.include_router(diagnostics.router, prefix="/diagnostics")
+app.include_router(metrics.router, prefix="")
+
 
+@app.on_event("startup")
+def startup():
+    # Indexes for the query shapes of the API
+    start_ensure_indexes()
+    # Bitmaps of the search facets, following the read model (subscribed before it starts)
+    start_facet_index(get_projector())
+    # Build/refresh the UI read model of the agents in the background
+    start_projector()
+    # Lightweight in-memory index of the catalogue
+    start_catalogue()
+    # Typeahead suggestions (agent names and EDAM terms)
+    start_suggest_index()
+    # Trigram index of agent names, for fuzzy=true in /search
+    start_fuzzy_index()
+    # Inverted index of publication titles and abstracts, for /search
+    start_publication_index()
+    # Live stats counters, updated with the changes of the agents
+    start_stats_counters()
+    # EDAM class hierarchy, for include_descendants in /search
+    get_edam_hierarchy()
 
 
 @app.get("/app")
@@ -1,26 +1,57 @@
+import hashlib
 import importlib
 import json
+import math
 import requests
 import ssl
 import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
 import FAIRsoft
 from munch import munchify
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
 from FAIRsoft.integration.integration import build_pre_integration_dict
 from FAIRsoft.integration.integration import create_integrated_instances
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Import pipeline: stream the OPEB dump -> keep bio.agents instances -> transform chunks
+# in a process pool -> integrate by name in the pool -> bulk upserts.
+CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+WRITE_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+PROCESSES = int(os.getenv('IMPORT_PROCESSES', os.cpu_count() or 1))
+
+# Change detection: validators of the last imported dump, fingerprints of the agents
+# and the list of @id written by the last run
+IMPORT_STATE_PATH = os.getenv('IMPORT_STATE_PATH', './import_state.json')
+IMPORT_FINGERPRINTS = os.getenv('IMPORT_FINGERPRINTS', 'import_fingerprints')
+CHANGED_IDS_PATH = os.getenv('CHANGED_IDS_PATH', './changed_ids.json')
+FORCE_IMPORT = os.getenv('FORCE_IMPORT', 'false').lower() == 'true'
+
+# Offline import of a local dump of agent documents (e.g. mongo-seed/agents-bioagents.json),
+# chunk by chunk, recording the last written chunk to resume after an interruption
+IMPORT_FILE = os.getenv('IMPORT_FILE')
+IMPORT_CHECKPOINT_PATH = os.getenv('IMPORT_CHECKPOINT_PATH', './import_checkpoint.json')
+
 session = requests.Session()
 headers = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_5) AppleWebKit 537.36 (KHTML, like Gecko) Chrome",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
 }
 
-def getHTML(url, verb=False):
+def getHTML(url, verb=False, stream=False, extra_headers=None):
     ssl._create_default_https_context = ssl._create_unverified_context
     try:
-        req = session.get(url, headers=headers, timeout=(20, 50), verify=False)
+        req = session.get(url, headers={**headers, **(extra_headers or {})}, timeout=(20, 50), verify=False, stream=stream)
         # req = urllib.request.urlopen(url)
     except Exception as e:
-        print(e)
         print(e)
         return None
     else:
@@ -45,20 +76,20 @@ def get_bioagents_agents(agent, log):
             return(agent, log)
     else:
         log['canonical_N'] += 1
-    
-    return(None, log)    
-    
+
+    return(None, log)
+
 
 
 def transform_this_source(raw):
     # Instantiate agentGenerator specific to this source
     generator_module = importlib.import_module(f".meta_transformers", 'FAIRsoft.transformation')
     generator = generator_module.agent_generators['bioagents'](raw)
-        
+
     # From instance objects to dictionaries
     #insts = [i.__dict__ for i in generator.instSet.instances]
     insts = [ i for i in generator.instSet.instances ]
-    
+
     return(insts)
 
 def count_tag(tag, agents):
@@ -71,76 +102,455 @@ def count_tag(tag, agents):
             N+=1
     return(N)
 
+
+class Throughput:
+    '''
+    Items processed by a stage of the import and time spent in it
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    def add(self, items, seconds):
+        self.items += items
+        self.seconds += seconds
+
+    def report(self):
+        rate = self.items / self.seconds if self.seconds else 0
+        return f'{self.name:<10} {self.items:>8} items {self.seconds:>8.1f} s {rate:>10.0f} items/s'
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_state():
+    try:
+        with open(IMPORT_STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_state(state):
+    with open(IMPORT_STATE_PATH, 'w') as f:
+        json.dump(state, f)
+
+
+def conditional_headers(state):
+    conditions = {}
+    if state.get('etag'):
+        conditions['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        conditions['If-Modified-Since'] = state['last_modified']
+    return conditions
+
+
+def open_dump(location, state):
+    '''
+    Open the OPEB dump at `location` (URL or local file) unless it is the same as in
+    the last import. Returns (dump, validators): dump is None when nothing changed.
+    '''
+    if os.path.isfile(location):
+        stat = os.stat(location)
+        validators = {'file': os.path.abspath(location), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        if not FORCE_IMPORT and all(state.get(key) == value for key, value in validators.items()):
+            return None, validators
+        return open(location, 'rb'), validators
+
+    response = getHTML(location, stream=ijson is not None, extra_headers={} if FORCE_IMPORT else conditional_headers(state))
+    if response is None:
+        raise ConnectionError(f'Could not download {location}')
+    validators = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    if response.status_code == 304:
+        return None, state
+    response.raise_for_status()
+    response.raw.decode_content = True
+    return response, validators
+
+
+def stream_agents(dump, counter):
+    '''
+    Agents of the OPEB dump, parsed while they are read (needs ijson, otherwise the
+    whole dump is loaded at once)
+    '''
+    start = time.perf_counter()
+    if ijson is None:
+        print('ijson is not installed: loading the whole dump in memory')
+        agents = dump.json() if hasattr(dump, 'json') else json.load(dump)
+    else:
+        agents = ijson.items(dump.raw if hasattr(dump, 'raw') else dump, 'item')
+
+    n = 0
+    for agent in agents:
+        n += 1
+        yield agent
+    counter.add(n, time.perf_counter() - start)
+
+
+def normalized(value):
+    '''
+    `value` with its numbers in a single form: ijson parses them as Decimal and json as
+    int or float, and fingerprints must not depend on which parser read the dump
+    '''
+    if isinstance(value, dict):
+        return {key: normalized(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [normalized(item) for item in value]
+    if isinstance(value, (float, Decimal)) and math.isfinite(value):
+        return int(value) if value == int(value) else float(value)
+    return value
+
+
+def fingerprint(record):
+    return hashlib.sha1(json.dumps(normalized(record), sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_source_id(id_):
+    return id_.split('/')[5]
+
+
+def group_key(agent):
+    '''
+    Agent that an instance is integrated into. Instances are grouped by name only (all
+    types together), which is never finer than the integration.
+    '''
+    # https://openebench.bsc.es/monitor/agent/bioagents:<name>:<version>/<type>/<host>
+    return get_source_id(agent['@id']).split(':')[1].casefold()
+
+
+def group_fingerprints(agents):
+    '''
+    Fingerprint of each group of instances: changes when any of its instances changes
+    '''
+    fingerprints = {}
+    for agent in agents:
+        fingerprints.setdefault(group_key(agent), []).append(fingerprint(agent))
+    return {group: hashlib.sha1(''.join(sorted(prints)).encode()).hexdigest() for group, prints in fingerprints.items()}
+
+
+def changed_groups(fingerprints, fingerprints_collection):
+    '''
+    Groups whose fingerprint differs from the stored one
+    '''
+    if FORCE_IMPORT or fingerprints_collection is None:
+        return set(fingerprints)
+    stored = {doc['group']: doc['fingerprint'] for doc in fingerprints_collection.find({}, {'_id': 0, 'group': 1, 'fingerprint': 1})}
+    return {group for group, value in fingerprints.items() if stored.get(group) != value}
+
+
+def written_groups(groups, failed_names):
+    '''
+    Groups whose instances were all written. Instances are named after their agent, so
+    a failed write is matched to its group by name; if a failed name is not a group,
+    none of the groups is known to be written.
+    '''
+    failed = {str(name).casefold() for name in failed_names}
+    if not failed <= set(groups):
+        return set()
+    return set(groups) - failed
+
+
+def store_fingerprints(fingerprints_collection, fingerprints, groups):
+    operations = [
+        ReplaceOne({'group': group}, {'group': group, 'fingerprint': fingerprints[group]}, upsert=True)
+        for group in groups
+    ]
+    for batch in chunked(operations, WRITE_BATCH_SIZE):
+        fingerprints_collection.bulk_write(batch, ordered=False)
+
+
+def spooled(agents, spool):
+    '''
+    Agents, written to `spool` (a JSON document per line) as they pass, so that they
+    can be read again without downloading the dump twice or holding it in memory
+    '''
+    for agent in agents:
+        # ijson parses the numbers as Decimal
+        spool.write(json.dumps(agent, default=float) + '\n')
+        yield agent
+
+
+def read_spool(spool):
+    spool.seek(0)
+    for line in spool:
+        yield json.loads(line)
+
+
+def changed_keys(instances):
+    '''
+    Filters of the documents written for the instances (see instance_key)
+    '''
+    return [instance_key(instance_document(instance)) for instance in instances]
+
+
+def write_changed_ids(keys):
+    with open(CHANGED_IDS_PATH, 'w') as f:
+        json.dump(keys, f)
+    print(f'Changed agents: {len(keys)} (keys written to {CHANGED_IDS_PATH})')
+
+
+def bioagents_instances(agents, log):
+    for agent in agents:
+        metadata, log = get_bioagents_agents(agent, log)
+        if metadata:
+            yield metadata
+
+
+def transform_chunk(raw):
+    return transform_this_source(raw)
+
+
+def integrate_chunk(pre_integration_dict):
+    inst_name_dict = create_integrated_instances(pre_integration_dict)
+    return [inst_name_dict[agent_name][0] for agent_name in inst_name_dict.keys()]
+
+
+def bounded_map(pool, function, items, in_flight=2 * PROCESSES):
+    '''
+    Results of `function` over `items` in the process pool, in order. Unlike pool.map,
+    which submits every item at once, at most `in_flight` items are submitted and not
+    yet returned, so items are read only as fast as the pool processes them.
+    '''
+    pending = deque()
+    for item in items:
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+        pending.append(pool.submit(function, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def transform(raw_agents, pool, counter):
+    '''
+    Transform chunks of raw agents in the process pool, while the dump is still being read
+    '''
+    start = time.perf_counter()
+    instances = []
+    n = 0
+    for chunk_instances in bounded_map(pool, transform_chunk, chunked(raw_agents, CHUNK_SIZE)):
+        instances.extend(chunk_instances)
+        n += 1
+    counter.add(len(instances), time.perf_counter() - start)
+    print(f'Number of agents: {len(instances)} (transformed in {n} chunks)')
+    return instances
+
+
+def integrate(instances, pool, counter):
+    '''
+    Integrate the instances of each agent (same name and type). Agents are independent,
+    so the names are split in chunks integrated in the process pool.
+    '''
+    start = time.perf_counter()
+    totalNames, pre_integration_dict = build_pre_integration_dict([instances])
+    parts = (
+        {name: pre_integration_dict[name] for name in chunk}
+        for chunk in chunked(pre_integration_dict.keys(), CHUNK_SIZE)
+    )
+    integrated_instances = []
+    for chunk_instances in bounded_map(pool, integrate_chunk, parts):
+        integrated_instances.extend(chunk_instances)
+    counter.add(len(integrated_instances), time.perf_counter() - start)
+    return integrated_instances
+
+
+def instance_document(instance):
+    '''
+    Document stored for an integrated instance, as FAIRsoft.utils.push_entry stores it.
+    FAIRsoft's integration already returns the instances as documents (the __dict__ of
+    its instance objects); push_entry only drops `about.date`, which causes trouble.
+    '''
+    document = dict(instance) if isinstance(instance, dict) else dict(vars(instance))
+    if isinstance(document.get('about'), dict):
+        document['about'] = {key: value for key, value in document['about'].items() if key != 'date'}
+    return document
+
+
+def instance_key(document):
+    if document.get('@id'):
+        return {'@id': document['@id']}
+    return {'name': document['name'], 'type': document['type']}
+
+
+def upsert_instances(collection, instances, counter, log):
+    '''
+    Write the instances with unordered bulk upserts of WRITE_BATCH_SIZE documents
+    '''
+    start = time.perf_counter()
+    written = 0
+    for batch in chunked(instances, WRITE_BATCH_SIZE):
+        documents = []
+        for instance in batch:
+            document = instance_document(instance)
+            document.pop('_id', None)
+            documents.append(document)
+        operations = [UpdateOne(instance_key(document), {'$set': document}, upsert=True) for document in documents]
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            written += result.upserted_count + result.modified_count
+        except BulkWriteError as err:
+            for error in err.details.get('writeErrors', []):
+                log['errors'].append({'error': error.get('errmsg')})
+                # names of the agents not written, so that they are imported again next time
+                log.setdefault('failed', []).append(documents[error['index']].get('name'))
+            written += err.details.get('nUpserted', 0) + err.details.get('nModified', 0)
+    counter.add(len(instances), time.perf_counter() - start)
+    print(f'Agents written: {written}')
+    return log
+
+
+def file_identity(path):
+    stat = os.stat(path)
+    return {'file': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime, 'chunk_size': WRITE_BATCH_SIZE}
+
+
+def read_checkpoint(identity):
+    '''
+    Last chunk written from the same file (-1 if none). Checkpoints of another file,
+    or of the same file with another chunk size, are ignored.
+    '''
+    try:
+        with open(IMPORT_CHECKPOINT_PATH) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return -1
+    if any(checkpoint.get(key) != value for key, value in identity.items()):
+        return -1
+    return checkpoint['chunk']
+
+
+def write_checkpoint(identity, chunk, written):
+    # written to a temporary file and renamed, so an interruption never leaves a broken checkpoint
+    tmp_path = IMPORT_CHECKPOINT_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({**identity, 'chunk': chunk, 'written': written}, f)
+    os.replace(tmp_path, IMPORT_CHECKPOINT_PATH)
+
+
+def import_file(path):
+    '''
+    Write the agent documents of a local dump (a JSON array, as in mongo-seed) in chunks
+    of WRITE_BATCH_SIZE, resuming after the last chunk written by an interrupted run.
+    Writes are upserts, so a chunk written again after a crash does not duplicate agents.
+    '''
+    TOOLS_BIOTOOLS = os.getenv('TOOLS_BIOTOOLS', 'agents_bioagents')
+    collection = FAIRsoft.utils.connect_collection(TOOLS_BIOTOOLS)
+
+    identity = file_identity(path)
+    last_chunk = -1 if FORCE_IMPORT else read_checkpoint(identity)
+    if last_chunk >= 0:
+        print(f'Resuming the import of {path} after chunk {last_chunk}')
+
+    # reading and writing are interleaved: the import is timed as a whole
+    counters = {stage: Throughput(stage) for stage in ['read', 'write', 'total']}
+    log = {'errors':[], 'n_ok':0, 'names': [],'canonical_N': 0}
+    written = 0
+    start = time.perf_counter()
+    with open(path, 'rb') as dump:
+        for index, chunk in enumerate(chunked(stream_agents(dump, counters['read']), WRITE_BATCH_SIZE)):
+            # chunks already written are only read
+            if index <= last_chunk:
+                continue
+            log = upsert_instances(collection, chunk, counters['write'], log)
+            written += len(chunk)
+            write_checkpoint(identity, index, written)
+
+    counters['total'].add(written, time.perf_counter() - start)
+
+    # the import is complete: the next one starts from the beginning
+    if os.path.exists(IMPORT_CHECKPOINT_PATH):
+        os.remove(IMPORT_CHECKPOINT_PATH)
+    print(f'''\n----- File Importation finished -----
+    Agents written in this run: {written}''')
+    print('Throughput\n')
+    for stage in ['write', 'total']:
+        print(counters[stage].report())
+    print('Exceptions\n')
+    for e in log['errors']:
+        print(e['error'])
+
+
 def import_data():
     # 0. connect database/set output files
     STORAGE_MODE = os.getenv('STORAGE_MODE', 'db')
-    TOOLS_BIOTOOLS = os.getenv('TOOLS_BIOTOOLS', 'agents_bioagents') 
+    TOOLS_BIOTOOLS = os.getenv('TOOLS_BIOTOOLS', 'agents_bioagents')
 
     if STORAGE_MODE =='db':
         TOOLS_BIOTOOLS = FAIRsoft.utils.connect_collection(TOOLS_BIOTOOLS)
     else:
         OUTPUT_PATH = os.getenv('OUTPUT_PATH', '.')
-        OUTPUT_OPEB_TOOLS = os.getenv('OUTPUT_OPEB_TOOLS', 'opeb_agents.json') 
+        OUTPUT_OPEB_TOOLS = os.getenv('OUTPUT_OPEB_TOOLS', 'opeb_agents.json')
         output_file = OUTPUT_PATH + '/' + TOOLS_BIOTOOLS + '.json'
 
+    counters = {stage: Throughput(stage) for stage in ['download', 'transform', 'integrate', 'write']}
+    log = {'errors':[], 'n_ok':0, 'names': [],'canonical_N': 0}
 
-    # 1. Download all opeb
+    # 1. Download all opeb (streamed), unless it did not change since the last import
     URL_OPEB_TOOLS = os.getenv('OPEB_URL', 'https://openebench.bsc.es/monitor/agent')
     print(f'OpenEBench agents URL: {URL_OPEB_TOOLS}')
-    re = getHTML(URL_OPEB_TOOLS)
+    state = read_state()
+    dump, validators = open_dump(URL_OPEB_TOOLS, state)
+    if dump is None:
+        print('The OpenEBench dump did not change since the last import')
+        write_changed_ids([])
+        return
 
-    # 2. Get agents
-    agents = re.json()
-    log = {'errors':[], 'n_ok':0, 'names': [],'canonical_N': 0}
-    
-    #For agent in OPEB Agent db
-    bioagents_agents = []
-    for agent in agents:
-        # 3. Process metadata
-        metadata, log = get_bioagents_agents(agent,log)
-        if metadata:
-            bioagents_agents.append(metadata)
-
-    # 4. transform metadata to agent format
-    print(f'Number of agents: {len(bioagents_agents)}')
-    instances = transform_this_source(bioagents_agents)
-    print(f'Number of agents: {len(instances)}')
-
-    # 5. integrate to avoid each version being one entry in the db
-    totalNames, pre_integration_dict = build_pre_integration_dict([instances])
+    # 2-3. Get bio.agents instances and keep the agents that changed. The instances are
+    # fingerprinted while the dump is read and spooled to a temporary file, which is then
+    # read again keeping only the agents that changed.
+    with tempfile.TemporaryFile('w+') as spool:
+        fingerprints = group_fingerprints(spooled(bioagents_instances(stream_agents(dump, counters['download']), log), spool))
+        # without a database there is nothing to compare with: everything is written
+        fingerprints_collection = FAIRsoft.utils.connect_collection(IMPORT_FINGERPRINTS) if STORAGE_MODE == 'db' else None
+        groups = changed_groups(fingerprints, fingerprints_collection)
+        print(f'Agents changed: {len(groups)} of {len(fingerprints)}')
+        raw_agents = (agent for agent in read_spool(spool) if group_key(agent) in groups)
 
-    ## Saving pre_integration_dict and names. 
- 
-    # 5.2. Integration of "agent" instances of same ID (name, type)
-    n = []
-    for k in pre_integration_dict.keys():
-        for kk in pre_integration_dict[k].keys():
-            n.append(len(pre_integration_dict[k][kk]))
+        with ProcessPoolExecutor(max_workers=PROCESSES) as pool:
+            # 4. transform metadata to agent format, chunk by chunk
+            instances = transform(raw_agents, pool, counters['transform'])
 
-    ## 5.3 Create integration intances. Returns a dictionary of instances by agent name.
-    inst_name_dict = create_integrated_instances(pre_integration_dict)
-
-    print(f'Names {len(inst_name_dict)}')
-    integrated_instances = []
-    for agent_name in inst_name_dict.keys():
-        integrated_instances.append(inst_name_dict[agent_name][0])
+            # 5. integrate to avoid each version being one entry in the db
+            integrated_instances = integrate(instances, pool, counters['integrate'])
 
     print(f"Number of agents: {len(integrated_instances)}")
     print(f'Number of agents with tag RIS3CAT VEIS: {count_tag("RIS3CAT VEIS", integrated_instances)}')
     # 6. push to db
     if STORAGE_MODE=='db':
-        for instance in integrated_instances:
-            log = FAIRsoft.utils.push_entry(instance, agents_bioagents, log)
+        log = upsert_instances(TOOLS_BIOTOOLS, integrated_instances, counters['write'], log)
+        # agents whose writes failed keep their old fingerprint, so they are retried
+        store_fingerprints(fingerprints_collection, fingerprints, written_groups(groups, log.get('failed', [])))
     else:
+        start = time.perf_counter()
         log = FAIRsoft.utils.save_many(integrated_instances, output_file, log)
+        counters['write'].add(len(integrated_instances), time.perf_counter() - start)
+    write_changed_ids(changed_keys(integrated_instances))
+    write_state(validators)
     # Importation finished
     print(f'''\n----- OPEB Agents Importation finished -----
     Number of agents in OPEB {log['n_ok']}
     Number of canonical agents: {log['canonical_N']}''')
+    print('Throughput\n')
+    for counter in counters.values():
+        print(counter.report())
     print('Exceptions\n')
     for e in log['errors']:
         print(e['error'])
 
 
 if __name__ == '__main__':
-    import_data()
\ No newline at end of file
+    if IMPORT_FILE:
+        import_file(IMPORT_FILE)
+    else:
+        import_data()